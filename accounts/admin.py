@@ -1,5 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+
+from airline_booking.pagination import EstimatedCountPaginator
 from .models import User, EmailVerificationToken
 
 
@@ -7,6 +9,9 @@ from .models import User, EmailVerificationToken
 class UserAdmin(BaseUserAdmin):
     """
     Customized User admin with additional fields for email verification.
+
+    Also serves the user autocomplete of the booking, seat hold and
+    transaction forms; username and email searches use trigram indexes.
     """
     list_display = ('username', 'email', 'is_email_verified', 'wallet', 'is_active', 'date_joined')
     list_filter = ('is_email_verified', 'is_active', 'date_joined')
@@ -14,6 +19,8 @@ class UserAdmin(BaseUserAdmin):
         ('Custom Fields', {'fields': ('wallet', 'is_email_verified')}),
     )
     search_fields = ('username', 'email')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(EmailVerificationToken)
@@ -25,6 +32,7 @@ class EmailVerificationTokenAdmin(admin.ModelAdmin):
     list_filter = ('is_used', 'created_at')
     search_fields = ('user__username', 'token')
     readonly_fields = ('token', 'created_at')
+    list_select_related = ('user',)
 
     def is_expired(self, obj):
         """Display expiry status."""
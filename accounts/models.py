@@ -3,6 +3,8 @@ from django.db import models
 from django.utils import timezone
 from datetime import timedelta
 
+from airline_booking.indexes import trigram_index
+
 
 class User(AbstractUser):
     """
@@ -20,6 +22,11 @@ class User(AbstractUser):
     is_email_verified = models.BooleanField(default=False)
 
     class Meta:
+        indexes = [
+            # Admin search and autocomplete (icontains).
+            trigram_index('username', 'user_username_trgm'),
+            trigram_index('email', 'user_email_trgm'),
+        ]
         verbose_name = "User"
         verbose_name_plural = "Users"
 
@@ -1,3 +1,20 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.urls import reverse
 
-# Create your tests here.
+from .models import User
+
+
+@override_settings(ADMIN_EXACT_COUNT_LIMIT=-1)
+class UserAdminTests(TestCase):
+
+    def test_changelist_queries_do_not_grow(self):
+        admin = User.objects.create_superuser(username='ops', password='x')
+        self.client.force_login(admin)
+        url = reverse('admin:accounts_user_changelist')
+        # Session, user, EXPLAIN (no COUNT), page.
+        with self.assertNumQueries(4):
+            self.client.get(url)
+        User.objects.bulk_create(User(username=f'user{i}', email=f'user{i}@example.com') for i in range(10))
+        with self.assertNumQueries(4):
+            response = self.client.get(url, {'q': 'EXAMPLE.COM'})
+        self.assertEqual(len(response.context['cl'].result_list), 10)
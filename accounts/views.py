@@ -3,9 +3,11 @@ import secrets
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.decorators import login_required
-from django.core.mail import send_mail
 from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
+from jobs.tasks import send_mail_later
+from logs.audit import audit
 from .forms import RegisterForm, LoginForm
 from .models import User, EmailVerificationToken
 
@@ -19,7 +21,7 @@ def register_view(request):
     Flow:
     1. User fills registration form
     2. User account created with is_email_verified=False
-    3. Verification email sent with unique token
+    3. Verification email queued with unique token (sent by the run_jobs worker)
     4. User must click link to verify email
     """
     if request.user.is_authenticated:
@@ -28,29 +30,30 @@ def register_view(request):
     if request.method == 'POST':
         form = RegisterForm(request.POST)
         if form.is_valid():
-            # Create user but don't activate yet
-            user = form.save(commit=False)
-            user.is_active = True
-            user.is_email_verified = False
-            user.save()
-
-            # Generate and send verification token
-            token = secrets.token_urlsafe(32)
-            EmailVerificationToken.objects.create(user=user, token=token)
-
-            # Send verification email
-            verification_link = request.build_absolute_uri(
-                f'/accounts/verify-email/{token}/'
-            )
-            send_mail(
-                subject='Verify Your Email - Airline Booking',
-                message=f'Please verify your email by clicking the link: {verification_link}',
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[user.email],
-                fail_silently=False,
-            )
-
-            logger.info(f'User {user.username} registered. Verification email sent to {user.email}')
+            # User, token and email job commit together or not at all
+            with transaction.atomic():
+                # Create user but don't activate yet
+                user = form.save(commit=False)
+                user.is_active = True
+                user.is_email_verified = False
+                user.save()
+
+                # Generate and send verification token
+                token = secrets.token_urlsafe(32)
+                EmailVerificationToken.objects.create(user=user, token=token)
+
+                # Queue verification email; the response does not wait on SMTP
+                verification_link = request.build_absolute_uri(
+                    f'/accounts/verify-email/{token}/'
+                )
+                send_mail_later(
+                    subject='Verify Your Email - Airline Booking',
+                    message=f'Please verify your email by clicking the link: {verification_link}',
+                    from_email=settings.DEFAULT_FROM_EMAIL,
+                    recipient_list=[user.email],
+                )
+
+            logger.info(f'User {user.username} registered. Verification email queued for {user.email}')
             return redirect('accounts:verification_pending', username=user.username)
     else:
         form = RegisterForm()
@@ -126,6 +129,7 @@ def login_view(request):
 
             login(request, user)
             logger.info(f'User {user.username} logged in from IP {get_client_ip(request)}')
+            audit(request, 'login')
             return redirect('flights:list')
         else:
             logger.warning(f'Failed login attempt')
@@ -143,6 +147,7 @@ def logout_view(request):
     Logs user logout and terminates session.
     """
     username = request.user.username
+    audit(request, 'logout')
     logout(request)
     logger.info(f'User {username} logged out')
     return redirect('accounts:login')
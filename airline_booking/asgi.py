@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'airline_booking.settings')
+# Serve the native async views (settings.ASYNC_VIEWS) under ASGI.
+os.environ.setdefault('ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
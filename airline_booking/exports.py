@@ -0,0 +1,231 @@
+"""
+Streaming CSV / JSON Lines exports shared by the admin and the export commands.
+
+Rows are read with a server-side cursor (QuerySet.iterator(chunk_size))
+as tuples of just the exported columns, encoded one chunk at a time and
+optionally gzip-compressed on the fly, so memory stays flat however many
+rows an export has.
+
+Usage:
+    class BookingAdmin(ExportActionsMixin, admin.ModelAdmin):
+        export_fields = ('id', 'user__username', ...)
+
+    class Command(ExportCommand):
+        model = Booking
+        fields = (...)
+
+The admin actions return a StreamingHttpResponse whose content matches
+the server handling the request: an async generator under ASGI, which
+would otherwise read a synchronous one into memory before sending it, and
+a plain generator under WSGI, which would do the same to an async one.
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import admin
+from django.core.management.base import BaseCommand, CommandError
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+FORMATS = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+
+
+def _csv_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+class ExportEncoder:
+    """Turns batches of value tuples into (optionally gzipped) bytes."""
+
+    def __init__(self, fields, fmt='csv', compress=False):
+        if fmt not in FORMATS:
+            raise ValueError(f'Unknown export format {fmt!r}')
+        self.fields = fields
+        self.fmt = fmt
+        self.rows = 0
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+        # wbits=31: a gzip header and trailer around the deflate stream.
+        self._compressor = zlib.compressobj(wbits=31) if compress else None
+
+    def header(self):
+        if self.fmt == 'csv':
+            self._writer.writerow(self.fields)
+        return self._take()
+
+    def encode(self, rows):
+        for row in rows:
+            if self.fmt == 'csv':
+                self._writer.writerow([_csv_value(value) for value in row])
+            else:
+                self._buffer.write(json.dumps(dict(zip(self.fields, row)), cls=DjangoJSONEncoder))
+                self._buffer.write('\n')
+            self.rows += 1
+        return self._take()
+
+    def close(self):
+        return self._compressor.flush() if self._compressor else b''
+
+    def _take(self):
+        data = self._buffer.getvalue().encode()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return self._compressor.compress(data) if self._compressor else data
+
+
+def _rows(queryset, fields):
+    return queryset.values_list(*fields)
+
+
+def export_chunks(queryset, fields, fmt='csv', compress=False, chunk_size=None, encoder=None):
+    """
+    Yield the export of `queryset` as bytes, one chunk of rows at a time.
+
+    Args:
+        queryset (QuerySet): Rows to export, filtered and ordered
+        fields (tuple): Column names, related ones with `__` lookups
+        fmt (str): 'csv' (with a header row) or 'jsonl'
+        compress (bool): gzip the output
+        chunk_size (int): Rows per cursor fetch, defaults to EXPORT_CHUNK_SIZE
+        encoder (ExportEncoder): Pass one to read its row count afterwards
+    """
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    encoder = encoder or ExportEncoder(fields, fmt, compress)
+    yield encoder.header()
+    rows = _rows(queryset, fields).iterator(chunk_size=chunk_size)
+    while batch := list(islice(rows, chunk_size)):
+        yield encoder.encode(batch)
+    yield encoder.close()
+
+
+async def aexport_chunks(queryset, fields, fmt='csv', compress=False, chunk_size=None, encoder=None):
+    """
+    Async version of export_chunks().
+
+    Each chunk is fetched and encoded in the sync thread (values_list()
+    querysets cannot be read with aiterator()), keeping the cursor and the
+    compression off the event loop.
+    """
+    chunks = export_chunks(queryset, fields, fmt, compress, chunk_size, encoder)
+    while (chunk := await sync_to_async(next)(chunks, None)) is not None:
+        yield chunk
+
+
+def export_filename(queryset, fmt, compress=False):
+    stamp = timezone.localtime().strftime('%Y%m%d-%H%M%S')
+    return f'{queryset.model._meta.model_name}-{stamp}.{fmt}' + ('.gz' if compress else '')
+
+
+def export_response(request, queryset, fields, fmt='csv', compress=False):
+    """
+    A StreamingHttpResponse downloading the export of `queryset`.
+
+    The content is an async generator for an ASGIRequest and a plain one
+    for a WSGIRequest, whatever ASYNC_VIEWS says.
+    """
+    chunks = aexport_chunks if isinstance(request, ASGIRequest) else export_chunks
+    response = StreamingHttpResponse(
+        chunks(queryset, fields, fmt, compress),
+        content_type='application/gzip' if compress else FORMATS[fmt],
+    )
+    response.headers['Content-Disposition'] = (
+        f'attachment; filename="{export_filename(queryset, fmt, compress)}"'
+    )
+    return response
+
+
+class ExportActionsMixin:
+    """
+    ModelAdmin mixin adding "Export as CSV / JSON Lines" actions.
+
+    The actions export the selected rows, or the whole filtered changelist
+    with "select all", reading only `export_fields`.
+    """
+    export_fields = ()
+    export_ordering = ('pk',)
+    export_gzip = False
+    actions = ('export_csv', 'export_jsonl')
+
+    def _export(self, request, queryset, fmt):
+        queryset = queryset.order_by(*self.export_ordering)
+        return export_response(request, queryset, self.export_fields, fmt, self.export_gzip)
+
+    @admin.action(description='Export selected %(verbose_name_plural)s as CSV', permissions=['view'])
+    def export_csv(self, request, queryset):
+        return self._export(request, queryset, 'csv')
+
+    @admin.action(description='Export selected %(verbose_name_plural)s as JSON Lines', permissions=['view'])
+    def export_jsonl(self, request, queryset):
+        return self._export(request, queryset, 'jsonl')
+
+
+def _date(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f'Expected a date as YYYY-MM-DD, got {value!r}')
+
+
+class ExportCommand(BaseCommand):
+    """
+    Base for the export_* commands.
+
+    Subclasses set `model`, `fields` and `date_field`, and may add their own
+    filters with add_filters() / filter().
+    """
+    model = None
+    fields = ()
+    date_field = 'created_at'
+    ordering = ('pk',)
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=sorted(FORMATS), default='csv')
+        parser.add_argument('--output', help='File to write (default: standard output).')
+        parser.add_argument('--gzip', action='store_true', help='Compress the output (needs --output).')
+        parser.add_argument('--since', type=_date, help=f'Only rows with {self.date_field} on or after this date.')
+        parser.add_argument('--until', type=_date, help=f'Only rows with {self.date_field} before this date.')
+        parser.add_argument(
+            '--chunk-size', type=int, default=settings.EXPORT_CHUNK_SIZE,
+            help='Rows fetched from the database cursor at a time.',
+        )
+        self.add_filters(parser)
+
+    def add_filters(self, parser):
+        pass
+
+    def filter(self, queryset, options):
+        return queryset
+
+    def get_queryset(self, options):
+        queryset = self.model._default_manager.order_by(*self.ordering)
+        for option, lookup in (('since', 'gte'), ('until', 'lt')):
+            if options[option]:
+                start = timezone.make_aware(datetime.combine(options[option], datetime.min.time()))
+                queryset = queryset.filter(**{f'{self.date_field}__{lookup}': start})
+        return self.filter(queryset, options)
+
+    def handle(self, *args, **options):
+        if options['gzip'] and not options['output']:
+            raise CommandError('--gzip needs --output')
+        encoder = ExportEncoder(self.fields, options['format'], options['gzip'])
+        chunks = export_chunks(
+            self.get_queryset(options), self.fields, chunk_size=options['chunk_size'], encoder=encoder,
+        )
+        if not options['output']:
+            for chunk in chunks:
+                self.stdout.write(chunk.decode(), ending='')
+            return
+        with open(options['output'], 'wb') as output:
+            for chunk in chunks:
+                output.write(chunk)
+        self.stdout.write(f"Exported {encoder.rows} rows to {options['output']}")
@@ -0,0 +1,16 @@
+"""
+Index helpers shared by the apps' models.
+"""
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.db.models.functions import Upper
+
+
+def trigram_index(field, name):
+    """
+    GIN trigram index matching the SQL Django emits for `field__icontains`.
+
+    On PostgreSQL icontains compiles to UPPER(field) LIKE UPPER('%x%'), so
+    the index is built on UPPER(field) to let the planner use it. Needs the
+    pg_trgm extension (flights migration 0004 installs it).
+    """
+    return GinIndex(OpClass(Upper(field), name='gin_trgm_ops'), name=name)
@@ -0,0 +1,196 @@
+"""
+Keyset (cursor) pagination shared by the list views.
+
+Instead of OFFSET, each page remembers the sort key of its first and last
+row in an opaque token and the next query starts right after it. With an
+index on the ordering columns every page costs the same as the first one,
+and rows inserted meanwhile do not shift the pages.
+
+Usage:
+    page = paginate(qs, ('departure_time', 'id'), request.GET.get('cursor'))
+    page.object_list, page.next_cursor, page.previous_cursor
+
+EstimatedCountPaginator is the admin's counterpart: the changelists keep
+their numbered pages, but the total comes from the PostgreSQL planner
+instead of an exact COUNT(*) once it is large.
+"""
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+@dataclass
+class KeysetPage:
+    """One page of results plus the tokens for its neighbours (None at the ends)."""
+    object_list: list
+    next_cursor: str = None
+    previous_cursor: str = None
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def encode_cursor(direction, values):
+    """Pack a direction ('n' or 'p') and the key values into a URL-safe token."""
+    payload = json.dumps([direction, values], default=lambda value: value.isoformat())
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, length=None):
+    """
+    Unpack a token from encode_cursor(); returns None for anything malformed.
+
+    With `length`, a token not holding exactly that many key values is
+    malformed too. Whether the values suit the key fields is only known
+    when they are filtered on (see _prepare()).
+    """
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        direction, values = json.loads(base64.urlsafe_b64decode(padded))
+    except (binascii.Error, ValueError, TypeError):
+        return None
+    if direction not in ('n', 'p') or not isinstance(values, list):
+        return None
+    if length is not None and len(values) != length:
+        return None
+    return direction, values
+
+
+def _flip(field):
+    return field[1:] if field.startswith('-') else f'-{field}'
+
+
+def _after(ordering, values):
+    """
+    Build the filter for rows strictly after `values` in `ordering`.
+
+    For ('a', 'b') this is a >= x AND (a > x OR (a = x AND b > y)); the
+    leading range on the first column lets the database use the index.
+    """
+    first = ordering[0]
+    lookup = 'lte' if first.startswith('-') else 'gte'
+    condition = Q()
+    prefix = {}
+    for field, value in zip(ordering, values):
+        name = field.lstrip('-')
+        op = 'lt' if field.startswith('-') else 'gt'
+        condition |= Q(**prefix, **{f'{name}__{op}': value})
+        prefix[name] = value
+    return Q(**{f'{first.lstrip("-")}__{lookup}': values[0]}) & condition
+
+
+def _key(row, fields):
+    if isinstance(row, dict):
+        return [row[field] for field in fields]
+    return [getattr(row, field) for field in fields]
+
+
+def _prepare(queryset, ordering, cursor, per_page):
+    fields = [field.lstrip('-') for field in ordering]
+    position = decode_cursor(cursor, len(fields))
+    if position is not None:
+        backwards = position[0] == 'p'
+        order = [_flip(field) for field in ordering] if backwards else list(ordering)
+        try:
+            # The lookups convert the values for their fields right away, so
+            # a tampered token fails here rather than in the database.
+            qs = queryset.order_by(*order).filter(_after(order, position[1]))
+            return qs[:per_page + 1], fields, position, backwards
+        except (ValidationError, ValueError, TypeError):
+            pass
+    # No cursor, or a malformed one: the first page.
+    return queryset.order_by(*ordering)[:per_page + 1], fields, None, False
+
+
+def _build_page(rows, fields, position, backwards, per_page):
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    has_next = True if backwards else has_more
+    has_previous = has_more if backwards else position is not None
+    if not rows:
+        return KeysetPage(rows)
+    return KeysetPage(
+        rows,
+        next_cursor=encode_cursor('n', _key(rows[-1], fields)) if has_next else None,
+        previous_cursor=encode_cursor('p', _key(rows[0], fields)) if has_previous else None,
+    )
+
+
+def paginate(queryset, ordering, cursor=None, per_page=20):
+    """
+    Return one KeysetPage of `queryset`.
+
+    Args:
+        queryset: Model or values() queryset; must select the ordering fields
+        ordering (tuple): Unique sort key, e.g. ('departure_time', 'id') or
+            ('-created_at', '-id')
+        cursor (str): Token from a previous page, or None for the first page
+        per_page (int): Page size
+
+    Returns:
+        KeysetPage
+    """
+    qs, fields, position, backwards = _prepare(queryset, ordering, cursor, per_page)
+    return _build_page(list(qs), fields, position, backwards, per_page)
+
+
+async def apaginate(queryset, ordering, cursor=None, per_page=20):
+    """Async version of paginate(), fetching the page with the async ORM."""
+    qs, fields, position, backwards = _prepare(queryset, ordering, cursor, per_page)
+    return _build_page([row async for row in qs], fields, position, backwards, per_page)
+
+
+def estimate_count(queryset):
+    """
+    Row count of `queryset` as estimated by the PostgreSQL planner.
+
+    Costs one EXPLAIN, whatever the table size. Returns None on other
+    databases.
+    """
+    if connections[queryset.db].vendor != 'postgresql':
+        return None
+    plan = json.loads(queryset.order_by().explain(format='json'))
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator counting with planner estimates on large result sets.
+
+    Counts estimated at or below ADMIN_EXACT_COUNT_LIMIT rows are made
+    exact with COUNT(*), which is cheap at that size; above it the
+    estimate is used as is, so the last page numbers may be off. Pair with
+    ModelAdmin.show_full_result_count = False, which drops the changelist's
+    second, unfiltered COUNT(*).
+    """
+
+    @cached_property
+    def count(self):
+        estimate = estimate_count(self.object_list) if hasattr(self.object_list, 'explain') else None
+        if estimate is None or estimate <= settings.ADMIN_EXACT_COUNT_LIMIT:
+            return super().count
+        return estimate
@@ -45,11 +45,13 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'accounts',
     'flights',
     'payments',
     'logs',
-    'bookings'
+    'bookings',
+    'jobs',
 ]
 
 MIDDLEWARE = [
@@ -81,6 +83,12 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'airline_booking.wsgi.application'
 
+# Route flight search/detail, booking and my-bookings to their native async
+# views. asgi.py turns this on unless the environment says otherwise; under
+# WSGI (runserver, gunicorn) the sync views avoid running every request
+# through an event loop.
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', '0') == '1'
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
@@ -139,6 +147,8 @@ STATIC_URL = 'static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AUTH_USER_MODEL = 'accounts.User'
 
+TEST_RUNNER = 'airline_booking.testing.TestRunner'
+
 # Email Configuration (for email verification)
 # Using console backend for development
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
@@ -152,6 +162,107 @@ EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 DEFAULT_FROM_EMAIL = 'noreply@airlinebooking.com'
 EMAIL_TIMEOUT = 10
 
+# Seat holds: how long seats stay reserved during checkout
+SEAT_HOLD_MINUTES = 10
+
+# Group bookings: most seats one hold or booking request may take at once;
+# larger requests are rejected
+GROUP_BOOKING_MAX_SEATS = 30
+
+# Waitlist (bookings/waitlist.py): how long a seat freed for a waitlisted
+# customer stays held for them, and the site address used in the email
+# telling them so (set SITE_URL in each deployment's environment)
+WAITLIST_HOLD_MINUTES = 60
+SITE_URL = os.environ.get('SITE_URL', 'http://localhost:8000').rstrip('/')
+
+# Cache used for flight search results (swap for Redis/Memcached in production)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'airline-booking',
+    }
+}
+
+# Flight search cache: entry lifetime in seconds (bounds how long departed
+# flights can linger) and the number of routes tracked per search before
+# falling back to the global version
+SEARCH_CACHE_TIMEOUT = 60
+SEARCH_CACHE_MAX_ROUTES = 50
+
+# City autocomplete: seconds before a worker reloads its in-memory index
+AUTOCOMPLETE_MAX_AGE = 300
+
+# Admin changelists (airline_booking.pagination.EstimatedCountPaginator):
+# planner estimates above this many rows are shown instead of an exact count
+ADMIN_EXACT_COUNT_LIMIT = 10000
+
+# CSV / JSON Lines exports (airline_booking/exports.py): rows fetched from
+# the server-side cursor and encoded per chunk
+EXPORT_CHUNK_SIZE = 2000
+
+# JSON API (flights/api.py): search rows fetched and written per chunk of
+# the streamed response
+API_STREAM_CHUNK_SIZE = 500
+
+# Connecting-flight search (flights/connections.py): layover limits in
+# minutes, most stops per itinerary, itineraries shown, days searched when
+# no date is given, and seconds before a worker reloads its route graph
+CONNECTION_MIN_LAYOVER = 45
+CONNECTION_MAX_LAYOVER = 360
+CONNECTION_MAX_STOPS = 2
+CONNECTION_MAX_RESULTS = 20
+CONNECTION_SEARCH_DAYS = 3
+CONNECTION_GRAPH_MAX_AGE = 300
+
+# Fare calendar: days shown either side of the searched date, and the most
+# the JSON endpoint accepts
+FARE_CALENDAR_DAYS = 3
+FARE_CALENDAR_MAX_DAYS = 15
+
+# Dynamic pricing (flights/pricing.py): price = base_price × the two curves
+# below, each a list of (x, multiplier) points interpolated linearly and
+# held flat past the ends; x is the share of capacity sold and the days
+# left before departure. The product is clamped to [MIN, MAX] and the
+# price rounded to a multiple of PRICING_ROUND_TO.
+PRICING_CURVES = {
+    'load_factor': [(0.0, 0.85), (0.5, 1.0), (0.8, 1.25), (0.95, 1.6), (1.0, 1.8)],
+    'days_to_departure': [(0, 1.4), (3, 1.25), (14, 1.05), (30, 1.0), (90, 0.9)],
+}
+PRICING_MIN_MULTIPLIER = 0.5
+PRICING_MAX_MULTIPLIER = 3.0
+PRICING_ROUND_TO = 1
+
+# Background jobs (jobs/queue.py): attempts before a job is marked failed,
+# retry backoff in seconds (doubling from BASE up to MAX) and how long a
+# running job may go unfinished before another worker takes it over
+JOBS_MAX_ATTEMPTS = 5
+JOBS_RETRY_BASE_DELAY = 30
+JOBS_RETRY_MAX_DELAY = 3600
+JOBS_LEASE_SECONDS = 300
+
+# Audit trail (logs/audit.py): events are buffered in memory and written to
+# the Log table in batches of AUDIT_BATCH_SIZE or every AUDIT_FLUSH_INTERVAL
+# seconds. A full buffer drops new events ("drop") or waits up to
+# AUDIT_BLOCK_TIMEOUT seconds for room ("block").
+AUDIT_BUFFER_SIZE = 10000
+AUDIT_BATCH_SIZE = 500
+AUDIT_FLUSH_INTERVAL = 2
+AUDIT_OVERFLOW = 'drop'
+AUDIT_BLOCK_TIMEOUT = 0.05
+AUDIT_BACKGROUND_FLUSH = True
+
+# Log table partitions (logs/partitions.py): months created in advance,
+# months kept in the database, and where older months are archived as
+# gzip-compressed JSON lines (point LOG_ARCHIVE_DIR at durable storage in
+# production; the in-tree default is git-ignored)
+LOG_PARTITIONS_AHEAD = 3
+LOG_RETENTION_MONTHS = 12
+LOG_ARCHIVE_DIR = os.environ.get('LOG_ARCHIVE_DIR', os.path.join(BASE_DIR, 'logs', 'archive'))
+
+# Wallet ledger: transactions per user between balance checkpoints
+# (payments/checkpoints.py); bounds the rows read by a balance query
+BALANCE_CHECKPOINT_EVERY = 50
+
 # Login URL for @login_required redirects
 LOGIN_URL = 'accounts:login'
 LOGIN_REDIRECT_URL = 'flights:list'
@@ -235,5 +346,10 @@ LOGGING = {
             'level': 'INFO',
             'propagate': False,
         },
+        'jobs': {
+            'handlers': ['console', 'file'],
+            'level': 'INFO',
+            'propagate': False,
+        },
     }
 }
\ No newline at end of file
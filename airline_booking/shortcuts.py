@@ -0,0 +1,16 @@
+"""
+Shortcuts shared by the async views.
+"""
+from django.shortcuts import render
+
+
+async def arender(request, template_name, context=None, status=None):
+    """
+    render() for async views.
+
+    Resolves request.user through the async auth API first; otherwise the
+    auth context processor would load it lazily with a synchronous query
+    while the template renders, which Django forbids in an async context.
+    """
+    request.user = await request.auser()
+    return render(request, template_name, context, status=status)
@@ -0,0 +1,72 @@
+"""
+Shared test helpers.
+"""
+import importlib
+import sys
+
+from django.apps import apps
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import connection
+from django.dispatch import receiver
+from django.test.runner import DiscoverRunner
+from django.urls import clear_url_caches
+
+
+@receiver(setting_changed)
+def reload_urlconfs(setting, **kwargs):
+    """
+    Re-resolve the URLconfs when a test overrides ASYNC_VIEWS.
+
+    The project's urls.py modules pick the sync or async view of each pair
+    at import time, so override_settings(ASYNC_VIEWS=...) only takes effect
+    once they are imported again. The app URLconfs are reloaded before the
+    root one, whose include()s would otherwise keep the old patterns.
+    """
+    if setting != 'ASYNC_VIEWS':
+        return
+    modules = [
+        f'{app.name}.urls' for app in apps.get_app_configs()
+        if app.path.startswith(str(settings.BASE_DIR))
+    ]
+    for name in modules + [settings.ROOT_URLCONF]:
+        if name in sys.modules:
+            importlib.reload(sys.modules[name])
+    clear_url_caches()
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Test runner that keeps the audit buffer from flushing in the background.
+
+    A flusher thread would write events on its own connection, outside the
+    test transaction that created their users. Tests that check the audit
+    trail call audit_log.flush() themselves.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        settings.AUDIT_BACKGROUND_FLUSH = False
+
+
+class QueryPlanMixin:
+    """
+    Assertions on PostgreSQL query plans for plan regression tests.
+
+    Sequential scans are disabled for the current test transaction, so the
+    planner only picks one when no usable index exists for the query. Test
+    tables stay tiny, and without this the planner would rightly prefer a
+    sequential scan anyway.
+    """
+
+    def assertUsesIndex(self, queryset, index_name=None):
+        """Fail if `queryset` plans a sequential scan (or misses `index_name`)."""
+        if connection.vendor != 'postgresql':
+            self.skipTest('Query plan tests need PostgreSQL')
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        plan = queryset.explain()
+        self.assertNotIn('Seq Scan', plan, f'Sequential scan in plan:\n{plan}')
+        if index_name:
+            self.assertIn(index_name, plan, f'{index_name} not used:\n{plan}')
@@ -0,0 +1,228 @@
+"""
+Benchmark the WSGI and ASGI code paths of the flight search/booking views.
+
+Usage:
+    python benchmarks/asgi_vs_wsgi.py [--requests 4000] [--concurrency 50]
+
+Each path runs in its own child process against a throwaway test database:
+
+- wsgi: ASYNC_VIEWS=0, airline_booking.wsgi.application called from a pool
+  of `concurrency` threads (what a threaded WSGI server does)
+- asgi: ASYNC_VIEWS=1, airline_booking.asgi.application called from
+  `concurrency` concurrent tasks on one event loop (what uvicorn/daphne do)
+
+The applications are driven in-process with hand-built WSGI environs and
+ASGI scopes, so the figures compare Django's handlers and our views
+without any HTTP server or network overhead. The request mix is flight
+list searches, flight details, My Bookings pages and bookings. Reports
+requests/second plus p50/p99 latency per path.
+"""
+import argparse
+import asyncio
+import io
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+CITIES = ['Tehran', 'Mashhad', 'Shiraz', 'Isfahan', 'Tabriz', 'Kish', 'Ahvaz', 'Rasht']
+
+
+def setup_django():
+    sys.path.insert(0, str(ROOT))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'airline_booking.settings')
+    import django
+    django.setup()
+    logging.disable(logging.INFO)
+
+    from django.conf import settings
+    settings.ALLOWED_HOSTS = ['testserver']
+
+
+def seed():
+    """Create a test database with routes, flights and a logged-in user."""
+    from datetime import timedelta
+    from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+    from django.contrib.sessions.backends.db import SessionStore
+    from django.db import connection
+    from django.utils import timezone
+    from accounts.models import User
+    from flights.models import Flight, Route
+
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+
+    routes = [
+        Route.objects.create(origin=origin, destination=destination)
+        for origin in CITIES for destination in CITIES if origin != destination
+    ]
+    now = timezone.now()
+    flights = Flight.objects.bulk_create(
+        Flight(
+            route=route, origin=route.origin, destination=route.destination,
+            departure_time=now + timedelta(hours=i * 7 + j), price=100 + j,
+            seats_available=100_000, airplane_type='A320', cancel_penalty_percent=10,
+            airline_name='Iran Air',
+        )
+        for i, route in enumerate(routes) for j in range(20)
+    )
+
+    user = User.objects.create(username='benchmark', wallet=10**9)
+    session = SessionStore()
+    session[SESSION_KEY] = str(user.pk)
+    session[BACKEND_SESSION_KEY] = 'django.contrib.auth.backends.ModelBackend'
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session.save()
+    return [flight.id for flight in flights], f'sessionid={session.session_key}'
+
+
+def request_mix(count, flight_ids):
+    rng = random.Random(42)
+    mix = []
+    for _ in range(count):
+        roll = rng.random()
+        if roll < 0.4:
+            mix.append(('/flights/', f'origin={rng.choice(CITIES)}'))
+        elif roll < 0.7:
+            mix.append((f'/flights/{rng.choice(flight_ids)}/', ''))
+        elif roll < 0.9:
+            mix.append(('/bookings/my/', ''))
+        else:
+            mix.append((f'/bookings/book/{rng.choice(flight_ids)}/', ''))
+    return mix
+
+
+def run_wsgi(mix, cookie, concurrency):
+    from airline_booking.wsgi import application
+
+    def call(item):
+        path, query = item
+        environ = {
+            'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query,
+            'SERVER_NAME': 'testserver', 'SERVER_PORT': '80', 'HTTP_HOST': 'testserver',
+            'HTTP_COOKIE': cookie, 'SERVER_PROTOCOL': 'HTTP/1.1',
+            'wsgi.input': io.BytesIO(b''), 'wsgi.errors': sys.stderr,
+            'wsgi.url_scheme': 'http', 'wsgi.multithread': True, 'wsgi.multiprocess': False,
+            'wsgi.run_once': False, 'wsgi.version': (1, 0),
+        }
+        status = []
+        started = time.perf_counter()
+        response = application(environ, lambda s, headers, exc_info=None: status.append(s))
+        try:
+            for _ in response:
+                pass
+        finally:
+            response.close()
+        return time.perf_counter() - started, int(status[0].split()[0])
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(call, mix))
+
+
+def run_asgi(mix, cookie, concurrency):
+    from airline_booking.asgi import application
+
+    async def call(path, query):
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+            'method': 'GET', 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+            'query_string': query.encode(), 'root_path': '',
+            'headers': [(b'host', b'testserver'), (b'cookie', cookie.encode())],
+            'client': ('127.0.0.1', 50000), 'server': ('testserver', 80),
+        }
+        body_sent = False
+        disconnect = asyncio.Event()
+        status = []
+
+        async def receive():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            await disconnect.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status.append(message['status'])
+
+        started = time.perf_counter()
+        await application(scope, receive, send)
+        return time.perf_counter() - started, status[0]
+
+    async def main():
+        queue = list(reversed(mix))
+        results = []
+
+        async def worker():
+            while queue:
+                results.append(await call(*queue.pop()))
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return results
+
+    return asyncio.run(main())
+
+
+def child(mode, requests, concurrency):
+    setup_django()
+    flight_ids, cookie = seed()
+    runner = run_wsgi if mode == 'wsgi' else run_asgi
+    runner(request_mix(200, flight_ids), cookie, concurrency)  # warm-up
+
+    mix = request_mix(requests, flight_ids)
+    started = time.perf_counter()
+    results = runner(mix, cookie, concurrency)
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for latency, _ in results)
+    errors = sum(1 for _, status in results if status >= 400)
+    print(json.dumps({
+        'mode': mode,
+        'requests': len(results),
+        'errors': errors,
+        'rps': len(results) / elapsed,
+        'p50_ms': latencies[len(latencies) // 2] * 1000,
+        'p99_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+    }))
+
+    from django.db import connection
+    connection.creation.destroy_test_db(connection.settings_dict['NAME'], verbosity=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--requests', type=int, default=4000)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--child', choices=['wsgi', 'asgi'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.requests, args.concurrency)
+        return
+
+    rows = []
+    for mode in ('wsgi', 'asgi'):
+        env = dict(os.environ, ASYNC_VIEWS='1' if mode == 'asgi' else '0')
+        output = subprocess.run(
+            [sys.executable, __file__, '--child', mode,
+             '--requests', str(args.requests), '--concurrency', str(args.concurrency)],
+            env=env, check=True, capture_output=True, text=True,
+        ).stdout
+        rows.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(f"{'path':<6}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for row in rows:
+        print(
+            f"{row['mode']:<6}{row['requests']:>10}{row['errors']:>8}"
+            f"{row['rps']:>10.1f}{row['p50_ms']:>10.1f}{row['p99_ms']:>10.1f}"
+        )
+
+
+if __name__ == '__main__':
+    main()
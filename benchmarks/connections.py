@@ -0,0 +1,142 @@
+"""
+Benchmark connecting-flight search on a synthetic route network.
+
+Usage:
+    python benchmarks/connections.py [--cities 150] [--routes 3000]
+        [--flights-per-route 6] [--searches 300]
+
+Seeds a throwaway test database with `cities` cities joined by `routes`
+random routes (a few hubs get most of them, as real networks do), each
+with `flights_per_route` departures on the search day. Then runs
+`searches` random city-pair searches through flights.connections and
+reports, per search:
+
+- graph: building the in-memory route graph from Route (once per process)
+- paths: enumerating 1-2 stop paths in the graph
+- query: the single flight query for every route on those paths
+- match: bisect matching of legs within the layover limits
+
+The search cache is bypassed so every search does the full work.
+"""
+import argparse
+import datetime
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def setup_django():
+    sys.path.insert(0, str(ROOT))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'airline_booking.settings')
+    import django
+    django.setup()
+    logging.disable(logging.INFO)
+
+
+def seed(cities, routes, flights_per_route, day):
+    """Create a test database with a hub-heavy random route network."""
+    from django.db import connection
+    from django.utils import timezone
+    from flights.models import Flight, Route
+
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+
+    rng = random.Random(42)
+    names = [f'City {i:04d}' for i in range(cities)]
+    # Zipf-like weights: low-numbered cities are hubs.
+    weights = [1 / (i + 1) for i in range(cities)]
+    pairs = set()
+    while len(pairs) < routes:
+        origin, destination = rng.choices(names, weights, k=2)
+        if origin != destination:
+            pairs.add((origin, destination))
+    route_objs = Route.objects.bulk_create(
+        Route(origin=origin, destination=destination) for origin, destination in sorted(pairs)
+    )
+
+    midnight = timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+    Flight.objects.bulk_create(
+        (
+            Flight(
+                route=route, origin=route.origin, destination=route.destination,
+                departure_time=midnight + datetime.timedelta(minutes=rng.randrange(0, 48 * 60, 5)),
+                duration_minutes=rng.randrange(45, 240, 5), price=rng.randrange(50, 400),
+                seats_available=100, airplane_type='A320', cancel_penalty_percent=10,
+                airline_name='Iran Air',
+            )
+            for route in route_objs for _ in range(flights_per_route)
+        ),
+        batch_size=5000,
+    )
+    return names
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - started
+
+
+def run(names, searches, day):
+    from django.conf import settings
+    from flights import connections
+
+    rng = random.Random(7)
+    graph, graph_seconds = timed(connections.route_graph.get)
+    start, end = connections._window(day)
+    stops = settings.CONNECTION_MAX_STOPS
+
+    samples = {'paths': [], 'query': [], 'match': [], 'total': []}
+    found = path_counts = 0
+    for _ in range(searches):
+        origin, destination = rng.sample(names, 2)
+        (paths, route_ids), paths_seconds = timed(connections._plan, graph, origin, destination)
+        rows, query_seconds = timed(lambda: list(connections._flight_query(route_ids, start, end, stops)))
+        itineraries, match_seconds = timed(
+            lambda: connections.match_itineraries(connections.Timetable(rows), paths, start, end)
+        )
+        samples['paths'].append(paths_seconds)
+        samples['query'].append(query_seconds)
+        samples['match'].append(match_seconds)
+        samples['total'].append(paths_seconds + query_seconds + match_seconds)
+        found += bool(itineraries)
+        path_counts += len(paths)
+
+    print(f'graph: {len(graph)} routes built in {graph_seconds * 1000:.1f} ms')
+    print(f'searches: {searches}, with itineraries: {found}, mean paths/search: {path_counts / searches:.0f}')
+    print(f"{'step':<8}{'p50 ms':>10}{'p99 ms':>10}{'mean ms':>10}")
+    for step, values in samples.items():
+        values.sort()
+        print(
+            f'{step:<8}{values[len(values) // 2] * 1000:>10.2f}'
+            f'{values[min(len(values) - 1, int(len(values) * 0.99))] * 1000:>10.2f}'
+            f'{statistics.fmean(values) * 1000:>10.2f}'
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--cities', type=int, default=150)
+    parser.add_argument('--routes', type=int, default=3000)
+    parser.add_argument('--flights-per-route', type=int, default=6)
+    parser.add_argument('--searches', type=int, default=300)
+    args = parser.parse_args()
+
+    setup_django()
+    day = datetime.date.today() + datetime.timedelta(days=7)
+    names = seed(args.cities, args.routes, args.flights_per_route, day)
+    try:
+        run(names, args.searches, day)
+    finally:
+        from django.db import connection
+        connection.creation.destroy_test_db(connection.settings_dict['NAME'], verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
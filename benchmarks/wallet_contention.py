@@ -0,0 +1,108 @@
+"""
+Benchmark parallel bookings that all debit the same wallet.
+
+Usage:
+    python benchmarks/wallet_contention.py [--attempts 200] [--workers 24]
+        [--affordable 40]
+
+Seeds a throwaway test database with one customer whose wallet covers
+`affordable` seats and one flight with a seat for every attempt, so the
+wallet is the only thing that can stop a booking. Then calls the
+book_flight view `attempts` times from a pool of `workers` threads (what
+a threaded WSGI server does) and reports bookings/second, p50/p99 latency
+and the response codes: `affordable` 302s, the rest 402s.
+
+payments.tests.ConcurrentWalletTests checks the same race for correctness.
+"""
+import argparse
+import collections
+import datetime
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+PRICE = 100
+
+
+def setup_django():
+    sys.path.insert(0, str(ROOT))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'airline_booking.settings')
+    import django
+    django.setup()
+    logging.disable(logging.INFO)
+
+
+def seed(attempts, affordable):
+    """Create a test database with one funded customer and one roomy flight."""
+    from django.db import connection
+    from django.utils import timezone
+    from accounts.models import User
+    from flights.models import Flight, Route
+
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+
+    user = User.objects.create(username='passenger', wallet=PRICE * affordable)
+    route = Route.objects.create(origin='Tehran', destination='Mashhad')
+    flight = Flight.objects.create(
+        route=route, origin=route.origin, destination=route.destination,
+        departure_time=timezone.now() + datetime.timedelta(days=7), duration_minutes=90,
+        price=PRICE, seats_available=attempts, airplane_type='A320', cancel_penalty_percent=10,
+        airline_name='Iran Air',
+    )
+    return user.pk, flight.pk
+
+
+def run(user_id, flight_id, attempts, workers):
+    from django.db import connection
+    from django.test import RequestFactory
+    from accounts.models import User
+    from bookings.views import book_flight
+
+    factory = RequestFactory()
+
+    def book(_):
+        request = factory.get('/')
+        request.user = User.objects.get(pk=user_id)
+        started = time.perf_counter()
+        try:
+            return book_flight(request, flight_id).status_code, time.perf_counter() - started
+        finally:
+            connection.close()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(book, range(attempts)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(seconds for _, seconds in results)
+    codes = collections.Counter(code for code, _ in results)
+    print(f'{attempts} bookings from {workers} threads in {elapsed:.2f}s ({attempts / elapsed:.0f} req/s)')
+    print(
+        f'p50 {latencies[len(latencies) // 2] * 1000:.1f} ms, '
+        f'p99 {latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000:.1f} ms'
+    )
+    print('responses: ' + ', '.join(f'{code} x{count}' for code, count in sorted(codes.items())))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--attempts', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=24)
+    parser.add_argument('--affordable', type=int, default=40)
+    args = parser.parse_args()
+
+    setup_django()
+    user_id, flight_id = seed(args.attempts, args.affordable)
+    try:
+        run(user_id, flight_id, args.attempts, args.workers)
+    finally:
+        from django.db import connection
+        connection.creation.destroy_test_db(connection.settings_dict['NAME'], verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,26 +1,44 @@
 from django.contrib import admin
-from .models import Booking
+
+from airline_booking.admin_search import IndexedSearchMixin
+from airline_booking.exports import ExportActionsMixin
+from airline_booking.pagination import EstimatedCountPaginator
+from .models import Booking, SeatHold, WaitlistEntry
 
 
 @admin.register(Booking)
-class BookingAdmin(admin.ModelAdmin):
+class BookingAdmin(IndexedSearchMixin, ExportActionsMixin, admin.ModelAdmin):
     """
     Admin interface for Booking model.
     
     Features:
     - List display with key booking information
     - Filtering by status and creation date
-    - Search by user and flight information
+    - Search by user and flight information, each through its own index
     - Custom manager usage for efficient querying
+    - Streaming CSV / JSON Lines export of the selected bookings
+    - Estimated counts and autocomplete user/flight pickers, so neither the
+      list nor the form reads a whole table
     """
     list_display = ('id', 'user', 'flight', 'status', 'price_paid', 'created_at')
     list_filter = ('status', 'created_at')
     search_fields = ('user__username', 'flight__origin', 'flight__destination')
-    readonly_fields = ('created_at', 'canceled_at')
+    readonly_fields = ('created_at', 'canceled_at', 'group')
+    autocomplete_fields = ('user', 'flight')
+    # Newest first through the primary key; Meta.ordering's created_at has no
+    # index of its own.
+    ordering = ('-id',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    export_fields = (
+        'id', 'user_id', 'user__username', 'flight_id', 'flight__origin', 'flight__destination',
+        'flight__departure_time', 'status', 'price_paid', 'penalty_amount', 'final_refund',
+        'created_at', 'canceled_at', 'group',
+    )
     
     fieldsets = (
         ('Booking Information', {
-            'fields': ('user', 'flight', 'status', 'created_at', 'canceled_at')
+            'fields': ('user', 'flight', 'status', 'group', 'created_at', 'canceled_at')
         }),
         ('Financial Information', {
             'fields': ('price_paid', 'penalty_amount', 'final_refund')
@@ -30,4 +48,43 @@ class BookingAdmin(admin.ModelAdmin):
     def get_queryset(self, request):
         """Override to use custom manager efficiently."""
         qs = super().get_queryset(request)
-        return qs.select_related('user', 'flight')
\ No newline at end of file
+        return qs.select_related('user', 'flight')
+
+
+@admin.register(SeatHold)
+class SeatHoldAdmin(IndexedSearchMixin, admin.ModelAdmin):
+    """
+    Admin interface for SeatHold model.
+
+    Shows seats currently reserved during checkout and when they expire.
+    """
+    list_display = ('id', 'user', 'flight', 'seats', 'created_at', 'expires_at')
+    list_filter = ('expires_at',)
+    search_fields = ('user__username', 'flight__origin', 'flight__destination')
+    readonly_fields = ('created_at',)
+    autocomplete_fields = ('user', 'flight')
+
+    def get_queryset(self, request):
+        """Override to use select_related efficiently."""
+        qs = super().get_queryset(request)
+        return qs.select_related('user', 'flight')
+
+
+@admin.register(WaitlistEntry)
+class WaitlistEntryAdmin(IndexedSearchMixin, admin.ModelAdmin):
+    """
+    Admin interface for WaitlistEntry model.
+
+    Shows who is queued for sold-out flights and when they were promoted.
+    """
+    list_display = ('id', 'user', 'flight', 'status', 'created_at', 'promoted_at')
+    list_filter = ('status',)
+    search_fields = ('user__username', 'flight__origin', 'flight__destination')
+    readonly_fields = ('created_at', 'promoted_at')
+    autocomplete_fields = ('user', 'flight')
+    ordering = ('-id',)
+
+    def get_queryset(self, request):
+        """Override to use select_related efficiently."""
+        qs = super().get_queryset(request)
+        return qs.select_related('user', 'flight')
@@ -0,0 +1,175 @@
+"""
+Set-based cancellations: a whole flight by the airline, or a whole group
+booking by its customer.
+
+cancel_flight() works in one transaction and a fixed number of statements,
+however many passengers the flight has:
+
+1. close the flight (flights.inventory.close_flight), which takes its
+   remaining seats off sale and locks it against bookings racing with the
+   cancellation
+2. delete its seat holds and drop its waitlist
+3. cancel every active booking with a single UPDATE ... RETURNING; the
+   refund is computed in SQL as the full price paid, since the passenger
+   did not choose to cancel, so cancel_penalty_percent does not apply
+4. pay all refunds through payments.wallet.credit_many(): one wallet
+   UPDATE, one bulk INSERT of refund Transactions, one checkpoint statement
+
+Each passenger gets the same 'cancel' and 'refund' audit events as a
+cancellation of their own; they go through the buffered audit log, not
+one INSERT each.
+
+cancel_group() does the same for the bookings of one group booking
+(Booking.group): one UPDATE ... RETURNING applies the flight's cancel
+penalty to each seat, the freed seats go to the flight's waitlist or back
+on sale with one statement, and the refunds are paid through
+credit_many(), so the query count does not depend on the group size.
+"""
+import logging
+from dataclasses import dataclass, field
+from uuid import UUID
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from flights.inventory import close_flight, release_seats
+from flights.models import Flight
+from logs.audit import audit_log
+from payments.models import Transaction
+from payments.wallet import credit_many
+from .models import Booking, SeatHold, WaitlistEntry
+from .waitlist import promote_waitlist
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class FlightCancellation:
+    """Outcome of cancel_flight()."""
+    flight_id: int
+    bookings: int = 0
+    refunded: int = 0
+    wallets: int = 0
+
+
+@dataclass
+class GroupCancellation:
+    """Outcome of cancel_group()."""
+    group: UUID
+    flight_id: int = None
+    bookings: list = field(default_factory=list)
+    penalty: int = 0
+    refunded: int = 0
+
+
+def cancel_flight(flight_id, now=None):
+    """
+    Cancel a flight: every active booking on it is canceled and fully refunded.
+
+    Args:
+        flight_id (int): Flight primary key
+        now (datetime): canceled_at of the bookings, defaults to timezone.now()
+
+    Returns:
+        FlightCancellation | None: None if the flight does not exist
+    """
+    now = now or timezone.now()
+    table = connection.ops.quote_name(Booking._meta.db_table)
+    with transaction.atomic():
+        if not close_flight(flight_id):
+            return None
+        SeatHold.objects.filter(flight_id=flight_id).delete()
+        WaitlistEntry.objects.waiting().filter(flight_id=flight_id).update(status='canceled')
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {table} SET status = 'canceled', penalty_amount = 0, "
+                f"final_refund = price_paid, canceled_at = %s "
+                f"WHERE flight_id = %s AND status = 'active' "
+                f"RETURNING id, user_id, final_refund",
+                [now, flight_id],
+            )
+            canceled = cursor.fetchall()
+        refunds = [
+            Transaction(
+                user_id=user_id, amount=refund, type='refund', booking_id=booking_id,
+                description=f'Refund of booking {booking_id}: flight {flight_id} canceled',
+            )
+            for booking_id, user_id, refund in canceled
+            if refund
+        ]
+        wallets = credit_many(refunds)
+
+    for booking_id, user_id, refund in canceled:
+        audit_log.record('cancel', user_id, details=f'Booking {booking_id}, flight {flight_id} canceled, refund {refund}')
+        if refund:
+            audit_log.record('refund', user_id, details=f'Booking {booking_id}, amount {refund}')
+
+    result = FlightCancellation(
+        flight_id, bookings=len(canceled), refunded=sum(entry.amount for entry in refunds), wallets=wallets,
+    )
+    logger.info(
+        f'Flight {flight_id} canceled: {result.bookings} bookings canceled, '
+        f'{result.refunded} refunded to {result.wallets} wallets'
+    )
+    return result
+
+
+def cancel_group(user, group, now=None):
+    """
+    Cancel every active booking of a user's group booking.
+
+    The cancel penalty of the flight applies to each seat, as if each
+    passenger had been canceled on their own.
+
+    Args:
+        user: Owner of the group booking
+        group (UUID): Booking.group shared by the bookings
+        now (datetime): canceled_at of the bookings, defaults to timezone.now()
+
+    Returns:
+        GroupCancellation: with no bookings if none of the group was still
+        active (or the group is not the user's)
+    """
+    now = now or timezone.now()
+    table = connection.ops.quote_name(Booking._meta.db_table)
+    flights = connection.ops.quote_name(Flight._meta.db_table)
+    group_column = connection.ops.quote_name('group')
+    penalty = 'b.price_paid * f.cancel_penalty_percent / 100'
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            # Conditional on status, like cancel_booking, so a seat canceled
+            # concurrently on its own is neither released nor refunded twice.
+            cursor.execute(
+                f"UPDATE {table} b SET status = 'canceled', penalty_amount = {penalty}, "
+                f"final_refund = b.price_paid - {penalty}, canceled_at = %s "
+                f"FROM {flights} f WHERE f.id = b.flight_id AND b.{group_column} = %s "
+                f"AND b.user_id = %s AND b.status = 'active' "
+                f"RETURNING b.id, b.flight_id, b.penalty_amount, b.final_refund",
+                [now, group, user.pk],
+            )
+            canceled = cursor.fetchall()
+        if not canceled:
+            return GroupCancellation(group)
+
+        flight_id = canceled[0][1]
+        freed = len(canceled) - len(promote_waitlist(flight_id, len(canceled), now))
+        if freed:
+            release_seats(flight_id, freed)
+        credit_many([
+            Transaction(
+                user_id=user.pk, amount=refund, type='refund', booking_id=booking_id,
+                description=f'Cancellation of booking {booking_id}',
+            )
+            for booking_id, _, _, refund in canceled
+            if refund
+        ])
+
+    result = GroupCancellation(
+        group, flight_id, bookings=[booking_id for booking_id, _, _, _ in canceled],
+        penalty=sum(row[2] for row in canceled), refunded=sum(row[3] for row in canceled),
+    )
+    logger.info(
+        f'User {user.username} canceled group booking {group} on flight {flight_id}: '
+        f'{len(canceled)} bookings, penalty {result.penalty}, refund {result.refunded}'
+    )
+    return result
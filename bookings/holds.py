@@ -0,0 +1,107 @@
+"""
+Seat holds: reserve seats for a few minutes while the customer checks out.
+
+A hold takes its seats from Flight.seats_available up front (through
+flights.inventory), so the flight list and detail pages show held seats as
+gone without any extra query. Booking consumes the hold; expired holds are
+handed back in bulk by release_expired_holds(), or passed on to the
+flight's waitlist (bookings.waitlist) when customers are waiting for it.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from flights.inventory import take_seats, release_seat_counts
+from .models import SeatHold
+from .waitlist import flights_with_waitlist, promote_waitlist
+
+
+def create_hold(user, flight, seats=1, minutes=None):
+    """
+    Reserve seats on a flight for a limited time.
+
+    Args:
+        user: Customer the seats are held for
+        flight (Flight): Flight to hold seats on
+        seats (int): Number of seats to hold
+        minutes (int): Hold lifetime, defaults to settings.SEAT_HOLD_MINUTES
+
+    Returns:
+        SeatHold | None: The new hold, or None if not enough seats are left
+    """
+    minutes = minutes or settings.SEAT_HOLD_MINUTES
+    with transaction.atomic():
+        if take_seats(flight.id, seats) is None:
+            return None
+        return SeatHold.objects.create(
+            user=user,
+            flight=flight,
+            seats=seats,
+            expires_at=timezone.now() + timedelta(minutes=minutes),
+        )
+
+
+def claim_hold(user, hold_id, flight_id):
+    """
+    Consume an active hold so its seats can be turned into bookings.
+
+    Must run inside the same transaction as the Booking insert: the seats
+    are already taken, so rolling back simply restores the hold.
+
+    Returns:
+        int: Number of seats claimed, 0 if the hold is missing or expired
+    """
+    hold = (
+        SeatHold.objects.active()
+        .select_for_update()
+        .filter(pk=hold_id, user=user, flight_id=flight_id)
+        .first()
+    )
+    if hold is None:
+        return 0
+    hold.delete()
+    return hold.seats
+
+
+def release_expired_holds(batch_size=1000):
+    """
+    Delete expired holds and give their seats back to the flights.
+
+    Works in batches of set-based statements: one locked SELECT over the
+    expires_at index, one DELETE and one UPDATE covering every affected
+    flight. Rows locked by a concurrent claim_hold() are skipped. Seats of
+    flights with a waitlist go to the customers waiting first; only the
+    flights that have one cost extra statements.
+
+    Returns:
+        int: Number of holds released
+    """
+    released = 0
+    while True:
+        with transaction.atomic():
+            expired = list(
+                SeatHold.objects.expired()
+                .select_for_update(skip_locked=True)
+                .values_list('id', 'flight_id', 'seats')[:batch_size]
+            )
+            if not expired:
+                break
+
+            seats_by_flight = defaultdict(int)
+            for _, flight_id, seats in expired:
+                seats_by_flight[flight_id] += seats
+
+            SeatHold.objects.filter(pk__in=[hold_id for hold_id, _, _ in expired]).delete()
+            for flight_id in flights_with_waitlist(seats_by_flight):
+                seats_by_flight[flight_id] -= len(promote_waitlist(flight_id, seats_by_flight[flight_id]))
+            release_seat_counts({
+                flight_id: seats for flight_id, seats in seats_by_flight.items() if seats
+            })
+
+        released += len(expired)
+        if len(expired) < batch_size:
+            break
+    return released
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from bookings.cancellation import cancel_flight
+
+
+class Command(BaseCommand):
+    help = "Cancel flights: cancel every active booking on them and refund it in full."
+
+    def add_arguments(self, parser):
+        parser.add_argument('flight_ids', nargs='+', type=int, help='Ids of the flights to cancel.')
+
+    def handle(self, *args, **options):
+        missing = []
+        for flight_id in options['flight_ids']:
+            result = cancel_flight(flight_id)
+            if result is None:
+                missing.append(flight_id)
+                continue
+            self.stdout.write(
+                f'Flight {flight_id}: {result.bookings} bookings canceled, '
+                f'{result.refunded} refunded to {result.wallets} wallets'
+            )
+        if missing:
+            raise CommandError(f"No flight with id {', '.join(map(str, missing))}")
@@ -0,0 +1,20 @@
+from airline_booking.exports import ExportCommand
+from bookings.admin import BookingAdmin
+from bookings.models import Booking
+
+
+class Command(ExportCommand):
+    help = "Stream bookings as CSV or JSON Lines."
+    model = Booking
+    fields = BookingAdmin.export_fields
+
+    def add_filters(self, parser):
+        parser.add_argument('--status', choices=[value for value, _ in Booking.STATUS_CHOICES])
+        parser.add_argument('--user-id', type=int, help='Only bookings of this user id.')
+        parser.add_argument('--flight-id', type=int, help='Only bookings on this flight id.')
+
+    def filter(self, queryset, options):
+        for option, field in (('status', 'status'), ('user_id', 'user_id'), ('flight_id', 'flight_id')):
+            if options[option] is not None:
+                queryset = queryset.filter(**{field: options[option]})
+        return queryset
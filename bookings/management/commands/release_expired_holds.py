@@ -0,0 +1,33 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+
+from bookings.holds import release_expired_holds
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Release seats held by expired seat holds (once, or in a loop with --interval)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=int, default=0,
+            help='Keep running and sweep every N seconds (default: run once).',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of holds released per transaction.',
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        while True:
+            released = release_expired_holds(batch_size=options['batch_size'])
+            if released:
+                logger.info(f'Released {released} expired seat holds')
+            self.stdout.write(f'Released {released} expired seat holds')
+            if not interval:
+                break
+            time.sleep(interval)
@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 from flights.models import Flight
 
 
@@ -11,6 +12,7 @@ class BookingManager(models.Manager):
     - active(): Filter only active (not canceled) bookings
     - canceled(): Filter only canceled bookings
     - for_user(user): Get all bookings for a specific user
+    - in_group(group): Get the bookings of one group booking
     
     Why this manager exists:
     - Encapsulates booking filtering logic
@@ -31,6 +33,10 @@ class BookingManager(models.Manager):
         """Return all bookings for a specific user."""
         return self.filter(user=user)
 
+    def in_group(self, group):
+        """Return the bookings made together as one group booking."""
+        return self.filter(group=group)
+
 
 class Booking(models.Model):
 
@@ -39,8 +45,10 @@ class Booking(models.Model):
         ("canceled", "Canceled"),
     ]
 
+    # Indexed by booking_user_created_idx, which leads with user.
     user = models.ForeignKey(
-        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="bookings"
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="bookings",
+        db_index=False,
     )
     flight = models.ForeignKey(
         Flight, on_delete=models.CASCADE, related_name="bookings"
@@ -54,13 +62,142 @@ class Booking(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     canceled_at = models.DateTimeField(null=True, blank=True)
 
+    # Shared by the bookings of one multi-seat (group) booking; null for a
+    # single seat.
+    group = models.UUIDField(null=True, blank=True, editable=False)
+
     # Use custom manager
     objects = BookingManager()
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='booking_user_created_idx'),
+            models.Index(fields=['group'], name='booking_group_idx', condition=models.Q(group__isnull=False)),
+        ]
         verbose_name = "Booking"
         verbose_name_plural = "Bookings"
 
     def __str__(self):
-        return f"{self.user} - {self.flight} - {self.status}"
\ No newline at end of file
+        return f"{self.user} - {self.flight} - {self.status}"
+
+
+class SeatHoldManager(models.Manager):
+    """
+    Custom manager for SeatHold model.
+
+    Provides querysets split on the hold expiry:
+    - active(): Holds that still reserve their seats
+    - expired(): Holds past their expiry, waiting for the sweeper
+    """
+
+    def active(self):
+        """Return holds that have not expired yet."""
+        return self.filter(expires_at__gt=timezone.now())
+
+    def expired(self):
+        """Return holds whose expiry time has passed."""
+        return self.filter(expires_at__lte=timezone.now())
+
+
+class SeatHold(models.Model):
+    """
+    Temporary reservation of seats while a customer is checking out.
+
+    The held seats are taken out of Flight.seats_available when the hold is
+    created, so every availability figure already excludes active holds.
+    Booking the flight consumes the hold; otherwise the release_expired_holds
+    command hands the seats back once expires_at has passed.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="seat_holds"
+    )
+    flight = models.ForeignKey(
+        Flight, on_delete=models.CASCADE, related_name="holds"
+    )
+    seats = models.PositiveIntegerField(default=1)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    # Use custom manager
+    objects = SeatHoldManager()
+
+    class Meta:
+        verbose_name = "Seat Hold"
+        verbose_name_plural = "Seat Holds"
+
+    def __str__(self):
+        return f"{self.user} - {self.flight} - {self.seats} seat(s)"
+
+    @property
+    def is_expired(self):
+        """Check if the hold has run out."""
+        return timezone.now() >= self.expires_at
+
+
+class WaitlistEntryManager(models.Manager):
+    """
+    Custom manager for WaitlistEntry model.
+
+    Provides querysets over the waitlist queues:
+    - waiting(): Entries still waiting for a seat
+    - queue(flight_id): A flight's waiting entries, first come first served
+    """
+
+    def waiting(self):
+        """Return entries that have not been promoted or dropped."""
+        return self.filter(status='waiting')
+
+    def queue(self, flight_id):
+        """Return the waiting entries of a flight in FIFO order."""
+        return self.waiting().filter(flight_id=flight_id).order_by('created_at', 'id')
+
+
+class WaitlistEntry(models.Model):
+    """
+    A customer queued for a seat on a sold-out flight.
+
+    When a seat is freed (a cancellation or an expired hold), the oldest
+    waiting entry is promoted: the seat goes straight into a SeatHold for
+    that customer instead of back on sale, and they are emailed a link to
+    confirm it. See bookings.waitlist.
+    """
+
+    STATUS_CHOICES = [
+        ("waiting", "Waiting"),
+        ("promoted", "Promoted"),
+        ("canceled", "Canceled"),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="waitlist_entries"
+    )
+    # Indexed by waitlist_queue_idx, which leads with flight.
+    flight = models.ForeignKey(
+        Flight, on_delete=models.CASCADE, related_name="waitlist_entries", db_index=False,
+    )
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="waiting")
+    created_at = models.DateTimeField(auto_now_add=True)
+    promoted_at = models.DateTimeField(null=True, blank=True)
+
+    # Use custom manager
+    objects = WaitlistEntryManager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['flight', 'created_at', 'id'], name='waitlist_queue_idx',
+                condition=models.Q(status='waiting'),
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['flight', 'user'], name='waitlist_one_waiting_per_user',
+                condition=models.Q(status='waiting'),
+            ),
+        ]
+        verbose_name = "Waitlist Entry"
+        verbose_name_plural = "Waitlist Entries"
+
+    def __str__(self):
+        return f"{self.user} - {self.flight} - {self.status}"
@@ -1,3 +1,716 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase, RequestFactory, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import User
+from airline_booking.exports import export_chunks
+from airline_booking.pagination import encode_cursor
+from airline_booking.testing import QueryPlanMixin
+from flights.models import Flight, Route
+from jobs.models import Job
+from logs.audit import audit_log
+from payments.models import Transaction
+from .cancellation import cancel_flight, cancel_group
+from .holds import create_hold, release_expired_holds
+from .models import Booking, SeatHold, WaitlistEntry
+from .views import book_flight, cancel_booking, cancel_booking_group, hold_seats
+from .waitlist import join_waitlist, promote_waitlist
+
+
+def make_flight(seats=10, price=100, **kwargs):
+    route, _ = Route.objects.get_or_create(origin='Tehran', destination='Mashhad')
+    fields = dict(
+        route=route,
+        origin=route.origin,
+        destination=route.destination,
+        departure_time=timezone.now() + timedelta(days=7),
+        price=price,
+        seats_available=seats,
+        airplane_type='A320',
+        cancel_penalty_percent=10,
+        airline_name='Iran Air',
+    )
+    fields.update(kwargs)
+    return Flight.objects.create(**fields)
+
+
+class BookFlightTests(TestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.user = User.objects.create(username='passenger', wallet=1000)
+        self.flight = make_flight(seats=1)
+
+    def _call(self, view, *args):
+        request = self.factory.get('/')
+        request.user = self.user
+        return view(request, *args)
+
+    def test_booking_takes_a_seat(self):
+        response = self._call(book_flight, self.flight.id)
+        self.assertEqual(response.status_code, 302)
+        self.flight.refresh_from_db()
+        self.assertEqual(self.flight.seats_available, 0)
+        self.assertEqual(Booking.objects.active().count(), 1)
+
+    def test_sold_out_flight_creates_no_booking(self):
+        self._call(book_flight, self.flight.id)
+        response = self._call(book_flight, self.flight.id)
+        self.assertContains(response, 'No Seats Available')
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_cancel_twice_releases_one_seat(self):
+        self._call(book_flight, self.flight.id)
+        booking = Booking.objects.get()
+        self._call(cancel_booking, booking.id)
+        self._call(cancel_booking, booking.id)
+        self.flight.refresh_from_db()
+        self.assertEqual(self.flight.seats_available, 1)
+        booking.refresh_from_db()
+        self.assertEqual(booking.status, 'canceled')
+        self.assertEqual(booking.final_refund, 90)
+
+
+class SeatHoldTests(TestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.user = User.objects.create(username='passenger', wallet=1000)
+        self.flight = make_flight(seats=5)
+
+    def _book(self, hold=None):
+        request = self.factory.get('/', {'hold': hold.id} if hold else {})
+        request.user = self.user
+        return book_flight(request, self.flight.id)
+
+    def test_hold_takes_seats_from_availability(self):
+        hold = create_hold(self.user, self.flight, seats=3)
+        self.assertIsNotNone(hold)
+        self.flight.refresh_from_db()
+        self.assertEqual(self.flight.seats_available, 2)
+        self.assertIsNone(create_hold(self.user, self.flight, seats=3))
+
+    def test_booking_consumes_hold_without_taking_more_seats(self):
+        hold = create_hold(self.user, self.flight, seats=2)
+        self._book(hold)
+        self.flight.refresh_from_db()
+        self.assertEqual(self.flight.seats_available, 3)
+        self.assertEqual(Booking.objects.count(), 2)
+        self.assertFalse(SeatHold.objects.exists())
+
+    def test_expired_hold_is_not_claimed(self):
+        hold = create_hold(self.user, self.flight, seats=2)
+        SeatHold.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self._book(hold)
+        self.flight.refresh_from_db()
+        # Falls back to a regular single-seat booking; the hold stays for the sweeper.
+        self.assertEqual(self.flight.seats_available, 2)
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_sweeper_releases_expired_holds_in_bulk(self):
+        other = make_flight(seats=5)
+        create_hold(self.user, self.flight, seats=2)
+        create_hold(self.user, self.flight, seats=1)
+        create_hold(self.user, other, seats=4)
+        kept = create_hold(self.user, other, seats=1, minutes=30)
+        SeatHold.objects.exclude(pk=kept.pk).update(expires_at=timezone.now() - timedelta(minutes=1))
+
+        self.assertEqual(release_expired_holds(batch_size=2), 3)
+
+        self.flight.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(self.flight.seats_available, 5)
+        self.assertEqual(other.seats_available, 4)
+        self.assertEqual(list(SeatHold.objects.all()), [kept])
+
+
+class WaitlistTests(TestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.flight = make_flight(seats=1)
+        self.booker = User.objects.create(username='booker', wallet=1000)
+        self.waiters = [
+            User.objects.create(username=f'waiter{i}', email=f'waiter{i}@example.com', wallet=1000)
+            for i in range(2)
+        ]
+
+    def _call(self, view, user, *args, **params):
+        request = self.factory.get('/', params)
+        request.user = user
+        return view(request, *args)
+
+    def _book_and_queue(self):
+        self._call(book_flight, self.booker, self.flight.id)
+        for user in self.waiters:
+            join_waitlist(user, self.flight)
+        return Booking.objects.get()
+
+    def test_sold_out_page_offers_waitlist_and_joining_keeps_place(self):
+        self._call(book_flight, self.booker, self.flight.id)
+        self.client.force_login(self.waiters[0])
+        response = self.client.get(reverse('booking:book_flight', args=[self.flight.id]))
+        join_url = reverse('booking:join_waitlist', args=[self.flight.id])
+        self.assertContains(response, join_url)
+
+        join_waitlist(self.waiters[1], self.flight)
+        response = self.client.get(join_url)
+        self.assertContains(response, 'number <strong>2</strong> in line')
+        response = self.client.get(join_url)
+        self.assertContains(response, 'number <strong>2</strong> in line')
+        self.assertEqual(WaitlistEntry.objects.waiting().count(), 2)
+
+    def test_joining_a_flight_with_seats_sends_to_hold(self):
+        self.client.force_login(self.waiters[0])
+        response = self.client.get(reverse('booking:join_waitlist', args=[self.flight.id]))
+        self.assertRedirects(response, reverse('booking:hold_seats', args=[self.flight.id]), fetch_redirect_response=False)
+        self.assertFalse(WaitlistEntry.objects.exists())
+
+    @override_settings(SITE_URL='https://staging.example.com')
+    def test_cancellation_holds_seat_for_oldest_entry_and_emails_them(self):
+        booking = self._book_and_queue()
+        self._call(cancel_booking, self.booker, booking.id)
+
+        self.flight.refresh_from_db()
+        self.assertEqual(self.flight.seats_available, 0)
+        first, second = WaitlistEntry.objects.order_by('id')
+        self.assertEqual((first.status, second.status), ('promoted', 'waiting'))
+        hold = SeatHold.objects.get()
+        self.assertEqual(hold.user, self.waiters[0])
+        job = Job.objects.get(task='send_mail')
+        self.assertEqual(job.payload['recipient_list'], ['waiter0@example.com'])
+        link = f"https://staging.example.com{reverse('booking:book_flight', args=[self.flight.id])}?hold={hold.id}"
+        self.assertIn(link, job.payload['message'])
+
+        # A sold-out flight stays sold out for everyone else...
+        self._call(book_flight, self.booker, self.flight.id)
+        self.assertEqual(Booking.objects.active().count(), 0)
+        # ...while the promoted customer confirms through the emailed link.
+        self._call(book_flight, self.waiters[0], self.flight.id, hold=hold.id)
+        self.assertEqual(Booking.objects.active().get().user, self.waiters[0])
+
+    def test_expired_promotion_passes_to_next_entry_then_back_on_sale(self):
+        booking = self._book_and_queue()
+        self._call(cancel_booking, self.booker, booking.id)
+
+        for expected in ('waiter1', None):
+            SeatHold.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+            self.assertEqual(release_expired_holds(), 1)
+            self.flight.refresh_from_db()
+            if expected:
+                self.assertEqual(SeatHold.objects.get().user.username, expected)
+                self.assertEqual(self.flight.seats_available, 0)
+        self.assertEqual(self.flight.seats_available, 1)
+        self.assertFalse(WaitlistEntry.objects.waiting().exists())
+
+    def test_promote_without_waiters_leaves_seat_to_caller(self):
+        self.assertEqual(promote_waitlist(self.flight.id), [])
+        self.assertFalse(SeatHold.objects.exists())
+
+    def test_flight_cancellation_drops_waitlist(self):
+        self._book_and_queue()
+        cancel_flight(self.flight.id)
+        self.assertEqual(set(WaitlistEntry.objects.values_list('status', flat=True)), {'canceled'})
+        self.assertFalse(SeatHold.objects.exists())
+
+
+class GroupBookingTests(TestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.user = User.objects.create(username='organizer', wallet=10_000)
+        self.flight = make_flight(seats=40)
+
+    def _call(self, view, *args, **params):
+        request = self.factory.get('/', params)
+        request.user = self.user
+        return view(request, *args)
+
+    def _book_group(self, seats):
+        self._call(book_flight, self.flight.id, seats=seats)
+        return Booking.objects.filter(flight=self.flight).latest('id').group
+
+    def test_group_shares_one_id_and_one_payment(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('booking:book_flight', args=[self.flight.id]), {'seats': 5})
+        self.assertRedirects(response, reverse('booking:my_bookings'), fetch_redirect_response=False)
+
+        group = Booking.objects.first().group
+        self.assertIsNotNone(group)
+        self.assertEqual(Booking.objects.in_group(group).count(), 5)
+        self.assertEqual(Booking.objects.count(), 5)
+        self.flight.refresh_from_db()
+        self.user.refresh_from_db()
+        self.assertEqual((self.flight.seats_available, self.user.wallet), (35, 9500))
+        self.assertEqual(Transaction.objects.filter(type='payment').count(), 5)
+
+    def test_single_seat_has_no_group(self):
+        self._call(book_flight, self.flight.id)
+        self.assertIsNone(Booking.objects.get().group)
+
+    @override_settings(GROUP_BOOKING_MAX_SEATS=3)
+    def test_seats_outside_the_limit_are_rejected(self):
+        for view in (book_flight, hold_seats):
+            for seats in (4, 0, 'two'):
+                response = self._call(view, self.flight.id, seats=seats)
+                self.assertEqual(response.status_code, 400)
+        self._call(hold_seats, self.flight.id, seats=3)
+        self.assertEqual(SeatHold.objects.get().seats, 3)
+        self.assertFalse(Booking.objects.exists())
+
+    def test_flight_page_offers_a_whole_group(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('flights:detail', args=[self.flight.id]))
+        self.assertContains(response, 'max="30"')
+
+    def test_not_enough_seats_books_nobody(self):
+        self.flight.seats_available = 3
+        self.flight.save()
+        response = self._call(book_flight, self.flight.id, seats=5)
+        self.assertContains(response, 'does not have 5 seats left')
+        self.assertNotContains(response, 'Join the Waitlist')
+        self.flight.refresh_from_db()
+        self.assertEqual(self.flight.seats_available, 3)
+        self.assertFalse(Booking.objects.exists())
+
+    def test_queries_do_not_grow_with_group_size(self):
+        def queries(view, *args, **params):
+            with CaptureQueriesContext(connection) as captured:
+                self._call(view, *args, **params)
+            return len(captured)
+
+        small, large = self._book_group(2), self._book_group(10)
+        self.assertEqual(
+            queries(book_flight, self.flight.id, seats=2),
+            queries(book_flight, self.flight.id, seats=20),
+        )
+        self.assertEqual(queries(cancel_booking_group, small), queries(cancel_booking_group, large))
+
+    def test_cancel_one_passenger_then_the_rest(self):
+        group = self._book_group(5)
+        first = Booking.objects.in_group(group).order_by('id').first()
+        self._call(cancel_booking, first.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self._call(cancel_booking_group, group)
+        self.assertEqual(response.status_code, 302)
+        bookings = Booking.objects.in_group(group)
+        self.assertEqual(
+            sorted(bookings.values_list('status', 'penalty_amount', 'final_refund')),
+            [('canceled', 10, 90)] * 5,
+        )
+        self.flight.refresh_from_db()
+        self.user.refresh_from_db()
+        self.assertEqual((self.flight.seats_available, self.user.wallet), (40, 9950))
+        self.assertEqual(Transaction.objects.filter(type='refund').count(), 5)
+        self.assertEqual(cancel_group(self.user, group).bookings, [])
+
+    def test_group_belongs_to_its_owner(self):
+        group = self._book_group(3)
+        other = User.objects.create(username='stranger')
+        self.assertEqual(cancel_group(other, group).bookings, [])
+        self.assertEqual(Booking.objects.active().count(), 3)
+
+    def test_freed_seats_go_to_the_waitlist_first(self):
+        self.flight.seats_available = 3
+        self.flight.save()
+        group = self._book_group(3)
+        join_waitlist(User.objects.create(username='waiter', email='waiter@example.com'), self.flight)
+
+        result = cancel_group(self.user, group)
+        self.assertEqual((len(result.bookings), result.refunded), (3, 270))
+        self.flight.refresh_from_db()
+        self.assertEqual(self.flight.seats_available, 2)
+        self.assertEqual(SeatHold.objects.get().user.username, 'waiter')
+
+
+@override_settings(ASYNC_VIEWS=False)
+class MyBookingsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='passenger')
+        flights = [make_flight(seats=100) for _ in range(5)]
+        cls.bookings = Booking.objects.bulk_create(
+            Booking(user=cls.user, flight=flights[i % 5], status='canceled' if i % 4 == 0 else 'active')
+            for i in range(45)
+        )
+        Booking.objects.create(user=User.objects.create(username='someone-else'), flight=flights[0])
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def _get(self, **params):
+        return self.client.get(reverse('booking:my_bookings'), params)
+
+    def _walk(self, **params):
+        ids, cursor = [], None
+        while True:
+            response = self._get(**params, **({'cursor': cursor} if cursor else {}))
+            ids += [booking.id for booking in response.context['bookings']]
+            if not response.context['page'].has_next:
+                return ids
+            cursor = response.context['page'].next_cursor
+
+    def test_pages_run_a_fixed_number_of_queries(self):
+        # Session, user and one joined bookings query, however many bookings render.
+        with self.assertNumQueries(3):
+            response = self._get()
+        self.assertEqual(len(response.context['bookings']), 20)
+        self.assertContains(response, 'Tehran')
+
+    def test_pages_cover_all_bookings_newest_first(self):
+        expected = sorted(self.bookings, key=lambda b: (b.created_at, b.id), reverse=True)
+        self.assertEqual(self._walk(), [booking.id for booking in expected])
+
+    def test_tabs_filter_by_status(self):
+        active = self._walk(status='active')
+        canceled = self._walk(status='canceled')
+        self.assertEqual(len(active), 33)
+        self.assertEqual(len(canceled), 12)
+        self.assertFalse(Booking.objects.filter(pk__in=canceled).exclude(status='canceled').exists())
+
+    def test_tampered_cursor_shows_the_first_page(self):
+        first = [booking.id for booking in self._get().context['bookings']]
+        for values in (['garbage', 1], ['2026-01-01T00:00:00+00:00', 'abc'], [1]):
+            response = self._get(cursor=encode_cursor('n', values))
+            self.assertEqual([booking.id for booking in response.context['bookings']], first)
+
+
+@override_settings(ASYNC_VIEWS=True)
+class MyBookingsAsyncViewTests(MyBookingsTests):
+    """MyBookingsTests against the async views served under ASGI."""
+
+
+@override_settings(ASYNC_VIEWS=True)
+class AsyncBookingViewTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='passenger', wallet=1000)
+        cls.flight = make_flight(seats=1)
+
+    async def test_login_is_still_required(self):
+        response = await self.async_client.get(reverse('booking:book_flight', args=[self.flight.id]))
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(await Booking.objects.aexists())
+
+    async def test_book_then_list(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('booking:book_flight', args=[self.flight.id]))
+        self.assertRedirects(response, reverse('booking:my_bookings'), fetch_redirect_response=False)
+
+        response = await self.async_client.get(reverse('booking:book_flight', args=[self.flight.id]))
+        self.assertContains(response, 'No Seats Available')
+
+        response = await self.async_client.get(reverse('booking:my_bookings'))
+        self.assertEqual(len(response.context['bookings']), 1)
+        await self.flight.arefresh_from_db()
+        self.assertEqual(self.flight.seats_available, 0)
+
+
+class BookingQueryPlanTests(QueryPlanMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        flight = make_flight(seats=500)
+        cls.users = [User.objects.create(username=f'passenger{i}') for i in range(20)]
+        Booking.objects.bulk_create(
+            Booking(user=cls.users[i % 20], flight=flight, status='canceled' if i % 3 else 'active')
+            for i in range(400)
+        )
+
+    def test_for_user_uses_user_created_index(self):
+        qs = Booking.objects.for_user(self.users[0])[:20]
+        self.assertUsesIndex(qs, 'booking_user_created_idx')
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class ConcurrentBookingTests(TransactionTestCase):
+    """
+    Fire parallel bookings at one flight and check nothing is oversold.
+
+    Needs a database with real row locking (PostgreSQL); SQLite serializes
+    writers and would only report "database is locked".
+    """
+
+    SEATS = 250
+    ATTEMPTS = 400
+    WORKERS = 32
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.flight = make_flight(seats=self.SEATS)
+        self.users = [
+            User.objects.create(username=f'passenger{i}', wallet=100_000)
+            for i in range(self.WORKERS)
+        ]
+
+    def _run_parallel(self, fn, args):
+        def worker(arg):
+            try:
+                return fn(arg)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=self.WORKERS) as pool:
+            return list(pool.map(worker, args))
+
+    def _book(self, i):
+        request = self.factory.get('/')
+        request.user = self.users[i % self.WORKERS]
+        return book_flight(request, self.flight.id).status_code
+
+    def test_parallel_bookings_never_oversell(self):
+        codes = self._run_parallel(self._book, range(self.ATTEMPTS))
+
+        self.flight.refresh_from_db()
+        self.assertEqual(self.flight.seats_available, 0)
+        self.assertEqual(Booking.objects.filter(flight=self.flight).count(), self.SEATS)
+        self.assertEqual(codes.count(302), self.SEATS)
+        self.assertEqual(codes.count(200), self.ATTEMPTS - self.SEATS)
+
+    def test_parallel_cancellations_release_each_seat_once(self):
+        self._run_parallel(self._book, range(self.WORKERS))
+        bookings = list(Booking.objects.select_related('user'))
+
+        def cancel(booking):
+            request = self.factory.get('/')
+            request.user = booking.user
+            return cancel_booking(request, booking.id)
+
+        # Every booking is canceled by two requests racing each other.
+        self._run_parallel(cancel, bookings * 2)
+
+        self.flight.refresh_from_db()
+        self.assertEqual(self.flight.seats_available, self.SEATS)
+        self.assertEqual(Booking.objects.canceled().count(), self.WORKERS)
+
+    def test_parallel_cancellations_promote_each_waitlist_entry_once(self):
+        self.flight.seats_available = self.WORKERS
+        self.flight.save()
+        self._run_parallel(self._book, range(self.WORKERS))
+        waiters = [
+            User.objects.create(username=f'waiter{i}', email=f'waiter{i}@example.com')
+            for i in range(self.WORKERS + 5)
+        ]
+        entries = [join_waitlist(user, self.flight)[0] for user in waiters]
+        bookings = list(Booking.objects.select_related('user'))
+
+        def cancel(booking):
+            request = self.factory.get('/')
+            request.user = booking.user
+            return cancel_booking(request, booking.id)
+
+        # Every booking is canceled by two requests racing each other.
+        self._run_parallel(cancel, bookings * 2)
+
+        self.flight.refresh_from_db()
+        self.assertEqual(self.flight.seats_available, 0)
+        promoted = WaitlistEntry.objects.filter(status='promoted')
+        self.assertEqual(
+            sorted(promoted.values_list('id', flat=True)),
+            [entry.id for entry in entries[:self.WORKERS]],
+        )
+        self.assertEqual(
+            sorted(SeatHold.objects.values_list('user_id', flat=True)),
+            sorted(user.id for user in waiters[:self.WORKERS]),
+        )
+        self.assertEqual(Job.objects.filter(task='send_mail').count(), self.WORKERS)
+        self.assertEqual(WaitlistEntry.objects.waiting().count(), 5)
+
+
+class BookingExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username='finance', password='x')
+        cls.user = User.objects.create(username='passenger')
+        flight = make_flight()
+        cls.bookings = Booking.objects.bulk_create(
+            Booking(user=cls.user, flight=flight, price_paid=100 + i, status='canceled' if i % 3 == 0 else 'active')
+            for i in range(7)
+        )
+
+    def _action(self, client, action):
+        return client.post(reverse('admin:bookings_booking_changelist'), {
+            'action': action, 'select_across': '1', 'index': '0',
+            '_selected_action': [self.bookings[0].pk],
+        })
+
+    @override_settings(ASYNC_VIEWS=True)
+    def test_admin_csv_export_streams_every_filtered_row(self):
+        self.client.force_login(self.admin)
+        response = self._action(self.client, 'export_csv')
+        # A WSGI request gets a sync stream even with the async views on,
+        # or Django would read the whole export into memory to send it.
+        self.assertFalse(response.is_async)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertRegex(response['Content-Disposition'], r'attachment; filename="booking-[\d-]+\.csv"')
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual([int(row['id']) for row in rows], sorted(b.pk for b in self.bookings))
+        self.assertEqual(rows[0]['user__username'], 'passenger')
+        self.assertEqual(rows[0]['flight__origin'], 'Tehran')
+
+    async def test_async_admin_jsonl_export(self):
+        await self.async_client.aforce_login(self.admin)
+        response = await self._action(self.async_client, 'export_jsonl')
+        self.assertTrue(response.is_async)
+        content = b''.join([chunk async for chunk in response.streaming_content])
+        rows = [json.loads(line) for line in content.decode().splitlines()]
+        self.assertEqual(len(rows), 7)
+        self.assertEqual(rows[-1]['price_paid'], 106)
+
+    def test_export_reads_one_chunk_at_a_time(self):
+        chunks = list(export_chunks(Booking.objects.order_by('pk'), ('id', 'status'), chunk_size=3))
+        # Header, three batches of rows (3 + 3 + 1), end of stream.
+        self.assertEqual(len(chunks), 5)
+        self.assertEqual(chunks[0], b'id,status\r\n')
+        self.assertEqual(chunks[3].decode().count('\n'), 1)
+
+    def test_command_filters_and_compresses(self):
+        out = io.StringIO()
+        call_command('export_bookings', '--status', 'canceled', '--format', 'jsonl', stdout=out)
+        self.assertEqual([json.loads(line)['status'] for line in out.getvalue().splitlines()], ['canceled'] * 3)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bookings.csv.gz')
+            out = io.StringIO()
+            call_command('export_bookings', '--gzip', '--output', path, '--chunk-size', '2', stdout=out)
+            self.assertIn('Exported 7 rows', out.getvalue())
+            with gzip.open(path, 'rt') as export:
+                self.assertEqual(len(list(csv.DictReader(export))), 7)
+
+
+@override_settings(ADMIN_EXACT_COUNT_LIMIT=-1)
+class BookingAdminTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username='ops', password='x')
+        cls.user = User.objects.create(username='passenger')
+        cls.booking = Booking.objects.create(user=cls.user, flight=make_flight())
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def test_changelist_queries_do_not_grow(self):
+        url = reverse('admin:bookings_booking_changelist')
+        # Session, user, EXPLAIN (no COUNT), page with user and flight joined.
+        with self.assertNumQueries(4):
+            self.client.get(url)
+        flight = make_flight(origin='Shiraz')
+        Booking.objects.bulk_create(
+            Booking(user=User.objects.create(username=f'traveller{i}'), flight=flight) for i in range(10)
+        )
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        self.assertEqual(len(response.context['cl'].result_list), 11)
+
+    def test_search_looks_up_each_relation_by_itself(self):
+        other = Booking.objects.create(user=self.admin, flight=make_flight(destination='Kish'))
+        url = reverse('admin:bookings_booking_changelist')
+        # Plus one id lookup per related model searched (users, flights).
+        with self.assertNumQueries(6):
+            response = self.client.get(url, {'q': 'passeng'})
+        self.assertEqual(list(response.context['cl'].result_list), [self.booking])
+        response = self.client.get(url, {'q': 'kish'})
+        self.assertEqual(list(response.context['cl'].result_list), [other])
+
+    def test_change_form_uses_autocomplete(self):
+        User.objects.create(username='not-listed')
+        response = self.client.get(reverse('admin:bookings_booking_change', args=[self.booking.pk]))
+        self.assertContains(response, 'class="admin-autocomplete"', count=2)
+        self.assertContains(response, '>passenger</option>')
+        self.assertNotContains(response, 'not-listed')
+
+
+class FlightCancellationTests(TestCase):
+
+    def setUp(self):
+        audit_log.clear()
+        self.flight = make_flight(seats=50, price=100)
+        self.passengers = [User.objects.create(username=f'passenger{i}', wallet=10) for i in range(3)]
+
+    def tearDown(self):
+        audit_log.clear()
+
+    def _book(self, flight, users, price=100, **kwargs):
+        return Booking.objects.bulk_create(Booking(user=user, flight=flight, price_paid=price, **kwargs) for user in users)
+
+    def _cancel_queries(self, passengers):
+        flight = make_flight(seats=500)
+        self._book(flight, [User.objects.create(username=f'{flight.pk}-{i}') for i in range(passengers)])
+        with self.captureOnCommitCallbacks() as callbacks, CaptureQueriesContext(connection) as queries:
+            result = cancel_flight(flight.pk)
+        self.assertEqual(result.bookings, passengers)
+        return len(queries), len(callbacks)
+
+    def test_every_active_booking_is_canceled_and_fully_refunded(self):
+        self.flight.cancel_penalty_percent = 50
+        self.flight.save()
+        first, second, third = self.passengers
+        self._book(self.flight, [first, first, second], price=120)
+        self._book(self.flight, [third], price=80, status='canceled')
+        create_hold(third, self.flight, seats=2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            result = cancel_flight(self.flight.pk)
+
+        self.assertEqual((result.bookings, result.refunded, result.wallets), (3, 360, 2))
+        bookings = Booking.objects.filter(flight=self.flight)
+        self.assertEqual(
+            sorted(bookings.values_list('status', 'penalty_amount', 'final_refund')),
+            [('canceled', 0, 0)] + [('canceled', 0, 120)] * 3,
+        )
+        self.assertEqual(bookings.filter(canceled_at__isnull=False).count(), 3)
+        for user, wallet in ((first, 250), (second, 130), (third, 10)):
+            user.refresh_from_db()
+            self.assertEqual(user.wallet, wallet)
+        self.assertEqual(
+            Transaction.objects.filter(type='refund', booking__flight=self.flight).aggregate(total=Sum('amount')),
+            {'total': 360},
+        )
+        self.flight.refresh_from_db()
+        self.assertEqual(self.flight.seats_available, 0)
+        self.assertFalse(SeatHold.objects.filter(flight=self.flight).exists())
+        self.assertEqual(len(audit_log), 6)
+
+    def test_query_count_does_not_grow_with_passengers(self):
+        self.assertEqual(self._cancel_queries(3), self._cancel_queries(400))
+
+    def test_missing_flight(self):
+        self.assertIsNone(cancel_flight(0))
+        with self.assertRaisesMessage(CommandError, 'No flight with id 0'):
+            call_command('cancel_flight', '0', stdout=io.StringIO())
+
+    def test_command_and_admin_action(self):
+        self._book(self.flight, self.passengers)
+        out = io.StringIO()
+        call_command('cancel_flight', str(self.flight.pk), stdout=out)
+        self.assertIn('3 bookings canceled, 300 refunded to 3 wallets', out.getvalue())
+
+        other = make_flight()
+        self._book(other, self.passengers[:1])
+        admin = User.objects.create_superuser(username='ops', password='x')
+        self.client.force_login(admin)
+        self.client.post(reverse('admin:flights_flight_changelist'), {
+            'action': 'cancel_flights', '_selected_action': [self.flight.pk, other.pk],
+        })
+        self.assertFalse(Booking.objects.active().exists())
+        self.passengers[0].refresh_from_db()
+        self.assertEqual(self.passengers[0].wallet, 210)
 
-# Create your tests here.
@@ -1,10 +1,17 @@
+from django.conf import settings
 from django.urls import path
-from .views import book_flight, my_bookings, cancel_booking
+from .views import (
+    hold_seats, join_flight_waitlist, book_flight, abook_flight, my_bookings, amy_bookings, cancel_booking,
+    cancel_booking_group,
+)
 
 app_name = "booking"
 
 urlpatterns = [
-    path("book/<int:flight_id>/", book_flight, name="book_flight"),
-    path("my/", my_bookings, name="my_bookings"),
+    path("hold/<int:flight_id>/", hold_seats, name="hold_seats"),
+    path("waitlist/<int:flight_id>/", join_flight_waitlist, name="join_waitlist"),
+    path("book/<int:flight_id>/", abook_flight if settings.ASYNC_VIEWS else book_flight, name="book_flight"),
+    path("my/", amy_bookings if settings.ASYNC_VIEWS else my_bookings, name="my_bookings"),
     path("cancel/<int:booking_id>/", cancel_booking, name="cancel_booking"),
+    path("cancel-group/<uuid:group>/", cancel_booking_group, name="cancel_booking_group"),
 ]
\ No newline at end of file
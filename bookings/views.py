@@ -1,59 +1,276 @@
 import logging
-from django.shortcuts import render, redirect, get_object_or_404
+import uuid
+from asgiref.sync import sync_to_async
+from django.http import HttpResponseBadRequest
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
 from django.contrib.auth.decorators import login_required
+from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
+from airline_booking.pagination import paginate, apaginate
+from airline_booking.shortcuts import arender
 from flights.models import Flight
+from logs.audit import audit
+from payments.wallet import InsufficientFunds, charge, credit
+from flights.inventory import take_seats, release_seats
 from .models import Booking
+from .cancellation import cancel_group
+from .holds import create_hold, claim_hold
+from .waitlist import join_waitlist, promote_waitlist, waitlist_position
 
 logger = logging.getLogger(__name__)
 
+BOOKINGS_PER_PAGE = 20
+
+# Tabs on the My Bookings page and the manager method serving each one.
+BOOKING_TABS = {
+    "all": Booking.objects.all,
+    "active": Booking.objects.active,
+    "canceled": Booking.objects.canceled,
+}
+
+# Fields rendered by booking/my_bookings.html, loaded in one joined query.
+MY_BOOKINGS_FIELDS = (
+    'id', 'status', 'price_paid', 'penalty_amount', 'final_refund', 'created_at', 'canceled_at', 'group',
+    'flight', 'flight__origin', 'flight__destination', 'flight__departure_time',
+    'flight__airline_name', 'flight__cancel_penalty_percent',
+)
+
+
+def _requested_seats(request):
+    """The `seats` query parameter (default 1), None if not within 1..GROUP_BOOKING_MAX_SEATS."""
+    try:
+        seats = int(request.GET.get("seats", 1))
+    except ValueError:
+        return None
+    return seats if 1 <= seats <= settings.GROUP_BOOKING_MAX_SEATS else None
+
+
+def _bad_seats():
+    return HttpResponseBadRequest(f'Seats must be a number from 1 to {settings.GROUP_BOOKING_MAX_SEATS}.')
+
+
+def _no_seat_context(flight, seats):
+    # A single seat failing means the flight is sold out; a group may only
+    # have found too few seats left.
+    if seats == 1:
+        flight.seats_available = 0
+    return {"flight": flight, "seats": seats}
+
 
 @login_required
-def book_flight(request, flight_id):
+def hold_seats(request, flight_id):
     """
-    Create a new flight booking for the authenticated user.
-    
-    Process:
-    1. Check flight availability
-    2. Create booking record
-    3. Decrement available seats
-    4. Log the booking action
+    Hold seats on a flight while the user completes the booking.
+
+    The number of seats comes from the `seats` query parameter (default 1,
+    at most GROUP_BOOKING_MAX_SEATS; anything else is a 400). Held seats
+    are released automatically after SEAT_HOLD_MINUTES unless the hold is
+    booked.
     """
     flight = get_object_or_404(Flight, pk=flight_id)
+    seats = _requested_seats(request)
+    if seats is None:
+        return _bad_seats()
 
-    if flight.seats_available <= 0:
+    hold = create_hold(request.user, flight, seats)
+    if hold is None:
         logger.warning(
-            f'User {request.user.username} attempted to book flight {flight.id} with no seats available'
+            f'User {request.user.username} attempted to hold {seats} seat(s) on flight {flight.id} with not enough seats available'
         )
-        return render(request, "booking/no_seat.html", {"flight": flight})
+        return render(request, "booking/no_seat.html", _no_seat_context(flight, seats))
+
+    logger.info(
+        f'User {request.user.username} held {seats} seat(s) on flight {flight.id} until {hold.expires_at}. Hold ID: {hold.id}'
+    )
+    return render(request, "booking/hold.html", {"flight": flight, "hold": hold})
+
+
+def _book_seats(user, flight, hold_id, seats=1):
+    """
+    Book the user's held seats, or `seats` fresh ones, and pay for them
+    from the wallet in a single transaction.
+
+    However many seats are booked, this is one seat UPDATE, one Booking
+    INSERT and one payment; the bookings of more than one seat share a
+    group id so they can be canceled together.
 
-    booking = Booking.objects.create(
-        user=request.user,
-        flight=flight,
-        price_paid=flight.price
+    Returns:
+        list: The created bookings, empty if the flight is sold out
+
+    Raises:
+        InsufficientFunds: The wallet cannot cover the seats; the seats,
+            hold and wallet are left untouched
+    """
+    with transaction.atomic():
+        claimed = claim_hold(user, hold_id, flight.id) if hold_id.isdigit() else 0
+        if not claimed and take_seats(flight.id, seats) is not None:
+            claimed = seats
+        group = uuid.uuid4() if claimed > 1 else None
+        bookings = Booking.objects.bulk_create([
+            Booking(user=user, flight=flight, price_paid=flight.price, group=group)
+            for _ in range(claimed)
+        ])
+        if bookings:
+            user.wallet = charge(
+                user, [flight.price] * len(bookings),
+                f'Flight {flight.id} ({flight.origin} -> {flight.destination})', bookings,
+            )
+        return bookings
+
+
+def _insufficient_funds_context(user, flight, hold_id):
+    logger.warning(
+        f'User {user.username} could not pay for flight {flight.id}: wallet balance {user.wallet}, price {flight.price}'
     )
+    return {"flight": flight, "wallet": user.wallet, "hold_id": hold_id}
 
-    flight.seats_available -= 1
-    flight.save()
 
+def _log_booking(request, user, flight, bookings):
+    if not bookings:
+        logger.warning(
+            f'User {user.username} attempted to book flight {flight.id} with no seats available'
+        )
+        return
     logger.info(
-        f'User {request.user.username} booked flight {flight.id} ({flight.origin} -> {flight.destination}). '
-        f'Booking ID: {booking.id}, Price: {flight.price}'
+        f'User {user.username} booked flight {flight.id} ({flight.origin} -> {flight.destination}). '
+        f'Booking ID: {", ".join(str(booking.id) for booking in bookings)}, Price: {flight.price}'
     )
+    audit(
+        request, 'booking',
+        f'Flight {flight.id}, bookings {", ".join(str(booking.id) for booking in bookings)}, price {flight.price}',
+        user=user,
+    )
+    audit(request, 'payment', f'Flight {flight.id}, amount {flight.price * len(bookings)}', user=user)
+
+
+@login_required
+def join_flight_waitlist(request, flight_id):
+    """
+    Put the user on a sold-out flight's waitlist.
+
+    A flight with seats left sends the user to hold one instead. When a
+    seat is freed, the oldest entry gets it held and an email to confirm
+    it (see bookings.waitlist).
+    """
+    flight = get_object_or_404(Flight, pk=flight_id)
+    if flight.seats_available > 0:
+        return redirect("booking:hold_seats", flight_id=flight.id)
+
+    entry, created = join_waitlist(request.user, flight)
+    position = waitlist_position(entry)
+    if created:
+        logger.info(
+            f'User {request.user.username} joined the waitlist of flight {flight.id} at position {position}. '
+            f'Entry ID: {entry.id}'
+        )
+    return render(request, "booking/waitlisted.html", {"flight": flight, "entry": entry, "position": position})
+
+
+@login_required
+def book_flight(request, flight_id):
+    """
+    Create a new flight booking for the authenticated user.
+    
+    Process:
+    1. Claim the user's seat hold (`hold` query parameter) if one is given,
+       otherwise take `seats` seats (query parameter, default 1, at most
+       GROUP_BOOKING_MAX_SEATS, else 400) with one conditional update, which fails if
+       fewer are left
+    2. Create one booking record per seat with a single bulk insert in the
+       same transaction, linked by a group id when there are several
+    3. Debit the wallet with a conditional update and record the payment
+       Transaction; an insufficient balance rolls back steps 1-2
+    4. Log the booking action
+    """
+    flight = get_object_or_404(Flight, pk=flight_id)
+    hold_id = request.GET.get("hold", "")
+    seats = _requested_seats(request)
+    if seats is None:
+        return _bad_seats()
+    try:
+        bookings = _book_seats(request.user, flight, hold_id, seats)
+    except InsufficientFunds:
+        context = _insufficient_funds_context(request.user, flight, hold_id)
+        return render(request, "booking/insufficient_funds.html", context, status=402)
+    _log_booking(request, request.user, flight, bookings)
+
+    if not bookings:
+        return render(request, "booking/no_seat.html", _no_seat_context(flight, seats))
+    return redirect("booking:my_bookings")
+
+
+@login_required
+async def abook_flight(request, flight_id):
+    """
+    Async version of book_flight, served when ASYNC_VIEWS is on (ASGI).
 
+    Django's transaction.atomic() has no async form yet, so the booking
+    transaction itself runs in one sync_to_async call.
+    """
+    flight = await aget_object_or_404(Flight, pk=flight_id)
+    user = await request.auser()
+    hold_id = request.GET.get("hold", "")
+    seats = _requested_seats(request)
+    if seats is None:
+        return _bad_seats()
+    try:
+        bookings = await sync_to_async(_book_seats)(user, flight, hold_id, seats)
+    except InsufficientFunds:
+        context = _insufficient_funds_context(user, flight, hold_id)
+        return await arender(request, "booking/insufficient_funds.html", context, status=402)
+    _log_booking(request, user, flight, bookings)
+
+    if not bookings:
+        return await arender(request, "booking/no_seat.html", _no_seat_context(flight, seats))
     return redirect("booking:my_bookings")
 
 
+def _my_bookings_query(user, tab):
+    return (
+        BOOKING_TABS[tab]()
+        .filter(user=user)
+        .select_related("flight")
+        .only(*MY_BOOKINGS_FIELDS)
+    )
+
+
 @login_required
 def my_bookings(request):
     """
-    Display all bookings for the authenticated user.
+    Display the authenticated user's bookings, newest first.
     
-    Shows active and canceled bookings with booking details.
+    The `status` query parameter selects the all/active/canceled tab and
+    `cursor` pages through it over (created_at, id). Each page is a single
+    joined query, so the query count does not grow with the number of
+    bookings.
     """
-    bookings = Booking.objects.filter(user=request.user)
-    logger.info(f'User {request.user.username} viewed their bookings ({bookings.count()} total)')
-    return render(request, "booking/my_bookings.html", {"bookings": bookings})
+    tab = request.GET.get("status", "all")
+    if tab not in BOOKING_TABS:
+        tab = "all"
+
+    page = paginate(
+        _my_bookings_query(request.user, tab), ("-created_at", "-id"),
+        request.GET.get("cursor"), BOOKINGS_PER_PAGE,
+    )
+    logger.info(f'User {request.user.username} viewed their bookings ({tab} tab, {len(page)} shown)')
+    return render(request, "booking/my_bookings.html", {"bookings": page, "page": page, "tab": tab})
+
+
+@login_required
+async def amy_bookings(request):
+    """Async version of my_bookings, served when ASYNC_VIEWS is on (ASGI)."""
+    tab = request.GET.get("status", "all")
+    if tab not in BOOKING_TABS:
+        tab = "all"
+
+    user = await request.auser()
+    page = await apaginate(
+        _my_bookings_query(user, tab), ("-created_at", "-id"),
+        request.GET.get("cursor"), BOOKINGS_PER_PAGE,
+    )
+    logger.info(f'User {user.username} viewed their bookings ({tab} tab, {len(page)} shown)')
+    return await arender(request, "booking/my_bookings.html", {"bookings": page, "page": page, "tab": tab})
 
 
 @login_required
@@ -64,15 +281,15 @@ def cancel_booking(request, booking_id):
     Process:
     1. Verify booking ownership
     2. Calculate penalty and refund
-    3. Update booking status
-    4. Restore available seats
+    3. Update booking status (only if still active)
+    4. Hand the seat to the next customer on the flight's waitlist, or
+       restore it to the flight if nobody is waiting, and credit the refund
+       to the wallet in the same transaction
     5. Log cancellation
     """
-    booking = get_object_or_404(Booking, pk=booking_id, user=request.user)
-
-    if booking.status == "canceled":
-        logger.info(f'User {request.user.username} attempted to cancel already-canceled booking {booking_id}')
-        return redirect("booking:my_bookings")
+    booking = get_object_or_404(
+        Booking.objects.select_related('flight'), pk=booking_id, user=request.user
+    )
 
     penalty_percent = booking.flight.cancel_penalty_percent
     penalty_amount = booking.price_paid * penalty_percent // 100
@@ -81,15 +298,63 @@ def cancel_booking(request, booking_id):
     booking.penalty_amount = penalty_amount
     booking.final_refund = booking.price_paid - penalty_amount
     booking.canceled_at = timezone.now()
-    booking.save()
 
-    flight = booking.flight
-    flight.seats_available += 1
-    flight.save()
+    with transaction.atomic():
+        # Conditional on status so two concurrent cancels release one seat.
+        canceled = Booking.objects.active().filter(pk=booking.pk).update(
+            status=booking.status,
+            penalty_amount=booking.penalty_amount,
+            final_refund=booking.final_refund,
+            canceled_at=booking.canceled_at,
+        )
+        if canceled:
+            if not promote_waitlist(booking.flight_id):
+                release_seats(booking.flight_id)
+            if booking.final_refund:
+                credit(
+                    request.user, booking.final_refund, 'refund',
+                    f'Cancellation of booking {booking.id}', booking,
+                )
+
+    if not canceled:
+        logger.info(f'User {request.user.username} attempted to cancel already-canceled booking {booking_id}')
+        return redirect("booking:my_bookings")
 
     logger.info(
         f'User {request.user.username} canceled booking {booking_id}. '
         f'Original Price: {booking.price_paid}, Penalty: {penalty_amount}, Refund: {booking.final_refund}'
     )
+    audit(
+        request, 'cancel',
+        f'Booking {booking_id}, penalty {penalty_amount}, refund {booking.final_refund}',
+    )
+    if booking.final_refund:
+        audit(request, 'refund', f'Booking {booking_id}, amount {booking.final_refund}')
+
+    return redirect("booking:my_bookings")
+
+
+@login_required
+def cancel_booking_group(request, group):
+    """
+    Cancel every still-active booking of a group booking at once.
+
+    Single passengers of the group are canceled with cancel_booking; this
+    cancels the rest together, with the same penalty per seat, in a fixed
+    number of queries however large the group (see
+    bookings.cancellation.cancel_group).
+    """
+    result = cancel_group(request.user, group)
+    if not result.bookings:
+        logger.info(f'User {request.user.username} attempted to cancel group booking {group} with no active bookings')
+        return redirect("booking:my_bookings")
+
+    bookings = ", ".join(str(booking_id) for booking_id in result.bookings)
+    audit(
+        request, 'cancel',
+        f'Group {group}, bookings {bookings}, penalty {result.penalty}, refund {result.refunded}',
+    )
+    if result.refunded:
+        audit(request, 'refund', f'Group {group}, bookings {bookings}, amount {result.refunded}')
 
-    return redirect("booking:my_bookings")
\ No newline at end of file
+    return redirect("booking:my_bookings")
@@ -0,0 +1,112 @@
+"""
+First come, first served waitlists for sold-out flights.
+
+A seat freed on a flight with a waitlist never goes back on sale: in the
+same transaction that frees it, promote_waitlist() locks the oldest waiting
+entry with SELECT ... FOR UPDATE SKIP LOCKED, turns the seat into a
+SeatHold for that customer and queues an email with the link to confirm
+it. Two cancellations racing on the same flight each skip the entry the
+other has locked, so no entry is promoted twice and no seat is handed out
+twice. A promotion that is not confirmed in time expires like any other
+hold, and release_expired_holds() promotes the next entry in line.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.urls import reverse
+from django.utils import timezone
+
+from jobs.tasks import send_mail_later
+from .models import SeatHold, WaitlistEntry
+
+logger = logging.getLogger(__name__)
+
+
+def join_waitlist(user, flight):
+    """
+    Queue a customer for a seat on a flight.
+
+    Returns:
+        tuple: (WaitlistEntry, created); a customer already waiting for the
+        flight keeps their original place
+    """
+    return WaitlistEntry.objects.get_or_create(user=user, flight=flight, status='waiting')
+
+
+def waitlist_position(entry):
+    """1-based place of a waiting entry in its flight's queue."""
+    ahead = WaitlistEntry.objects.queue(entry.flight_id).filter(
+        Q(created_at__lt=entry.created_at) | Q(created_at=entry.created_at, id__lt=entry.id)
+    )
+    return ahead.count() + 1
+
+
+def _notify(entry, hold):
+    if not entry.user.email:
+        return
+    flight = entry.flight
+    link = f"{settings.SITE_URL}{reverse('booking:book_flight', args=[flight.id])}?hold={hold.id}"
+    send_mail_later(
+        subject='A seat is waiting for you - Airline Booking',
+        message=(
+            f'A seat has opened up on flight {flight.origin} -> {flight.destination} '
+            f'departing {timezone.localtime(flight.departure_time):%Y-%m-%d %H:%M}, and it is held for you '
+            f'until {timezone.localtime(hold.expires_at):%Y-%m-%d %H:%M}.\n'
+            f'Confirm your booking here: {link}'
+        ),
+        recipient_list=[entry.user.email],
+    )
+
+
+def promote_waitlist(flight_id, seats=1, now=None):
+    """
+    Hand freed seats to the oldest waiting customers of a flight.
+
+    Must run inside the transaction that frees the seats, which must not
+    put them back on sale itself: the caller releases only the seats left
+    over, `seats - len(holds)`.
+
+    Args:
+        flight_id (int): Flight the seats were freed on
+        seats (int): Number of seats freed
+        now (datetime): Promotion time, defaults to timezone.now()
+
+    Returns:
+        list: The SeatHolds created, one seat each, oldest entry first
+    """
+    now = now or timezone.now()
+    entries = list(
+        WaitlistEntry.objects.queue(flight_id)
+        .select_for_update(skip_locked=True, of=('self',))
+        .select_related('user', 'flight')[:seats]
+    )
+    if not entries:
+        return []
+
+    expires_at = now + timedelta(minutes=settings.WAITLIST_HOLD_MINUTES)
+    holds = SeatHold.objects.bulk_create([
+        SeatHold(user=entry.user, flight=entry.flight, seats=1, expires_at=expires_at)
+        for entry in entries
+    ])
+    WaitlistEntry.objects.filter(pk__in=[entry.pk for entry in entries]).update(
+        status='promoted', promoted_at=now,
+    )
+    for entry, hold in zip(entries, holds):
+        _notify(entry, hold)
+        logger.info(
+            f'Waitlist entry {entry.id} promoted: seat on flight {flight_id} held for '
+            f'user {entry.user.username} until {hold.expires_at}. Hold ID: {hold.id}'
+        )
+    return holds
+
+
+def flights_with_waitlist(flight_ids):
+    """Subset of `flight_ids` that have customers waiting, in one query."""
+    return set(
+        WaitlistEntry.objects.waiting()
+        .filter(flight_id__in=flight_ids)
+        .values_list('flight_id', flat=True)
+        .distinct()
+    )
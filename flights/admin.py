@@ -1,5 +1,11 @@
+from django import forms
 from django.contrib import admin
-from .models import Flight, Route
+from django.utils.html import format_html
+
+from airline_booking.pagination import EstimatedCountPaginator
+from .fares import refresh_route_fares
+from .models import Flight, Route, RouteFare, ScheduleTemplate
+from .schedules import expand_template
 
 
 @admin.register(Route)
@@ -12,6 +18,43 @@ class RouteAdmin(admin.ModelAdmin):
     ordering = ('origin', 'destination')
 
 
+class AirlineListFilter(admin.SimpleListFilter):
+    """Airline filter whose choices come from an index skip scan, not SELECT DISTINCT."""
+    title = 'airline name'
+    parameter_name = 'airline_name'
+
+    def lookups(self, request, model_admin):
+        return [(name, name) for name in Flight.objects.airline_names()]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(airline_name=self.value())
+        return queryset
+
+
+class RouteListFilter(admin.SimpleListFilter):
+    """
+    Route filter that never lists every Route.
+
+    Only the route currently filtered on is loaded; a route is chosen by
+    clicking it in the changelist's route column.
+    """
+    title = 'route'
+    parameter_name = 'route'
+
+    def lookups(self, request, model_admin):
+        route = Route.objects.filter(pk=self.value()).first() if (self.value() or '').isdigit() else None
+        return [(str(route.pk), str(route))] if route else []
+
+    def has_output(self):
+        return bool(self.value())
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(route_id=self.value())
+        return queryset
+
+
 @admin.register(Flight)
 class FlightAdmin(admin.ModelAdmin):
     """
@@ -22,18 +65,25 @@ class FlightAdmin(admin.ModelAdmin):
     - Filter by route and availability
     - Search by origin/destination
     - Custom manager usage for efficient querying
+    - Estimated counts and filters that never read a whole table, for
+      changelists of tens of millions of flights
+    - Action canceling whole flights, refunding every passenger in full
     """
-    list_display = ('id', 'route', 'departure_time', 'price', 'seats_available', 'airline_name')
-    list_filter = ('airline_name', 'departure_time', 'route')
+    list_display = ('id', 'route_link', 'departure_time', 'price', 'seats_available', 'airline_name')
+    list_filter = (AirlineListFilter, 'departure_time', RouteListFilter)
     search_fields = ('origin', 'destination', 'airline_name')
     readonly_fields = ('route',)
+    ordering = ('departure_time', 'id')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = ['cancel_flights']
     
     fieldsets = (
         ('Flight Details', {
-            'fields': ('route', 'origin', 'destination', 'departure_time')
+            'fields': ('route', 'origin', 'destination', 'departure_time', 'duration_minutes')
         }),
         ('Capacity & Pricing', {
-            'fields': ('seats_available', 'price', 'cancel_penalty_percent')
+            'fields': ('seats_available', 'capacity', 'base_price', 'price', 'cancel_penalty_percent')
         }),
         ('Aircraft Information', {
             'fields': ('airplane_type', 'airline_name')
@@ -44,3 +94,98 @@ class FlightAdmin(admin.ModelAdmin):
         """Override to use custom manager efficiently."""
         qs = super().get_queryset(request)
         return qs.select_related('route')
+
+    @admin.action(description='Cancel selected flights and refund passengers', permissions=['change'])
+    def cancel_flights(self, request, queryset):
+        # Imported here: bookings depends on flights, not the other way round.
+        from bookings.cancellation import cancel_flight
+
+        results = [cancel_flight(flight_id) for flight_id in queryset.values_list('pk', flat=True)]
+        results = [result for result in results if result is not None]
+        self.message_user(
+            request,
+            f'{len(results)} flights canceled: {sum(result.bookings for result in results)} bookings, '
+            f'{sum(result.refunded for result in results)} refunded.',
+        )
+
+    @admin.display(description='route', ordering='route')
+    def route_link(self, flight):
+        """The route, linking to this changelist filtered on it."""
+        return format_html('<a href="?{}={}">{}</a>', RouteListFilter.parameter_name, flight.route_id, flight.route)
+
+
+class ScheduleTemplateForm(forms.ModelForm):
+    """Edits the weekday bit mask as a row of checkboxes."""
+
+    operating_days = forms.TypedMultipleChoiceField(
+        choices=ScheduleTemplate.WEEKDAY_CHOICES,
+        coerce=int,
+        widget=forms.CheckboxSelectMultiple,
+    )
+
+    class Meta:
+        model = ScheduleTemplate
+        exclude = ('weekdays',)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        mask = self.instance.weekdays if self.instance.pk else 0b1111111
+        self.initial.setdefault('operating_days', [day for day in range(7) if mask >> day & 1])
+
+    def clean(self):
+        cleaned = super().clean()
+        start, end = cleaned.get('valid_from'), cleaned.get('valid_until')
+        if start and end and start > end:
+            raise forms.ValidationError('valid_until must not be before valid_from.')
+        return cleaned
+
+    def save(self, commit=True):
+        self.instance.weekdays = ScheduleTemplate.weekday_mask(self.cleaned_data['operating_days'])
+        return super().save(commit)
+
+
+@admin.register(ScheduleTemplate)
+class ScheduleTemplateAdmin(admin.ModelAdmin):
+    """
+    Admin interface for ScheduleTemplate model.
+
+    Features:
+    - Weekday checkboxes instead of the raw bit mask
+    - Action expanding the selected templates into flights
+    """
+    form = ScheduleTemplateForm
+    list_display = ('id', 'route', 'airline_name', 'departure_local_time', 'valid_from', 'valid_until', 'is_active')
+    list_filter = ('is_active', 'airline_name')
+    list_select_related = ('route',)
+    autocomplete_fields = ('route',)
+    actions = ['expand_templates']
+
+    @admin.action(description='Create flights for selected templates')
+    def expand_templates(self, request, queryset):
+        created = sum(expand_template(template) for template in queryset)
+        self.message_user(request, f'{created} flights created.')
+
+
+@admin.register(RouteFare)
+class RouteFareAdmin(admin.ModelAdmin):
+    """
+    Admin interface for the RouteFare read model.
+
+    Rows are maintained by flights.fares, so everything is read-only; the
+    action recomputes the selected routes from their flights.
+    """
+    list_display = ('origin', 'destination', 'lowest_price', 'next_departure', 'flights', 'seats_available', 'updated_at')
+    search_fields = ('origin', 'destination')
+    raw_id_fields = ('cheapest_flight',)
+    actions = ['recompute']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.action(description='Recompute selected route fares')
+    def recompute(self, request, queryset):
+        written = refresh_route_fares(queryset.values_list('route_id', flat=True))
+        self.message_user(request, f'{written} route fares recomputed.')
@@ -0,0 +1,230 @@
+"""
+Read-only JSON API for flight search, detail and availability.
+
+Every response carries an ETag built from the versions the search cache
+already keeps (flights.search_cache): the versions of the routes a search
+can match, or the version of a flight's route. Seat changes, price changes
+and flight edits bump those versions, so a client polling with
+If-None-Match gets 304 Not Modified, decided from cache lookups alone,
+until something it can see has changed. Search ETags also roll over every
+SEARCH_CACHE_TIMEOUT seconds, since flights drop out of search results
+once they depart without any version changing.
+
+Search results stream as a JSON document, rows fetched from a server-side
+cursor API_STREAM_CHUNK_SIZE at a time, so large result sets are never
+held in memory in full.
+
+Like the city autocomplete, the API is public: it only exposes the flight
+data the search pages show.
+"""
+import hashlib
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.views.decorators.http import require_safe
+
+from .forms import SearchForm
+from .models import Flight
+from .search_cache import aroute_version, asearch_versions, route_version, search_versions
+
+# Fields of each search result, and of the detail document.
+SEARCH_FIELDS = (
+    'id', 'origin', 'destination', 'departure_time', 'duration_minutes', 'price',
+    'seats_available', 'airline_name',
+)
+DETAIL_FIELDS = SEARCH_FIELDS + ('route_id', 'airplane_type', 'cancel_penalty_percent')
+
+
+def _etag(*parts):
+    return '"' + hashlib.sha1(repr(parts).encode()).hexdigest() + '"'
+
+
+def _not_modified(request, etag):
+    """The 304 response when the client's If-None-Match matches, else None."""
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        response.headers['ETag'] = etag
+    return response
+
+
+def _search_form(request):
+    form = SearchForm(request.GET)
+    if not form.is_valid():
+        return form, None
+    return form, {key: form.cleaned_data[key] or '' for key in ('origin', 'destination', 'date')}
+
+
+def _search_query(params):
+    return Flight.objects.search(**params).order_by('departure_time', 'id').values(*SEARCH_FIELDS)
+
+
+def _time_bucket():
+    return int(time.time() // max(settings.SEARCH_CACHE_TIMEOUT, 1))
+
+
+def _encode(rows):
+    return ','.join(json.dumps(row, cls=DjangoJSONEncoder) for row in rows)
+
+
+def _stream(rows):
+    """Yield a {"results": [...]} document, one chunk of rows at a time."""
+    yield '{"results":['
+    chunk, separator = [], ''
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == settings.API_STREAM_CHUNK_SIZE:
+            yield separator + _encode(chunk)
+            chunk, separator = [], ','
+    if chunk:
+        yield separator + _encode(chunk)
+    yield ']}'
+
+
+async def _astream(rows):
+    """Async version of _stream(), for async iterators of rows."""
+    yield '{"results":['
+    chunk, separator = [], ''
+    async for row in rows:
+        chunk.append(row)
+        if len(chunk) == settings.API_STREAM_CHUNK_SIZE:
+            yield separator + _encode(chunk)
+            chunk, separator = [], ','
+    if chunk:
+        yield separator + _encode(chunk)
+    yield ']}'
+
+
+def _streaming_response(content, etag):
+    response = StreamingHttpResponse(content, content_type='application/json')
+    response.headers['ETag'] = etag
+    return response
+
+
+def _json_response(data, etag):
+    response = JsonResponse(data)
+    response.headers['ETag'] = etag
+    return response
+
+
+def _route_key(pk):
+    return f'flight_api:route:{pk}'
+
+
+def _flight_route(pk):
+    """Route id of a flight, cached (a flight never changes route) so 304s need no query."""
+    route_id = cache.get(_route_key(pk))
+    if route_id is None:
+        route_id = Flight.objects.filter(pk=pk).values_list('route_id', flat=True).first()
+        if route_id is None:
+            raise Http404('No flight matches the given query.')
+        cache.set(_route_key(pk), route_id, timeout=None)
+    return route_id
+
+
+async def _aflight_route(pk):
+    route_id = await cache.aget(_route_key(pk))
+    if route_id is None:
+        route_id = await Flight.objects.filter(pk=pk).values_list('route_id', flat=True).afirst()
+        if route_id is None:
+            raise Http404('No flight matches the given query.')
+        await cache.aset(_route_key(pk), route_id, timeout=None)
+    return route_id
+
+
+def _detail(flight):
+    flight['arrival_time'] = flight['departure_time'] + timedelta(minutes=flight['duration_minutes'])
+    return flight
+
+
+def _availability(flight):
+    return {
+        'id': flight['id'],
+        'seats_available': flight['seats_available'],
+        'price': flight['price'],
+        'is_available': flight['seats_available'] > 0,
+    }
+
+
+def _flight_etag(kind, pk):
+    return _etag(kind, pk, route_version(_flight_route(pk)))
+
+
+async def _aflight_etag(kind, pk):
+    return _etag(kind, pk, await aroute_version(await _aflight_route(pk)))
+
+
+def _flight_row(pk):
+    flight = Flight.objects.filter(pk=pk).values(*DETAIL_FIELDS).first()
+    if flight is None:
+        raise Http404('No flight matches the given query.')
+    return flight
+
+
+async def _aflight_row(pk):
+    flight = await Flight.objects.filter(pk=pk).values(*DETAIL_FIELDS).afirst()
+    if flight is None:
+        raise Http404('No flight matches the given query.')
+    return flight
+
+
+@require_safe
+def flight_search(request):
+    """
+    Search bookable flights; same filters as SearchForm (origin, destination, date).
+
+    Returns a streamed {"results": [...]} ordered by departure, or 400 with
+    the form errors.
+    """
+    form, params = _search_form(request)
+    if params is None:
+        return JsonResponse({'errors': form.errors}, status=400)
+    etag = _etag('search', _time_bucket(), search_versions(**params))
+    return _not_modified(request, etag) or _streaming_response(
+        _stream(_search_query(params).iterator(chunk_size=settings.API_STREAM_CHUNK_SIZE)), etag,
+    )
+
+
+@require_safe
+async def aflight_search(request):
+    """Async version of flight_search, served when ASYNC_VIEWS is on (ASGI)."""
+    form, params = _search_form(request)
+    if params is None:
+        return JsonResponse({'errors': form.errors}, status=400)
+    etag = _etag('search', _time_bucket(), await asearch_versions(**params))
+    return _not_modified(request, etag) or _streaming_response(
+        _astream(_search_query(params).aiterator(chunk_size=settings.API_STREAM_CHUNK_SIZE)), etag,
+    )
+
+
+@require_safe
+def flight_detail(request, pk):
+    """One flight with its schedule, fare and aircraft."""
+    etag = _flight_etag('detail', pk)
+    return _not_modified(request, etag) or _json_response(_detail(_flight_row(pk)), etag)
+
+
+@require_safe
+async def aflight_detail(request, pk):
+    """Async version of flight_detail, served when ASYNC_VIEWS is on (ASGI)."""
+    etag = await _aflight_etag('detail', pk)
+    return _not_modified(request, etag) or _json_response(_detail(await _aflight_row(pk)), etag)
+
+
+@require_safe
+def flight_availability(request, pk):
+    """Seats left and current fare of one flight, for polling."""
+    etag = _flight_etag('availability', pk)
+    return _not_modified(request, etag) or _json_response(_availability(_flight_row(pk)), etag)
+
+
+@require_safe
+async def aflight_availability(request, pk):
+    """Async version of flight_availability, served when ASYNC_VIEWS is on (ASGI)."""
+    etag = await _aflight_etag('availability', pk)
+    return _not_modified(request, etag) or _json_response(_availability(await _aflight_row(pk)), etag)
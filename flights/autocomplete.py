@@ -0,0 +1,79 @@
+"""
+In-memory prefix index of Route origins and destinations for autocomplete.
+
+The distinct city names are loaded once per process into sorted lists and
+answered with binary search, so keystroke lookups never touch the database.
+Saving or deleting a Route rebuilds the index after the transaction commits;
+changes made by other processes are picked up when the index is older than
+AUTOCOMPLETE_MAX_AGE seconds.
+"""
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+
+AUTOCOMPLETE_FIELDS = ('origin', 'destination')
+
+
+class PrefixIndex:
+    """
+    Sorted (key, name) pairs searchable by prefix.
+
+    Every word of a name is indexed, so "york" finds "New York" as well.
+    """
+
+    def __init__(self, names):
+        entries = set()
+        for name in names:
+            words = name.split()
+            for i in range(len(words)):
+                entries.add((' '.join(words[i:]).casefold(), name))
+        self._entries = sorted(entries)
+        self._keys = [key for key, _ in self._entries]
+
+    def search(self, prefix, limit=10):
+        """Return up to `limit` distinct names with a word starting with `prefix`."""
+        prefix = prefix.strip().casefold()
+        if not prefix:
+            return []
+        results = []
+        for i in range(bisect_left(self._keys, prefix), len(self._keys)):
+            if not self._keys[i].startswith(prefix):
+                break
+            name = self._entries[i][1]
+            if name not in results:
+                results.append(name)
+                if len(results) == limit:
+                    break
+        return results
+
+
+class CityIndex:
+    """Process-wide holder of one PrefixIndex per SearchForm field."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._indexes = None
+        self._built_at = 0.0
+
+    def rebuild(self):
+        """Reload distinct origins/destinations from Route and swap the indexes in."""
+        from .models import Route
+
+        indexes = {
+            field: PrefixIndex(Route.objects.values_list(field, flat=True).distinct())
+            for field in AUTOCOMPLETE_FIELDS
+        }
+        with self._lock:
+            self._indexes = indexes
+            self._built_at = time.monotonic()
+
+    def suggest(self, field, prefix, limit=10):
+        """Return city names for `field` ('origin' or 'destination') starting with `prefix`."""
+        if self._indexes is None or time.monotonic() - self._built_at > settings.AUTOCOMPLETE_MAX_AGE:
+            self.rebuild()
+        return self._indexes[field].search(prefix, limit)
+
+
+city_index = CityIndex()
@@ -0,0 +1,316 @@
+"""
+Connecting-flight search for city pairs with no direct flight.
+
+Routes form a directed graph of cities, kept in memory per process the way
+the autocomplete index is: built from Route on first use, dropped when a
+Route is saved or deleted and reloaded after CONNECTION_GRAPH_MAX_AGE
+seconds so other processes' changes show up. The graph yields the 1 and 2
+stop paths between two cities without touching the database.
+
+Flights for every route on those paths are then fetched in one query and
+grouped into per-route arrays sorted by departure. Each leg is matched to
+the next with two binary searches for the layover window
+[arrival + CONNECTION_MIN_LAYOVER, arrival + CONNECTION_MAX_LAYOVER], so
+matching costs O(log n) per leg instead of a self-join per stop.
+
+Results go through the versioned search cache, keyed on every route of
+every candidate path, so a booking on any leg drops them.
+"""
+import heapq
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .search_cache import aget_or_compute, get_or_compute
+
+# Flight columns an itinerary carries, enough to render and book each leg.
+LEG_COLUMNS = (
+    'id', 'route_id', 'origin', 'destination', 'departure_time', 'duration_minutes',
+    'price', 'seats_available', 'airline_name',
+)
+
+
+class RouteGraph:
+    """Directed graph of cities, one edge (with its route id) per Route."""
+
+    def __init__(self, routes):
+        self._outgoing = defaultdict(dict)
+        self._incoming = defaultdict(set)
+        for route_id, origin, destination in routes:
+            self._outgoing[origin][destination] = route_id
+            self._incoming[destination].add(origin)
+        self._cities = sorted(set(self._outgoing) | set(self._incoming))
+
+    def __len__(self):
+        return sum(len(edges) for edges in self._outgoing.values())
+
+    def cities(self, query):
+        """Cities whose name contains `query`, case-insensitively (like icontains)."""
+        query = query.strip().casefold()
+        if not query:
+            return set()
+        return {city for city in self._cities if query in city.casefold()}
+
+    def paths(self, origins, destinations, max_stops=2):
+        """
+        Route id tuples leading from any of `origins` to any of `destinations`.
+
+        Only paths with 1..max_stops intermediate cities are returned; they
+        never pass through an origin or destination city or visit a city
+        twice.
+        """
+        ends = set(origins) | set(destinations)
+        # Cities with a direct route into a destination, for the last hop.
+        before_destination = set().union(*(self._incoming[city] for city in destinations)) - ends
+        paths = []
+        for origin in origins:
+            for first_stop, first_route in self._outgoing[origin].items():
+                if first_stop in ends:
+                    continue
+                hops = self._outgoing[first_stop]
+                for destination in destinations:
+                    if destination in hops:
+                        paths.append((first_route, hops[destination]))
+                if max_stops < 2:
+                    continue
+                for second_stop in before_destination & hops.keys():
+                    if second_stop == first_stop:
+                        continue
+                    last_hops = self._outgoing[second_stop]
+                    for destination in destinations:
+                        if destination in last_hops:
+                            paths.append((first_route, hops[second_stop], last_hops[destination]))
+        return paths
+
+
+class RouteGraphCache:
+    """Process-wide holder of the current RouteGraph."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._graph = None
+        self._built_at = 0.0
+
+    def _stale(self):
+        return (
+            self._graph is None
+            or time.monotonic() - self._built_at > settings.CONNECTION_GRAPH_MAX_AGE
+        )
+
+    def _swap(self, routes):
+        graph = RouteGraph(routes)
+        with self._lock:
+            self._graph = graph
+            self._built_at = time.monotonic()
+        return graph
+
+    def _routes(self):
+        from .models import Route
+
+        return Route.objects.values_list('id', 'origin', 'destination')
+
+    def get(self):
+        """Return the graph, loading it from Route when missing or too old."""
+        graph = self._graph
+        if self._stale():
+            graph = self._swap(list(self._routes()))
+        return graph
+
+    async def aget(self):
+        """Async version of get(), loading routes with the async ORM."""
+        graph = self._graph
+        if self._stale():
+            graph = self._swap([route async for route in self._routes()])
+        return graph
+
+    def invalidate(self):
+        """Drop the graph; the next search reloads it."""
+        with self._lock:
+            self._graph = None
+
+
+route_graph = RouteGraphCache()
+
+
+@dataclass
+class Itinerary:
+    """A sequence of flights, each leaving within the layover window of the previous one."""
+    legs: list
+
+    @property
+    def origin(self):
+        return self.legs[0]['origin']
+
+    @property
+    def destination(self):
+        return self.legs[-1]['destination']
+
+    @property
+    def departure_time(self):
+        return self.legs[0]['departure_time']
+
+    @property
+    def arrival_time(self):
+        return _arrival(self.legs[-1])
+
+    @property
+    def duration(self):
+        return self.arrival_time - self.departure_time
+
+    @property
+    def duration_label(self):
+        hours, minutes = divmod(int(self.duration.total_seconds()) // 60, 60)
+        return f'{hours}h {minutes:02d}m'
+
+    @property
+    def price(self):
+        return sum(leg['price'] for leg in self.legs)
+
+    @property
+    def stops(self):
+        return len(self.legs) - 1
+
+    @property
+    def layovers(self):
+        return [later['departure_time'] - _arrival(earlier) for earlier, later in zip(self.legs, self.legs[1:])]
+
+
+def _arrival(leg):
+    return leg['departure_time'] + timedelta(minutes=leg['duration_minutes'])
+
+
+def _window(date):
+    """First-leg departure window: the given day, or the next CONNECTION_SEARCH_DAYS."""
+    from .models import departure_day_bounds
+
+    if date:
+        return departure_day_bounds(date)
+    now = timezone.now()
+    return now, now + timedelta(days=settings.CONNECTION_SEARCH_DAYS)
+
+
+def _flight_query(route_ids, start, end, stops):
+    """Bookable flights on `route_ids` that can be part of an itinerary starting in [start, end)."""
+    from .models import Flight
+
+    # Later legs leave up to one block time plus one layover per stop after
+    # the first leg; a day per stop comfortably covers the block times.
+    latest = end + stops * (timedelta(minutes=settings.CONNECTION_MAX_LAYOVER) + timedelta(days=1))
+    return (
+        Flight.objects.available()
+        .filter(route_id__in=route_ids, departure_time__gte=start, departure_time__lt=latest)
+        .order_by('route_id', 'departure_time', 'id')
+        .values(*LEG_COLUMNS)
+    )
+
+
+class Timetable:
+    """Per-route flight lists sorted by departure, with parallel departure arrays for bisect."""
+
+    def __init__(self, rows):
+        self._flights = defaultdict(list)
+        for row in rows:
+            self._flights[row['route_id']].append(row)
+        self._departures = {
+            route_id: [flight['departure_time'] for flight in flights]
+            for route_id, flights in self._flights.items()
+        }
+
+    def between(self, route_id, earliest, latest):
+        """Flights on `route_id` departing in [earliest, latest], by two binary searches."""
+        departures = self._departures.get(route_id)
+        if not departures:
+            return []
+        return self._flights[route_id][bisect_left(departures, earliest):bisect_right(departures, latest)]
+
+
+def match_itineraries(timetable, paths, start, end, limit=None):
+    """
+    Chain flights along each path within the layover limits.
+
+    Args:
+        timetable (Timetable): Flights of every route in `paths`
+        paths (list): Route id tuples from RouteGraph.paths()
+        start, end (datetime): Window for the first leg's departure
+        limit (int): Itineraries to keep, defaults to CONNECTION_MAX_RESULTS
+
+    Returns:
+        list: Itinerary objects, shortest total duration first (cheapest
+        on ties)
+    """
+    min_layover = timedelta(minutes=settings.CONNECTION_MIN_LAYOVER)
+    max_layover = timedelta(minutes=settings.CONNECTION_MAX_LAYOVER)
+    found = []
+
+    def extend(legs, remaining):
+        if not remaining:
+            found.append(legs)
+            return
+        arrival = _arrival(legs[-1])
+        for flight in timetable.between(remaining[0], arrival + min_layover, arrival + max_layover):
+            extend(legs + [flight], remaining[1:])
+
+    for path in paths:
+        for flight in timetable.between(path[0], start, end):
+            if flight['departure_time'] < end:
+                extend([flight], path[1:])
+
+    itineraries = [Itinerary(legs) for legs in found]
+    return heapq.nsmallest(
+        limit or settings.CONNECTION_MAX_RESULTS, itineraries,
+        key=lambda itinerary: (itinerary.duration, itinerary.price, itinerary.departure_time),
+    )
+
+
+def _plan(graph, origin, destination):
+    paths = graph.paths(graph.cities(origin), graph.cities(destination), settings.CONNECTION_MAX_STOPS)
+    return paths, sorted({route_id for path in paths for route_id in path})
+
+
+def find_connections(origin, destination, date=''):
+    """
+    Return connecting itineraries from `origin` to `destination`.
+
+    Args:
+        origin (str): Departure city (case-insensitive, partial match)
+        destination (str): Arrival city (case-insensitive, partial match)
+        date (str or date): Day the first leg departs; defaults to the next
+            CONNECTION_SEARCH_DAYS days
+
+    Returns:
+        list: Itinerary objects, best first
+    """
+    if not origin or not destination:
+        return []
+    paths, route_ids = _plan(route_graph.get(), origin, destination)
+    if not paths:
+        return []
+    start, end = _window(date)
+
+    def compute():
+        rows = _flight_query(route_ids, start, end, settings.CONNECTION_MAX_STOPS)
+        return match_itineraries(Timetable(rows), paths, start, end)
+
+    return get_or_compute(origin, destination, date, compute, extra=('connections',), route_ids=route_ids)
+
+
+async def afind_connections(origin, destination, date=''):
+    """Async version of find_connections(), built on the async ORM."""
+    if not origin or not destination:
+        return []
+    paths, route_ids = _plan(await route_graph.aget(), origin, destination)
+    if not paths:
+        return []
+    start, end = _window(date)
+
+    async def acompute():
+        rows = _flight_query(route_ids, start, end, settings.CONNECTION_MAX_STOPS)
+        return match_itineraries(Timetable([row async for row in rows]), paths, start, end)
+
+    return await aget_or_compute(origin, destination, date, acompute, extra=('connections',), route_ids=route_ids)
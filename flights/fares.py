@@ -0,0 +1,145 @@
+"""
+Maintenance of the RouteFare read model.
+
+Each RouteFare row holds the lowest bookable fare (and its flight), the
+next departure, the number of bookable flights and their seats for one
+Route, so the cheapest-from and fare matrix pages read one row per route
+instead of aggregating every future flight.
+
+Rows are recomputed for a set of routes by a single INSERT ... SELECT
+... ON CONFLICT statement. Whoever changes seats, prices or schedules calls
+refresh_after_commit() with the routes touched (flights.inventory, the
+Flight signals, schedule imports and template expansion do), which queues
+a refresh_route_fares job in the same transaction: the request only pays
+for one INSERT and the run_jobs worker recomputes the rows once the change
+has committed. Jobs claimed together are merged into one refresh of the
+union of their routes, so a burst of bookings on a route costs a single
+statement.
+
+Concurrent refreshes of the same route take a transaction-level advisory
+lock first, so the statement that writes last also read the latest
+committed flights. Rows go stale only when time passes a departure;
+`rebuild_route_fares --departed` (e.g. from cron) recomputes those.
+"""
+from django.db import connection, transaction
+from django.utils import timezone
+
+from jobs.queue import enqueue, task
+from .models import Flight, Route, RouteFare
+
+# First key of the two-key advisory locks held while refreshing a route.
+LOCK_NAMESPACE = 0x46415245
+
+
+def _upsert_sql():
+    flight = connection.ops.quote_name(Flight._meta.db_table)
+    route = connection.ops.quote_name(Route._meta.db_table)
+    fare = connection.ops.quote_name(RouteFare._meta.db_table)
+    # One pass over the routes' bookable flights feeds both the GROUP BY and
+    # the DISTINCT ON, which beats a per-route subquery once many routes
+    # are refreshed together (bulk imports, repricing, rebuilds).
+    return f"""
+        WITH bookable AS (
+            SELECT route_id, id, price, departure_time, seats_available FROM {flight}
+            WHERE route_id = ANY(%(route_ids)s) AND seats_available > 0 AND departure_time >= %(now)s
+        ), totals AS (
+            SELECT route_id, min(departure_time) AS next_departure, count(*) AS flights,
+                   sum(seats_available) AS seats
+            FROM bookable GROUP BY route_id
+        ), cheapest AS (
+            SELECT DISTINCT ON (route_id) route_id, id, price FROM bookable
+            ORDER BY route_id, price, departure_time, id
+        )
+        INSERT INTO {fare} (
+            route_id, origin, destination, lowest_price, cheapest_flight_id,
+            next_departure, flights, seats_available, updated_at
+        )
+        SELECT r.id, r.origin, r.destination, cheapest.price, cheapest.id,
+               totals.next_departure, coalesce(totals.flights, 0), coalesce(totals.seats, 0), %(now)s
+        FROM {route} r
+        LEFT JOIN totals ON totals.route_id = r.id
+        LEFT JOIN cheapest ON cheapest.route_id = r.id
+        WHERE r.id = ANY(%(route_ids)s)
+        ON CONFLICT (route_id) DO UPDATE SET
+            origin = EXCLUDED.origin,
+            destination = EXCLUDED.destination,
+            lowest_price = EXCLUDED.lowest_price,
+            cheapest_flight_id = EXCLUDED.cheapest_flight_id,
+            next_departure = EXCLUDED.next_departure,
+            flights = EXCLUDED.flights,
+            seats_available = EXCLUDED.seats_available,
+            updated_at = EXCLUDED.updated_at
+    """
+
+
+def refresh_route_fares(route_ids):
+    """
+    Recompute the RouteFare rows of `route_ids` from their flights.
+
+    Args:
+        route_ids (iterable): Route primary keys; unknown ids are ignored
+
+    Returns:
+        int: Number of rows written
+    """
+    route_ids = sorted(set(route_ids))
+    if not route_ids:
+        return 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        # The two-key lock takes int4 keys, so bigint route ids are hashed;
+        # a collision only makes two routes' refreshes wait for each other.
+        # Sorted by key so two refreshes of overlapping routes cannot deadlock.
+        cursor.execute(
+            'SELECT count(pg_advisory_xact_lock(%s, key)) FROM ('
+            'SELECT DISTINCT hashint8(route_id) AS key FROM unnest(%s::bigint[]) AS route_id ORDER BY key'
+            ') AS keys',
+            [LOCK_NAMESPACE, route_ids],
+        )
+        cursor.execute(
+            _upsert_sql(),
+            {'now': timezone.now(), 'route_ids': route_ids},
+        )
+        return cursor.rowcount
+
+
+def refresh_after_commit(route_ids):
+    """
+    Queue a refresh of the routes that runs once the current transaction commits.
+
+    The job is inserted in the caller's transaction, so it is dropped with a
+    rolled back change and only becomes due when the change is visible.
+    """
+    route_ids = sorted(set(route_ids))
+    if route_ids:
+        enqueue('refresh_route_fares', {'route_ids': route_ids})
+
+
+@task('refresh_route_fares', batch=True)
+def refresh_route_fares_batch(payloads):
+    """Refresh the union of the queued routes in one statement; a failure retries every job."""
+    refresh_route_fares(route_id for payload in payloads for route_id in payload['route_ids'])
+    return [None] * len(payloads)
+
+
+def rebuild_route_fares(batch_size=1000, departed_only=False):
+    """
+    Recompute RouteFare rows for every route, `batch_size` routes per statement.
+
+    Args:
+        batch_size (int): Routes recomputed per transaction
+        departed_only (bool): Only rows whose next departure has passed
+            (the ones time made stale)
+
+    Returns:
+        int: Number of rows written
+    """
+    if departed_only:
+        ids = RouteFare.objects.filter(next_departure__lt=timezone.now()).values_list('route_id', flat=True)
+    else:
+        ids = Route.objects.values_list('id', flat=True)
+    ids = list(ids.order_by('pk'))
+
+    written = 0
+    for start in range(0, len(ids), batch_size):
+        written += refresh_route_fares(ids[start:start + batch_size])
+    return written
@@ -1,6 +1,26 @@
 from django import forms
+from django.conf import settings
 
 class SearchForm(forms.Form):
-    origin = forms.CharField(required=False)
-    destination = forms.CharField(required=False)
-    date = forms.DateField(required=False, widget=forms.DateInput(attrs={"type": "date"}))
\ No newline at end of file
+    origin = forms.CharField(
+        required=False,
+        widget=forms.TextInput(attrs={"list": "origin-suggestions", "autocomplete": "off"}),
+    )
+    destination = forms.CharField(
+        required=False,
+        widget=forms.TextInput(attrs={"list": "destination-suggestions", "autocomplete": "off"}),
+    )
+    date = forms.DateField(required=False, widget=forms.DateInput(attrs={"type": "date"}))
+    flexible = forms.BooleanField(
+        required=False,
+        label=f"Flexible dates (±{settings.FARE_CALENDAR_DAYS} days)",
+        widget=forms.CheckboxInput(attrs={"class": "form-check-input"}),
+    )
+
+
+class FareCalendarForm(forms.Form):
+    """Query parameters of the fare calendar endpoint."""
+    origin = forms.CharField()
+    destination = forms.CharField()
+    date = forms.DateField(required=False)
+    days = forms.IntegerField(required=False, min_value=0, max_value=settings.FARE_CALENDAR_MAX_DAYS)
@@ -0,0 +1,110 @@
+"""
+Seat inventory for flights.
+
+Every seat change is a single conditional UPDATE executed by the database,
+so concurrent bookings and cancellations on the same flight cannot overwrite
+each other's changes the way a Python read-modify-write on
+Flight.seats_available would.
+
+Call these inside transaction.atomic() together with the Booking write so
+the seat change and the booking commit (or roll back) as one unit. Cached
+search results are invalidated once it commits, and a background job
+refreshes the RouteFare row for the flight's route (see flights.fares).
+"""
+from django.db import connection, transaction
+from django.db.models import Case, F, Value, When
+from .fares import refresh_after_commit
+from .models import Flight
+from .search_cache import invalidate_routes
+
+
+def _update_seats(flight_id, delta, guard):
+    table = connection.ops.quote_name(Flight._meta.db_table)
+    column = connection.ops.quote_name('seats_available')
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {table} SET {column} = {column} + %s '
+            f'WHERE id = %s{guard} RETURNING {column}, route_id',
+            [delta, flight_id] + ([-delta] if guard else []),
+        )
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    seats, route_id = row
+    transaction.on_commit(lambda: invalidate_routes([route_id]))
+    refresh_after_commit([route_id])
+    return seats
+
+
+def take_seats(flight_id, count=1):
+    """
+    Take seats on a flight if enough are left.
+
+    Args:
+        flight_id (int): Flight primary key
+        count (int): Number of seats to take
+
+    Returns:
+        int | None: Seats available after the update, or None if the flight
+        does not have `count` seats left (nothing is changed in that case)
+    """
+    column = connection.ops.quote_name('seats_available')
+    return _update_seats(flight_id, -count, f' AND {column} >= %s')
+
+
+def release_seats(flight_id, count=1):
+    """
+    Return seats to a flight, e.g. after a cancellation.
+
+    Returns:
+        int | None: Seats available after the update, or None if the flight
+        no longer exists
+    """
+    return _update_seats(flight_id, count, '')
+
+
+def close_flight(flight_id):
+    """
+    Take every remaining seat off sale, e.g. when the flight is canceled.
+
+    The UPDATE locks the flight row, so bookings racing with it either
+    commit first or find no seats left.
+
+    Returns:
+        bool: False if the flight does not exist
+    """
+    table = connection.ops.quote_name(Flight._meta.db_table)
+    column = connection.ops.quote_name('seats_available')
+    with connection.cursor() as cursor:
+        cursor.execute(f'UPDATE {table} SET {column} = 0 WHERE id = %s RETURNING route_id', [flight_id])
+        row = cursor.fetchone()
+    if row is None:
+        return False
+    route_id = row[0]
+    transaction.on_commit(lambda: invalidate_routes([route_id]))
+    refresh_after_commit([route_id])
+    return True
+
+
+def release_seat_counts(seats_by_flight):
+    """
+    Return seats to several flights with a single UPDATE.
+
+    Args:
+        seats_by_flight (dict): Mapping of flight id to number of seats to return
+
+    Returns:
+        int: Number of flights updated
+    """
+    if not seats_by_flight:
+        return 0
+    delta = Case(
+        *[When(pk=flight_id, then=Value(count)) for flight_id, count in seats_by_flight.items()],
+        default=Value(0),
+    )
+    flights = Flight.objects.filter(pk__in=seats_by_flight)
+    updated = flights.update(seats_available=F('seats_available') + delta)
+    route_ids = list(flights.values_list('route_id', flat=True).distinct())
+    transaction.on_commit(lambda: invalidate_routes(route_ids))
+    refresh_after_commit(route_ids)
+    return updated
@@ -0,0 +1,47 @@
+import datetime
+import logging
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from flights.models import ScheduleTemplate
+from flights.schedules import expand_all, expand_template
+
+logger = logging.getLogger(__name__)
+
+
+def _date(value):
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f'Expected a date as YYYY-MM-DD, got {value!r}')
+
+
+class Command(BaseCommand):
+    help = "Create the Flight rows of schedule templates; departures that already exist are skipped."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--template', type=int, action='append', help='Template id (repeatable; default: all active).')
+        parser.add_argument('--from', dest='start', type=_date, help='First day to expand (default: start of validity).')
+        parser.add_argument('--until', dest='end', type=_date, help='Last day to expand (default: end of validity).')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per INSERT.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        if options['template']:
+            templates = ScheduleTemplate.objects.filter(pk__in=options['template'])
+            results = {
+                template.pk: expand_template(template, options['start'], options['end'], options['batch_size'])
+                for template in templates
+            }
+        else:
+            results = expand_all(options['start'], options['end'], options['batch_size'])
+
+        for pk, created in results.items():
+            self.stdout.write(f'Template {pk}: {created} flights created')
+        summary = (
+            f'Expanded {len(results)} templates into {sum(results.values())} flights '
+            f'in {time.perf_counter() - started:.2f}s'
+        )
+        logger.info(summary)
+        self.stdout.write(summary)
@@ -0,0 +1,68 @@
+import gzip
+import logging
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from flights.schedule_import import RowError, import_schedule, iter_csv, iter_json
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-load flights from a CSV or JSON (array or JSON Lines) schedule file. "
+        "Columns: origin, destination, departure_time, price, seats, airplane_type, "
+        "cancel_penalty_percent, airline_name."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Schedule file; .gz files are decompressed on the fly.')
+        parser.add_argument(
+            '--format', choices=['csv', 'json'],
+            help='Input format (default: from the file extension).',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=10_000,
+            help='Rows written per COPY / bulk statement.',
+        )
+        parser.add_argument(
+            '--upsert', action='store_true',
+            help='Update flights already present (same route, departure time and airline) instead of duplicating them.',
+        )
+        parser.add_argument(
+            '--no-copy', action='store_true',
+            help='Use bulk_create instead of PostgreSQL COPY.',
+        )
+        parser.add_argument(
+            '--max-errors', type=int, default=100,
+            help='Abort and roll back after this many bad rows.',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        name = path[:-3] if path.endswith('.gz') else path
+        fmt = options['format'] or ('json' if os.path.splitext(name)[1] in ('.json', '.jsonl', '.ndjson') else 'csv')
+        opener = gzip.open if path.endswith('.gz') else open
+        try:
+            with opener(path, 'rt', encoding='utf-8', newline='') as stream:
+                records = iter_json(stream) if fmt == 'json' else iter_csv(stream)
+                result = import_schedule(
+                    records,
+                    batch_size=options['batch_size'],
+                    upsert=options['upsert'],
+                    use_copy=False if options['no_copy'] else None,
+                    max_errors=options['max_errors'],
+                )
+        except (OSError, RowError, ValueError) as exc:
+            raise CommandError(f'Import of {path} failed: {exc}')
+
+        for line, message in result.errors:
+            self.stderr.write(f'Record {line}: {message}')
+        summary = (
+            f'Imported {result.rows} rows from {path} in {result.seconds:.2f}s '
+            f'({result.rows_per_second:.0f} rows/s): {result.created} flights created, '
+            f'{result.updated} updated, {result.routes_created} new routes, {len(result.errors)} rows skipped'
+        )
+        logger.info(summary)
+        self.stdout.write(summary)
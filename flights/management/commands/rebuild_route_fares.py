@@ -0,0 +1,26 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+
+from flights.fares import rebuild_route_fares
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Recompute the lowest-fare read model (RouteFare) from the flights table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Routes recomputed per transaction.')
+        parser.add_argument(
+            '--departed', action='store_true',
+            help='Only routes whose stored next departure has passed (run periodically).',
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        written = rebuild_route_fares(options['batch_size'], departed_only=options['departed'])
+        summary = f'Recomputed {written} route fares in {time.perf_counter() - started:.2f}s'
+        logger.info(summary)
+        self.stdout.write(summary)
@@ -0,0 +1,55 @@
+import logging
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from flights.models import Flight
+from flights.pricing import reprice_flights
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Recompute future flight prices from load factor and days to departure (settings.PRICING_CURVES)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Show the price changes without writing them.')
+        parser.add_argument('--limit', type=int, default=50, help='Changes listed in the dry-run diff (0: all).')
+        parser.add_argument('--batch-size', type=int, default=50_000, help='Prices written per UPDATE.')
+
+    def _diff(self, result, limit):
+        shown = result.changed if limit <= 0 else min(limit, result.changed)
+        order = result.ids.argsort()[:shown]
+        flights = Flight.objects.in_bulk(result.ids[order].tolist())
+        self.stdout.write(
+            f"{'flight':>10}  {'route':<32}{'departure':<18}{'load':>6}{'days':>7}{'old':>8}{'new':>8}{'change':>9}"
+        )
+        for i in order:
+            flight = flights.get(int(result.ids[i]))
+            route = f'{flight.origin} → {flight.destination}' if flight else '?'
+            departure = f'{timezone.localtime(flight.departure_time):%Y-%m-%d %H:%M}' if flight else '?'
+            old, new = int(result.old_prices[i]), int(result.new_prices[i])
+            change = (new - old) / old * 100 if old else 0.0
+            self.stdout.write(
+                f'{result.ids[i]:>10}  {route[:31]:<32}{departure:<18}{result.load_factors[i]:>6.0%}'
+                f'{result.days_left[i]:>7.1f}{old:>8}{new:>8}{change:>+8.1f}%'
+            )
+        if shown < result.changed:
+            self.stdout.write(f'... {result.changed - shown} more')
+
+    def handle(self, *args, **options):
+        result = reprice_flights(dry_run=options['dry_run'], batch_size=options['batch_size'])
+        if options['dry_run']:
+            if result.changed:
+                self._diff(result, options['limit'])
+            verb = 'Would change'
+        else:
+            verb = 'Changed'
+        summary = (
+            f'{verb} {result.changed} of {result.flights} future flight prices in {result.seconds:.2f}s '
+            f'(load {result.load_seconds:.2f}s, price {result.price_seconds:.2f}s, write {result.write_seconds:.2f}s)'
+        )
+        if result.changed:
+            summary += f'; mean change {(result.new_prices - result.old_prices).mean():+.1f}'
+        logger.info(summary)
+        self.stdout.write(summary)
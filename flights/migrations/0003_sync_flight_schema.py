@@ -0,0 +1,93 @@
+"""
+Migration bringing the flights_flight table in line with the Flight model.
+
+0001_initial still described the original schema (airline, plane_type, date,
+time, seats_total). The model has since moved to a single departure_time and
+denormalized origin/destination columns, so the existing rows are carried over
+here instead of being dropped.
+"""
+import datetime
+
+from django.db import migrations, models
+
+
+def copy_legacy_columns(apps, schema_editor):
+    """Fill origin/destination from the route and departure_time from date + time."""
+    Flight = apps.get_model('flights', 'Flight')
+    for flight in Flight.objects.select_related('route').iterator():
+        flight.origin = flight.route.origin
+        flight.destination = flight.route.destination
+        flight.departure_time = datetime.datetime.combine(
+            flight.date, flight.time, tzinfo=datetime.timezone.utc
+        )
+        flight.save(update_fields=['origin', 'destination', 'departure_time'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flights', '0002_update_flight_manager'),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='flight',
+            old_name='airline',
+            new_name='airline_name',
+        ),
+        migrations.RenameField(
+            model_name='flight',
+            old_name='plane_type',
+            new_name='airplane_type',
+        ),
+        migrations.AddField(
+            model_name='flight',
+            name='origin',
+            field=models.CharField(default='', max_length=100),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='flight',
+            name='destination',
+            field=models.CharField(default='', max_length=100),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='flight',
+            name='departure_time',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.RunPython(copy_legacy_columns, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='flight',
+            name='departure_time',
+            field=models.DateTimeField(),
+        ),
+        migrations.RemoveField(
+            model_name='flight',
+            name='date',
+        ),
+        migrations.RemoveField(
+            model_name='flight',
+            name='time',
+        ),
+        migrations.RemoveField(
+            model_name='flight',
+            name='seats_total',
+        ),
+        migrations.AlterField(
+            model_name='flight',
+            name='price',
+            field=models.PositiveIntegerField(),
+        ),
+        migrations.AlterField(
+            model_name='flight',
+            name='seats_available',
+            field=models.PositiveIntegerField(),
+        ),
+        migrations.AlterField(
+            model_name='flight',
+            name='cancel_penalty_percent',
+            field=models.PositiveIntegerField(),
+        ),
+    ]
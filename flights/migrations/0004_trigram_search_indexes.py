@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:55
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flights', '0003_sync_flight_schema'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='flight',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('origin'), name='gin_trgm_ops'), name='flight_origin_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='flight',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('destination'), name='gin_trgm_ops'), name='flight_destination_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='route',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('origin'), name='gin_trgm_ops'), name='route_origin_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='route',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('destination'), name='gin_trgm_ops'), name='route_destination_trgm'),
+        ),
+    ]
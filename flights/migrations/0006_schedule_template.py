@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flights', '0005_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduleTemplate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('airline_name', models.CharField(max_length=100)),
+                ('weekdays', models.PositiveSmallIntegerField(default=127, help_text='Bit mask of operating days, bit 0 = Monday.')),
+                ('departure_local_time', models.TimeField(help_text='Departure time in the site time zone.')),
+                ('valid_from', models.DateField()),
+                ('valid_until', models.DateField(help_text='Last day of operation (inclusive).')),
+                ('airplane_type', models.CharField(max_length=100)),
+                ('price', models.PositiveIntegerField()),
+                ('seats', models.PositiveIntegerField()),
+                ('cancel_penalty_percent', models.PositiveIntegerField(default=10)),
+                ('is_active', models.BooleanField(default=True)),
+                ('route', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='schedule_templates', to='flights.route')),
+            ],
+            options={
+                'verbose_name': 'Schedule template',
+                'verbose_name_plural': 'Schedule templates',
+            },
+        ),
+    ]
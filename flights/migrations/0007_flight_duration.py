@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flights', '0006_schedule_template'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='flight',
+            name='duration_minutes',
+            field=models.PositiveIntegerField(db_default=90, default=90, help_text='Scheduled block time, departure to arrival.'),
+        ),
+        migrations.AddField(
+            model_name='scheduletemplate',
+            name='duration_minutes',
+            field=models.PositiveIntegerField(default=90),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:31
+
+import django.db.models.deletion
+import django.db.models.functions.text
+from django.db import migrations, models
+
+# Initial fill; same statement as flights.fares for every route.
+FILL_ROUTE_FARES = """
+    INSERT INTO flights_routefare (
+        route_id, origin, destination, lowest_price, cheapest_flight_id,
+        next_departure, flights, seats_available, updated_at
+    )
+    SELECT r.id, r.origin, r.destination, cheapest.price, cheapest.id,
+           totals.next_departure, totals.flights, totals.seats, now()
+    FROM flights_route r
+    CROSS JOIN LATERAL (
+        SELECT min(f.departure_time) AS next_departure, count(*) AS flights,
+               coalesce(sum(f.seats_available), 0) AS seats
+        FROM flights_flight f
+        WHERE f.route_id = r.id AND f.seats_available > 0 AND f.departure_time >= now()
+    ) totals
+    LEFT JOIN LATERAL (
+        SELECT f.id, f.price FROM flights_flight f
+        WHERE f.route_id = r.id AND f.seats_available > 0 AND f.departure_time >= now()
+        ORDER BY f.price, f.departure_time, f.id LIMIT 1
+    ) cheapest ON true
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flights', '0007_flight_duration'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RouteFare',
+            fields=[
+                ('route', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='fare', serialize=False, to='flights.route')),
+                ('origin', models.CharField(max_length=100)),
+                ('destination', models.CharField(max_length=100)),
+                ('lowest_price', models.PositiveIntegerField(null=True)),
+                ('next_departure', models.DateTimeField(null=True)),
+                ('flights', models.PositiveIntegerField(default=0)),
+                ('seats_available', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('cheapest_flight', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='flights.flight')),
+            ],
+            options={
+                'verbose_name': 'Route fare',
+                'verbose_name_plural': 'Route fares',
+                'indexes': [models.Index(django.db.models.functions.text.Upper('origin'), models.F('lowest_price'), name='routefare_origin_price_idx')],
+            },
+        ),
+        migrations.RunSQL(FILL_ROUTE_FARES, migrations.RunSQL.noop),
+    ]
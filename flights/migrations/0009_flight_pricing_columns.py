@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:33
+
+from django.db import migrations, models
+
+# Existing flights: the current price becomes the base fare and capacity is
+# what is left plus what active bookings and seat holds have taken.
+FILL_PRICING_COLUMNS = """
+    UPDATE flights_flight f SET
+        base_price = f.price,
+        capacity = f.seats_available
+            + (SELECT count(*) FROM bookings_booking b WHERE b.flight_id = f.id AND b.status = 'active')
+            + (SELECT coalesce(sum(h.seats), 0) FROM bookings_seathold h WHERE h.flight_id = f.id)
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flights', '0008_route_fare'),
+        ('bookings', '0005_booking_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='flight',
+            name='base_price',
+            field=models.PositiveIntegerField(blank=True, help_text='Fare the pricing engine scales by load factor and days to departure; empty until the first run, which starts from price.', null=True),
+        ),
+        migrations.AddField(
+            model_name='flight',
+            name='capacity',
+            field=models.PositiveIntegerField(blank=True, help_text='Total seats on the flight; empty means seats_available when it is first priced.', null=True),
+        ),
+        migrations.RunSQL(FILL_PRICING_COLUMNS, migrations.RunSQL.noop),
+    ]
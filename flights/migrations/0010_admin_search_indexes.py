@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:46
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flights', '0009_flight_pricing_columns'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='flight',
+            index=models.Index(fields=['airline_name'], name='flight_airline_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flight',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('airline_name'), name='gin_trgm_ops'), name='flight_airline_trgm'),
+        ),
+    ]
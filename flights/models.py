@@ -1,6 +1,14 @@
-from django.db import models
+import datetime
+
+from django.conf import settings
+from django.db import connection, models
+from django.db.models import Count, Min, Q
+from django.db.models.functions import TruncDate, Upper
 from django.utils import timezone
 
+from airline_booking.indexes import trigram_index
+from .search_cache import aget_or_compute, get_or_compute
+
 
 class Route(models.Model):
     """
@@ -11,6 +19,10 @@ class Route(models.Model):
 
     class Meta:
         unique_together = ('origin', 'destination')
+        indexes = [
+            trigram_index('origin', 'route_origin_trgm'),
+            trigram_index('destination', 'route_destination_trgm'),
+        ]
         verbose_name = "Route"
         verbose_name_plural = "Routes"
 
@@ -18,6 +30,55 @@ class Route(models.Model):
         return f"{self.origin} → {self.destination}"
 
 
+def departure_day_bounds(date):
+    """Start and end (exclusive) of `date` (a date or YYYY-MM-DD string) in the current time zone."""
+    if isinstance(date, str):
+        date = datetime.date.fromisoformat(date)
+    start = timezone.make_aware(datetime.datetime.combine(date, datetime.time.min))
+    return start, start + datetime.timedelta(days=1)
+
+
+def departure_day_filter(date):
+    """
+    Q object for flights departing on `date` (a date or YYYY-MM-DD string).
+
+    A half-open departure_time range in the current time zone; unlike
+    departure_time__date it does not cast the column, so indexes apply.
+    """
+    start, end = departure_day_bounds(date)
+    return Q(departure_time__gte=start, departure_time__lt=end)
+
+
+def fare_calendar_window(date='', days=None):
+    """
+    First and last day of a fare calendar centred on `date` (default today).
+
+    Returns:
+        tuple: (centre, first, last) as dates
+    """
+    if days is None:
+        days = settings.FARE_CALENDAR_DAYS
+    if isinstance(date, str):
+        date = datetime.date.fromisoformat(date) if date else timezone.localdate()
+    span = datetime.timedelta(days=days)
+    return date, date - span, date + span
+
+
+def _fill_fare_calendar(first, last, rows):
+    """One entry per day from first to last; days without flights have min_price None."""
+    by_day = {row['day']: row for row in rows}
+    calendar = []
+    for offset in range((last - first).days + 1):
+        day = first + datetime.timedelta(days=offset)
+        row = by_day.get(day)
+        calendar.append({
+            'date': day,
+            'min_price': row['min_price'] if row else None,
+            'flights': row['flights'] if row else 0,
+        })
+    return calendar
+
+
 class FlightManager(models.Manager):
     """
     Custom manager for Flight model.
@@ -25,7 +86,14 @@ class FlightManager(models.Manager):
     Provides convenient querysets for common flight operations:
     - available(): Filter flights with available seats and future departure times
     - past(): Filter flights that have already departed
+    - departing_on(date): Filter flights leaving on a calendar day
     - search(origin, destination, date): Search flights by route and date
+    - cached_search(origin, destination, date, fields): search() rows served
+      from the versioned search cache
+    - fare_calendar(origin, destination, date, days): Cheapest fare and
+      flight count per day around a date, from one cached GROUP BY
+    - airline_names(): Distinct airline names, read by skipping through
+      flight_airline_idx
     
     Why this manager exists:
     - Encapsulates flight availability logic
@@ -46,6 +114,10 @@ class FlightManager(models.Manager):
         """Return flights that have already departed."""
         return self.filter(departure_time__lt=timezone.now())
 
+    def departing_on(self, date):
+        """Return flights departing on the given day (in the current time zone)."""
+        return self.filter(departure_day_filter(date))
+
     def search(self, origin='', destination='', date=''):
         """
         Search flights by origin, destination, and/or date.
@@ -65,10 +137,96 @@ class FlightManager(models.Manager):
         if destination:
             qs = qs.filter(destination__icontains=destination)
         if date:
-            qs = qs.filter(departure_time__date=date)
+            qs = qs.filter(departure_day_filter(date))
         
         return qs
 
+    def cached_search(self, origin='', destination='', date='', fields=('id',)):
+        """
+        Run search() through the versioned search cache.
+
+        Returns:
+            list: One dict of `fields` per matching flight, in departure order
+        """
+        return get_or_compute(
+            origin, destination, date,
+            lambda: list(self.search(origin, destination, date).values(*fields)),
+            extra=('search',) + tuple(fields),
+        )
+
+    def _fare_calendar_query(self, origin, destination, first, last):
+        start, _ = departure_day_bounds(first)
+        _, end = departure_day_bounds(last)
+        return (
+            self.search(origin, destination)
+            .filter(departure_time__gte=start, departure_time__lt=end)
+            .annotate(day=TruncDate('departure_time'))
+            .values('day')
+            .annotate(min_price=Min('price'), flights=Count('id'))
+            .order_by('day')
+        )
+
+    def fare_calendar(self, origin, destination, date='', days=None):
+        """
+        Cheapest bookable fare and number of bookable flights per day.
+
+        Covers `date` ± `days` (FARE_CALENDAR_DAYS by default) in a single
+        GROUP BY over available(), cached like search results so a booking
+        on one of the routes refreshes it.
+
+        Args:
+            origin (str): Departure city (case-insensitive)
+            destination (str): Arrival city (case-insensitive)
+            date (str or date): Centre of the window, defaults to today
+            days (int): Days either side of `date`
+
+        Returns:
+            list: {'date', 'min_price', 'flights'} per day in the window,
+            min_price None on days without flights
+        """
+        centre, first, last = fare_calendar_window(date, days)
+        return get_or_compute(
+            origin, destination, centre,
+            lambda: _fill_fare_calendar(
+                first, last, self._fare_calendar_query(origin, destination, first, last)
+            ),
+            extra=('calendar', (last - centre).days),
+        )
+
+    async def afare_calendar(self, origin, destination, date='', days=None):
+        """Async version of fare_calendar()."""
+        centre, first, last = fare_calendar_window(date, days)
+
+        async def acompute():
+            query = self._fare_calendar_query(origin, destination, first, last)
+            return _fill_fare_calendar(first, last, [row async for row in query])
+
+        return await aget_or_compute(
+            origin, destination, centre, acompute, extra=('calendar', (last - centre).days),
+        )
+
+    def airline_names(self):
+        """
+        Return the distinct airline names, sorted.
+
+        SELECT DISTINCT would read every flight; this recursive query jumps
+        from one name to the next through flight_airline_idx instead, one
+        index probe per airline (a "loose index scan").
+        """
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                WITH RECURSIVE airlines(name) AS (
+                    (SELECT airline_name FROM {table} ORDER BY airline_name LIMIT 1)
+                    UNION ALL
+                    SELECT (SELECT airline_name FROM {table} WHERE airline_name > airlines.name
+                            ORDER BY airline_name LIMIT 1)
+                    FROM airlines WHERE airlines.name IS NOT NULL
+                )
+                SELECT name FROM airlines WHERE name IS NOT NULL
+            """)
+            return [name for (name,) in cursor.fetchall()]
+
 
 class Flight(models.Model):
     """
@@ -80,8 +238,20 @@ class Flight(models.Model):
     origin = models.CharField(max_length=100)
     destination = models.CharField(max_length=100)
     departure_time = models.DateTimeField()
+    duration_minutes = models.PositiveIntegerField(
+        default=90, db_default=90, help_text="Scheduled block time, departure to arrival."
+    )
     price = models.PositiveIntegerField()
+    base_price = models.PositiveIntegerField(
+        null=True, blank=True,
+        help_text="Fare the pricing engine scales by load factor and days to departure; "
+                  "empty until the first run, which starts from price.",
+    )
     seats_available = models.PositiveIntegerField()
+    capacity = models.PositiveIntegerField(
+        null=True, blank=True,
+        help_text="Total seats on the flight; empty means seats_available when it is first priced.",
+    )
     airplane_type = models.CharField(max_length=100)
     cancel_penalty_percent = models.PositiveIntegerField()
     airline_name = models.CharField(max_length=100)
@@ -91,6 +261,22 @@ class Flight(models.Model):
 
     class Meta:
         ordering = ["departure_time"]
+        indexes = [
+            # available() and the flight_list keyset order; now() cannot go in
+            # a partial index predicate, so the time bound stays a range scan.
+            models.Index(
+                fields=['departure_time', 'id'],
+                condition=Q(seats_available__gt=0),
+                name='flight_bookable_departure_idx',
+            ),
+            models.Index(fields=['departure_time', 'id'], name='flight_departure_idx'),
+            models.Index(fields=['route', 'departure_time'], name='flight_route_departure_idx'),
+            trigram_index('origin', 'flight_origin_trgm'),
+            trigram_index('destination', 'flight_destination_trgm'),
+            # Admin airline filter (airline_names()) and search.
+            models.Index(fields=['airline_name'], name='flight_airline_idx'),
+            trigram_index('airline_name', 'flight_airline_trgm'),
+        ]
         verbose_name = "Flight"
         verbose_name_plural = "Flights"
 
@@ -101,3 +287,138 @@ class Flight(models.Model):
     def is_available(self):
         """Check if flight has available seats."""
         return self.seats_available > 0
+
+    @property
+    def arrival_time(self):
+        """Scheduled arrival, departure_time plus the block time."""
+        return self.departure_time + datetime.timedelta(minutes=self.duration_minutes)
+
+
+class ScheduleTemplate(models.Model):
+    """
+    A repeating timetable, e.g. "daily at 08:15 Mon-Fri from March to October".
+
+    flights.schedules.expand_template() turns it into Flight rows; running
+    it again over an overlapping window only adds the departures missing.
+    """
+
+    # Bit per weekday in `weekdays`, Monday first (date.weekday() order).
+    WEEKDAY_CHOICES = [
+        (0, "Monday"),
+        (1, "Tuesday"),
+        (2, "Wednesday"),
+        (3, "Thursday"),
+        (4, "Friday"),
+        (5, "Saturday"),
+        (6, "Sunday"),
+    ]
+
+    route = models.ForeignKey(
+        Route, on_delete=models.CASCADE, related_name="schedule_templates"
+    )
+    airline_name = models.CharField(max_length=100)
+    weekdays = models.PositiveSmallIntegerField(
+        default=0b1111111, help_text="Bit mask of operating days, bit 0 = Monday."
+    )
+    departure_local_time = models.TimeField(help_text="Departure time in the site time zone.")
+    duration_minutes = models.PositiveIntegerField(default=90)
+    valid_from = models.DateField()
+    valid_until = models.DateField(help_text="Last day of operation (inclusive).")
+    airplane_type = models.CharField(max_length=100)
+    price = models.PositiveIntegerField()
+    seats = models.PositiveIntegerField()
+    cancel_penalty_percent = models.PositiveIntegerField(default=10)
+    is_active = models.BooleanField(default=True)
+
+    class Meta:
+        verbose_name = "Schedule template"
+        verbose_name_plural = "Schedule templates"
+
+    def __str__(self):
+        days = ''.join(name[:2] for bit, name in self.WEEKDAY_CHOICES if self.weekdays >> bit & 1)
+        return f"{self.route} {self.departure_local_time:%H:%M} {days} ({self.valid_from} – {self.valid_until})"
+
+    @classmethod
+    def weekday_mask(cls, days):
+        """Mask for an iterable of weekday numbers (0 = Monday)."""
+        return sum(1 << day for day in set(days))
+
+
+class RouteFareManager(models.Manager):
+    """
+    Custom manager for RouteFare model.
+
+    Provides read queries over the precomputed fares:
+    - bookable(): Routes with a bookable flight whose next departure has
+      not passed yet
+    - cheapest_from(origin): bookable() routes from a city, cheapest first
+    - matrix(): Lowest fare per origin × destination
+    """
+
+    def bookable(self):
+        """Return routes with a bookable flight, skipping rows whose next departure has passed."""
+        return self.filter(lowest_price__isnull=False, next_departure__gte=timezone.now())
+
+    def cheapest_from(self, origin):
+        """Return bookable routes leaving `origin` (case-insensitive), cheapest first."""
+        return self.bookable().filter(origin__iexact=origin).order_by('lowest_price', 'destination')
+
+    def matrix(self):
+        """
+        Lowest fare per origin and destination.
+
+        Returns:
+            tuple: (origins, destinations, rows) where origins and
+            destinations are sorted city names and rows is one
+            (origin, [fare or None per destination]) pair per origin
+        """
+        fares = {
+            (origin, destination): price
+            for origin, destination, price in self.bookable().values_list(
+                'origin', 'destination', 'lowest_price'
+            )
+        }
+        origins = sorted({origin for origin, _ in fares})
+        destinations = sorted({destination for _, destination in fares})
+        rows = [
+            (origin, [fares.get((origin, destination)) for destination in destinations])
+            for origin in origins
+        ]
+        return origins, destinations, rows
+
+
+class RouteFare(models.Model):
+    """
+    Read model: lowest bookable fare, next departure and seats per Route.
+
+    Maintained by flights.fares, which recomputes only the routes a seat,
+    price or schedule change touched; rebuild_route_fares recomputes
+    everything. Bookable means seats left and departure in the future, as
+    in FlightManager.available().
+    """
+    route = models.OneToOneField(
+        Route, on_delete=models.CASCADE, primary_key=True, related_name="fare"
+    )
+    origin = models.CharField(max_length=100)
+    destination = models.CharField(max_length=100)
+    lowest_price = models.PositiveIntegerField(null=True)
+    cheapest_flight = models.ForeignKey(
+        Flight, on_delete=models.SET_NULL, null=True, related_name="+"
+    )
+    next_departure = models.DateTimeField(null=True)
+    flights = models.PositiveIntegerField(default=0)
+    seats_available = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = RouteFareManager()
+
+    class Meta:
+        indexes = [
+            # cheapest_from(): origin__iexact compiles to UPPER(origin) = UPPER(%s).
+            models.Index(Upper('origin'), 'lowest_price', name='routefare_origin_price_idx'),
+        ]
+        verbose_name = "Route fare"
+        verbose_name_plural = "Route fares"
+
+    def __str__(self):
+        return f"{self.origin} → {self.destination}: {self.lowest_price}"
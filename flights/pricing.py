@@ -0,0 +1,207 @@
+"""
+Dynamic pricing: fares that follow load factor and days to departure.
+
+Every future flight's price is its base_price scaled by two piecewise
+linear curves from settings.PRICING_CURVES:
+
+- load_factor: multiplier by share of capacity sold (0.0 to 1.0)
+- days_to_departure: multiplier by days left before departure
+
+    price = round(base_price * load_factor_curve * days_curve)
+
+clamped to [PRICING_MIN_MULTIPLIER, PRICING_MAX_MULTIPLIER] × base_price
+and rounded to a multiple of PRICING_ROUND_TO.
+
+The columns needed are read with one binary COPY straight into NumPy
+arrays, the curves are evaluated for all flights at once with np.interp, and only the prices
+that change are written back, a batch at a time, with
+UPDATE ... FROM unnest(ids, prices). Search caches of the routes touched
+are invalidated after commit and their RouteFare rows refreshed by a
+background job.
+
+Flights without base_price/capacity yet (created before pricing ran) start
+from their current price and seats_available; a run that writes stores
+those so later runs price from the same base.
+"""
+import io
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .fares import refresh_after_commit
+from .models import Flight
+from .search_cache import invalidate_routes
+
+# Columns loaded per flight, in array order.
+LOAD_COLUMNS = ('id', 'route_id', 'base_price', 'capacity', 'seats_available', 'price', 'departure')
+
+
+@dataclass
+class PricingResult:
+    """Outcome of a pricing run; the arrays hold the changed flights only."""
+    flights: int = 0
+    ids: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int64))
+    old_prices: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int64))
+    new_prices: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int64))
+    load_factors: np.ndarray = field(default_factory=lambda: np.empty(0))
+    days_left: np.ndarray = field(default_factory=lambda: np.empty(0))
+    route_ids: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int64))
+    load_seconds: float = 0.0
+    price_seconds: float = 0.0
+    write_seconds: float = 0.0
+
+    @property
+    def changed(self):
+        return len(self.ids)
+
+    @property
+    def seconds(self):
+        return self.load_seconds + self.price_seconds + self.write_seconds
+
+
+def _curve(name):
+    points = sorted(settings.PRICING_CURVES[name])
+    return np.array([x for x, _ in points], dtype=float), np.array([y for _, y in points], dtype=float)
+
+
+# One row of binary COPY output: a field count, then a length and a
+# big-endian int8 per column (every column is cast to bigint, none is NULL).
+COPY_ROW = np.dtype(
+    [('fields', '>i2')]
+    + [field for name in LOAD_COLUMNS for field in ((f'{name}_length', '>i4'), (name, '>i8'))]
+)
+
+
+def _copy_out(sql):
+    """Run `COPY ... TO STDOUT` and return everything it wrote."""
+    buffer = io.BytesIO()
+    with connection.cursor() as cursor:
+        raw = cursor.cursor
+        if hasattr(raw, 'copy_expert'):  # psycopg2
+            raw.copy_expert(sql, buffer)
+        else:  # psycopg 3
+            with raw.copy(sql) as copy:
+                for block in copy:
+                    buffer.write(block)
+    return buffer.getbuffer()
+
+
+def load_flights(now):
+    """
+    Read the pricing columns of every future flight.
+
+    The rows come out of PostgreSQL as binary COPY, which is a fixed-size
+    record per row here, so NumPy maps them without parsing row by row.
+
+    Returns:
+        dict: One int64 array per LOAD_COLUMNS name ('departure' in epoch
+        seconds)
+    """
+    table = connection.ops.quote_name(Flight._meta.db_table)
+    data = _copy_out(
+        f'COPY (SELECT id::bigint, route_id::bigint, coalesce(base_price, price)::bigint, '
+        f'coalesce(capacity, seats_available)::bigint, seats_available::bigint, price::bigint, '
+        f'extract(epoch FROM departure_time)::bigint FROM {table} '
+        f'WHERE departure_time >= to_timestamp({now.timestamp():.6f})) TO STDOUT WITH (FORMAT binary)'
+    )
+    # 11-byte signature, flags, header extension length and extension;
+    # a 2-byte -1 trailer at the end.
+    start = 19 + int.from_bytes(data[15:19], 'big')
+    rows = np.frombuffer(data[start:len(data) - 2], dtype=COPY_ROW)
+    return {name: rows[name].astype(np.int64) for name in LOAD_COLUMNS}
+
+
+def compute_prices(base_price, capacity, seats_available, departure, now):
+    """
+    Evaluate the pricing curves for arrays of flights.
+
+    Args:
+        base_price, capacity, seats_available (ndarray): Per flight
+        departure (ndarray): Departure time in epoch seconds
+        now (datetime): Reference time for days to departure
+
+    Returns:
+        tuple: (prices, load_factors, days_left) arrays
+    """
+    sold = capacity - seats_available
+    load_factors = np.divide(
+        sold, capacity, out=np.ones(len(capacity)), where=capacity > 0,
+    ).clip(0.0, 1.0)
+    days_left = (departure - now.timestamp()) / 86400
+
+    multiplier = (
+        np.interp(load_factors, *_curve('load_factor'))
+        * np.interp(days_left, *_curve('days_to_departure'))
+    ).clip(settings.PRICING_MIN_MULTIPLIER, settings.PRICING_MAX_MULTIPLIER)
+    step = settings.PRICING_ROUND_TO
+    prices = np.maximum(np.rint(base_price * multiplier / step) * step, step).astype(np.int64)
+    return prices, load_factors, days_left
+
+
+def _write_prices(ids, prices, now, batch_size):
+    table = connection.ops.quote_name(Flight._meta.db_table)
+    with connection.cursor() as cursor:
+        # Pin the base fare and capacity the new prices were computed from.
+        cursor.execute(
+            f'UPDATE {table} SET base_price = coalesce(base_price, price), '
+            f'capacity = coalesce(capacity, seats_available) '
+            f'WHERE departure_time >= %s AND (base_price IS NULL OR capacity IS NULL)',
+            [now],
+        )
+        for start in range(0, len(ids), batch_size):
+            cursor.execute(
+                f'UPDATE {table} f SET price = v.price '
+                f'FROM unnest(%s::bigint[], %s::integer[]) AS v(id, price) WHERE f.id = v.id',
+                [ids[start:start + batch_size].tolist(), prices[start:start + batch_size].tolist()],
+            )
+
+
+def reprice_flights(dry_run=False, batch_size=50_000, now=None):
+    """
+    Recompute the price of every future flight from the pricing curves.
+
+    Args:
+        dry_run (bool): Compute and report the changes without writing
+        batch_size (int): Prices written per UPDATE
+        now (datetime): Reference time, defaults to timezone.now()
+
+    Returns:
+        PricingResult
+    """
+    now = now or timezone.now()
+    result = PricingResult()
+
+    started = time.perf_counter()
+    flights = load_flights(now)
+    result.flights = len(flights['id'])
+    result.load_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    prices, load_factors, days_left = compute_prices(
+        flights['base_price'], flights['capacity'], flights['seats_available'], flights['departure'], now,
+    )
+    changed = prices != flights['price']
+    result.ids = flights['id'][changed]
+    result.old_prices = flights['price'][changed]
+    result.new_prices = prices[changed]
+    result.load_factors = load_factors[changed]
+    result.days_left = days_left[changed]
+    result.route_ids = flights['route_id'][changed]
+    result.price_seconds = time.perf_counter() - started
+
+    if dry_run:
+        return result
+
+    started = time.perf_counter()
+    with transaction.atomic():
+        _write_prices(result.ids, result.new_prices, now, batch_size)
+        route_ids = np.unique(result.route_ids).tolist()
+        if route_ids:
+            transaction.on_commit(lambda: invalidate_routes(route_ids))
+            refresh_after_commit(route_ids)
+    result.write_seconds = time.perf_counter() - started
+    return result
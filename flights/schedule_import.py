@@ -0,0 +1,325 @@
+"""
+Bulk loading of flight schedules from CSV or JSON files.
+
+Rows are streamed from the file and written in batches, so memory use
+depends on the batch size rather than the file size:
+
+- Routes are resolved through an in-memory {(origin, destination): id} map;
+  pairs it has not seen are inserted with one bulk INSERT ... ON CONFLICT
+  DO NOTHING per batch and read back with one query.
+- Flights go through PostgreSQL COPY. Other backends fall back to
+  bulk_create() / bulk_update().
+- In upsert mode a flight matching an existing one on (route,
+  departure_time, airline_name) updates its price (and base price),
+  aircraft and penalty instead of being inserted again. seats_available
+  and capacity are left alone on existing flights, since they already
+  reflect their bookings.
+
+Input columns (CSV header or JSON object keys): origin, destination,
+departure_time (ISO 8601; naive times are in TIME_ZONE), price, seats,
+airplane_type, cancel_penalty_percent, airline_name.
+"""
+import csv
+import datetime
+import io
+import json
+import time
+from dataclasses import dataclass, field
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .autocomplete import city_index
+from .connections import route_graph
+from .fares import refresh_after_commit
+from .models import Flight, Route
+from .search_cache import invalidate_route_set, invalidate_routes
+
+FIELDS = (
+    'origin', 'destination', 'departure_time', 'price', 'seats',
+    'airplane_type', 'cancel_penalty_percent', 'airline_name',
+)
+# Flight columns in the order rows are copied.
+COLUMNS = (
+    'route_id', 'origin', 'destination', 'departure_time', 'price',
+    'seats_available', 'airplane_type', 'cancel_penalty_percent', 'airline_name',
+    'base_price', 'capacity',
+)
+# Columns an upsert refreshes on flights that already exist.
+UPDATE_COLUMNS = ('price', 'base_price', 'airplane_type', 'cancel_penalty_percent')
+
+
+class RowError(ValueError):
+    """A row that cannot be imported."""
+
+
+@dataclass
+class ImportResult:
+    rows: int = 0
+    created: int = 0
+    updated: int = 0
+    routes_created: int = 0
+    errors: list = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+def iter_csv(stream):
+    """Yield one dict per CSV record (the first line is the header)."""
+    yield from csv.DictReader(stream)
+
+
+def iter_json(stream, chunk_size=1 << 16):
+    """
+    Yield the objects of a JSON array or of JSON Lines, a chunk at a time.
+
+    Only one object (plus a read chunk) is held in memory; the array
+    brackets and separating commas are skipped between objects.
+    """
+    decoder = json.JSONDecoder()
+    buffer, position, eof = '', 0, False
+    while True:
+        while position < len(buffer) and buffer[position] in ' \t\r\n,[]':
+            position += 1
+        if position == len(buffer):
+            if eof:
+                return
+            buffer, position = stream.read(chunk_size), 0
+            eof = not buffer
+            continue
+        try:
+            value, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            more = stream.read(chunk_size)
+            eof = not more
+            buffer, position = buffer[position:] + more, 0
+            continue
+        yield value
+        position = end
+
+
+def parse_row(record):
+    """
+    Validate one input record.
+
+    Returns:
+        tuple: (origin, destination, departure_time, price, seats,
+        airplane_type, cancel_penalty_percent, airline_name)
+
+    Raises:
+        RowError: With a message naming the bad field
+    """
+    missing = [name for name in FIELDS if record.get(name) in (None, '')]
+    if missing:
+        raise RowError(f"missing {', '.join(missing)}")
+    try:
+        departure = datetime.datetime.fromisoformat(str(record['departure_time']).strip())
+    except ValueError:
+        raise RowError(f"bad departure_time {record['departure_time']!r}")
+    if timezone.is_naive(departure):
+        departure = timezone.make_aware(departure)
+    numbers = []
+    for name in ('price', 'seats', 'cancel_penalty_percent'):
+        try:
+            value = int(record[name])
+        except (TypeError, ValueError):
+            raise RowError(f'bad {name} {record[name]!r}')
+        if value < 0:
+            raise RowError(f'negative {name}')
+        numbers.append(value)
+    price, seats, penalty = numbers
+    if penalty > 100:
+        raise RowError('cancel_penalty_percent above 100')
+    return (
+        str(record['origin']).strip(), str(record['destination']).strip(), departure,
+        price, seats, str(record['airplane_type']).strip(), penalty,
+        str(record['airline_name']).strip(),
+    )
+
+
+class RouteMap:
+    """In-memory {(origin, destination): route id}, filled in bulk as new pairs appear."""
+
+    def __init__(self):
+        self._ids = {
+            (origin, destination): pk
+            for pk, origin, destination in Route.objects.values_list('id', 'origin', 'destination')
+        }
+        self.created = 0
+
+    def resolve(self, pairs):
+        """Make sure every (origin, destination) in `pairs` has a Route; return the map."""
+        missing = {pair for pair in pairs if pair not in self._ids}
+        if missing:
+            # ignore_conflicts: another importer may add the same routes meanwhile.
+            Route.objects.bulk_create(
+                [Route(origin=origin, destination=destination) for origin, destination in missing],
+                ignore_conflicts=True,
+            )
+            condition = Q()
+            for origin, destination in missing:
+                condition |= Q(origin=origin, destination=destination)
+            for pk, origin, destination in Route.objects.filter(condition).values_list('id', 'origin', 'destination'):
+                self._ids[(origin, destination)] = pk
+            self.created += len(missing)
+        return self._ids
+
+
+def _copy_rows(cursor, table, rows):
+    """COPY `rows` (tuples in COLUMNS order) into `table`."""
+    columns = ', '.join(connection.ops.quote_name(column) for column in COLUMNS)
+    sql = f'COPY {connection.ops.quote_name(table)} ({columns}) FROM STDIN WITH (FORMAT csv)'
+    raw = cursor.cursor
+    if hasattr(raw, 'copy_expert'):  # psycopg2
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([value.isoformat() if isinstance(value, datetime.datetime) else value for value in row])
+        buffer.seek(0)
+        raw.copy_expert(sql, buffer)
+    else:  # psycopg 3
+        with raw.copy(sql) as copy:
+            for row in rows:
+                copy.write_row(row)
+
+
+def _merge_staging(cursor, staging):
+    """Update flights matching staged rows, insert the rest; returns (created, updated)."""
+    table = connection.ops.quote_name(Flight._meta.db_table)
+    quote = connection.ops.quote_name
+    match = (
+        f'f.route_id = s.route_id AND f.departure_time = s.departure_time '
+        f'AND f.airline_name = s.airline_name'
+    )
+    assignments = ', '.join(f'{quote(column)} = s.{quote(column)}' for column in UPDATE_COLUMNS)
+    cursor.execute(f'UPDATE {table} f SET {assignments} FROM {staging} s WHERE {match}')
+    updated = cursor.rowcount
+    columns = ', '.join(quote(column) for column in COLUMNS)
+    # DISTINCT ON: a key repeated within the batch is inserted once.
+    cursor.execute(
+        f'INSERT INTO {table} ({columns}) '
+        f'SELECT DISTINCT ON (route_id, departure_time, airline_name) {columns} FROM {staging} s '
+        f'WHERE NOT EXISTS (SELECT 1 FROM {table} f WHERE {match})'
+    )
+    created = cursor.rowcount
+    cursor.execute(f'TRUNCATE {staging}')
+    return created, updated
+
+
+def _orm_write(rows, upsert):
+    """bulk_create/bulk_update fallback for databases without COPY."""
+    flights = [Flight(**dict(zip(COLUMNS, row))) for row in rows]
+    if not upsert:
+        Flight.objects.bulk_create(flights)
+        return len(flights), 0
+
+    # One range query for the batch; keys are matched in Python.
+    times = [flight.departure_time for flight in flights]
+    existing = {
+        (route_id, departure_time, airline): pk
+        for pk, route_id, departure_time, airline in Flight.objects.filter(
+            route_id__in={flight.route_id for flight in flights},
+            departure_time__range=(min(times), max(times)),
+        ).values_list('id', 'route_id', 'departure_time', 'airline_name')
+    }
+    new, changed, seen = [], [], set()
+    for flight in flights:
+        key = (flight.route_id, flight.departure_time, flight.airline_name)
+        pk = existing.get(key)
+        if pk is None:
+            if key not in seen:
+                seen.add(key)
+                new.append(flight)
+        else:
+            flight.pk = pk
+            changed.append(flight)
+    Flight.objects.bulk_create(new)
+    Flight.objects.bulk_update(changed, UPDATE_COLUMNS, batch_size=500)
+    return len(new), len(changed)
+
+
+def import_schedule(records, batch_size=10_000, upsert=False, use_copy=None, max_errors=100):
+    """
+    Load flights from an iterable of input records (dicts).
+
+    Args:
+        records: e.g. iter_csv(file) or iter_json(file)
+        batch_size (int): Rows written per COPY / bulk statement
+        upsert (bool): Update flights that already exist instead of
+            inserting duplicates
+        use_copy (bool): Force COPY on or off; defaults to on for PostgreSQL
+        max_errors (int): Abort (rolling everything back) after this many
+            bad rows
+
+    Returns:
+        ImportResult
+    """
+    if use_copy is None:
+        use_copy = connection.vendor == 'postgresql'
+    result = ImportResult()
+    started = time.perf_counter()
+    touched_routes = set()
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        routes = RouteMap()
+        staging = None
+        if use_copy and upsert:
+            staging = connection.ops.quote_name('flight_import_staging')
+            columns = ', '.join(connection.ops.quote_name(column) for column in COLUMNS)
+            cursor.execute(
+                f'CREATE TEMPORARY TABLE {staging} AS SELECT {columns} '
+                f'FROM {connection.ops.quote_name(Flight._meta.db_table)} WITH NO DATA'
+            )
+
+        def flush(batch):
+            route_ids = routes.resolve({(row[0], row[1]) for row in batch})
+            # The file's price and seats also seed base_price and capacity.
+            rows = [(route_ids[(row[0], row[1])],) + row + (row[3], row[4]) for row in batch]
+            touched_routes.update(row[0] for row in rows)
+            if not use_copy:
+                return _orm_write(rows, upsert)
+            if staging is None:
+                _copy_rows(cursor, Flight._meta.db_table, rows)
+                return len(rows), 0
+            _copy_rows(cursor, 'flight_import_staging', rows)
+            return _merge_staging(cursor, staging)
+
+        batch = []
+        for line, record in enumerate(records, start=1):
+            try:
+                batch.append(parse_row(record))
+            except RowError as exc:
+                result.errors.append((line, str(exc)))
+                if len(result.errors) > max_errors:
+                    raise RowError(f'More than {max_errors} bad rows, nothing imported')
+                continue
+            if len(batch) >= batch_size:
+                created, updated = flush(batch)
+                result.created += created
+                result.updated += updated
+                batch = []
+            result.rows += 1
+        if batch:
+            created, updated = flush(batch)
+            result.created += created
+            result.updated += updated
+        if staging is not None:
+            cursor.execute(f'DROP TABLE {staging}')
+        result.routes_created = routes.created
+
+        # Bulk writes send no signals; refresh caches the way signals would.
+        transaction.on_commit(lambda: invalidate_routes(touched_routes))
+        refresh_after_commit(touched_routes)
+        if routes.created:
+            transaction.on_commit(invalidate_route_set)
+            transaction.on_commit(city_index.rebuild)
+            transaction.on_commit(route_graph.invalidate)
+
+    result.seconds = time.perf_counter() - started
+    return result
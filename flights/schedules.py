@@ -0,0 +1,137 @@
+"""
+Expansion of ScheduleTemplate timetables into Flight rows (uses NumPy).
+
+The departures of a template are computed as arrays: one datetime64 per
+calendar day of the window, a weekday mask test over the whole array, then
+the local departure time and the UTC offset of each day added in one step.
+Departures that already exist (same route, airline and departure time) are
+fetched with a single values_list() query and removed with np.isin(), and
+the remainder is inserted with bulk_create() in batches. Flight instances
+are only built for the rows being inserted.
+
+Expansions of the same template are serialized with a row lock on the
+template, so two overlapping runs cannot both insert a departure.
+"""
+import datetime
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from .fares import refresh_after_commit
+from .models import Flight, ScheduleTemplate
+from .search_cache import invalidate_routes
+
+# 1970-01-01, day 0 of datetime64[D], was a Thursday (weekday 3).
+_EPOCH_WEEKDAY = 3
+
+
+def departure_times(template, start=None, end=None):
+    """
+    Return the template's departures between `start` and `end` (inclusive dates).
+
+    The window is clipped to the template's validity period.
+
+    Returns:
+        numpy.ndarray: datetime64[s] UTC departure times, ascending
+    """
+    start = max(start or template.valid_from, template.valid_from)
+    end = min(end or template.valid_until, template.valid_until)
+    if start > end:
+        return np.array([], dtype='datetime64[s]')
+
+    days = np.arange(np.datetime64(start, 'D'), np.datetime64(end, 'D') + 1)
+    weekdays = (days.astype('int64') + _EPOCH_WEEKDAY) % 7
+    days = days[(template.weekdays >> weekdays) & 1 == 1]
+
+    clock = template.departure_local_time
+    local = days.astype('datetime64[s]') + np.timedelta64(
+        clock.hour * 3600 + clock.minute * 60 + clock.second, 's'
+    )
+    # UTC offset per day; only differs across the year in zones with DST.
+    zone = timezone.get_current_timezone()
+    offsets = np.array(
+        [
+            zone.utcoffset(datetime.datetime.combine(day, clock)).total_seconds()
+            for day in days.astype(datetime.date)
+        ],
+        dtype='int64',
+    ).astype('timedelta64[s]')
+    return local - offsets
+
+
+def _as_datetime64(values):
+    return np.array(
+        [value.astimezone(datetime.timezone.utc).replace(tzinfo=None) for value in values],
+        dtype='datetime64[s]',
+    )
+
+
+def expand_template(template, start=None, end=None, batch_size=5000):
+    """
+    Create the Flight rows for a template's departures that do not exist yet.
+
+    Args:
+        template (ScheduleTemplate): Timetable to expand
+        start, end (date): Window to expand, defaults to the whole validity
+            period
+        batch_size (int): Rows per INSERT
+
+    Returns:
+        int: Number of flights created
+    """
+    with transaction.atomic():
+        template = ScheduleTemplate.objects.select_related('route').select_for_update(of=('self',)).get(
+            pk=template.pk
+        )
+        departures = departure_times(template, start, end)
+        if not len(departures):
+            return 0
+
+        window = [
+            timezone.make_aware(value, datetime.timezone.utc)
+            for value in departures[[0, -1]].astype(datetime.datetime)
+        ]
+        existing = Flight.objects.filter(
+            route=template.route,
+            airline_name=template.airline_name,
+            departure_time__range=window,
+        ).values_list('departure_time', flat=True)
+        departures = departures[~np.isin(departures, _as_datetime64(existing))]
+
+        route = template.route
+        flights = (
+            Flight(
+                route=route,
+                origin=route.origin,
+                destination=route.destination,
+                departure_time=timezone.make_aware(value, datetime.timezone.utc),
+                duration_minutes=template.duration_minutes,
+                price=template.price,
+                base_price=template.price,
+                seats_available=template.seats,
+                capacity=template.seats,
+                airplane_type=template.airplane_type,
+                cancel_penalty_percent=template.cancel_penalty_percent,
+                airline_name=template.airline_name,
+            )
+            for value in departures.astype(datetime.datetime)
+        )
+        created = len(Flight.objects.bulk_create(flights, batch_size=batch_size))
+        if created:
+            transaction.on_commit(lambda: invalidate_routes([route.id]))
+            refresh_after_commit([route.id])
+    return created
+
+
+def expand_all(start=None, end=None, batch_size=5000):
+    """
+    Expand every active template over the window.
+
+    Returns:
+        dict: {template id: flights created}
+    """
+    return {
+        template.pk: expand_template(template, start, end, batch_size)
+        for template in ScheduleTemplate.objects.filter(is_active=True).order_by('pk')
+    }
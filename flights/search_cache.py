@@ -0,0 +1,238 @@
+"""
+Versioned cache for flight search results.
+
+Entries are keyed by the normalized search (origin, destination, date plus
+any extra key such as the page cursor) and remember the version of every
+route the search can match. Seat changes and flight edits bump the version
+of their route only, so a booking on Tehran → Mashhad invalidates searches
+that can return that route and leaves every other cached search alone.
+
+Searches too broad to track route by route (an empty origin and
+destination, or more than SEARCH_CACHE_MAX_ROUTES matching routes) depend
+on a single global version that every change bumps.
+
+Uses Django's cache framework, so any backend works; counters for hits,
+misses and evictions (entries dropped because a version moved on) are kept
+in the cache as well and reported by stats(). aget_or_compute() is the same
+lookup for async views, built on the cache's and the ORM's async APIs.
+search_versions() and route_version() expose the versions themselves, for
+the HTTP ETags of the JSON API (flights.api).
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+PREFIX = 'flight_search'
+GLOBAL_VERSION_KEY = f'{PREFIX}:version:all'
+ROUTES_VERSION_KEY = f'{PREFIX}:version:routes'
+COUNTERS = ('hits', 'misses', 'evictions')
+
+
+def _route_version_key(route_id):
+    return f'{PREFIX}:version:route:{route_id}'
+
+
+def _fresh_version():
+    # Time-based rather than 1, so a version key that was evicted and
+    # recreated can never match a value stored in an old entry.
+    return time.time_ns()
+
+
+def _versions(keys):
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _fresh_version(), timeout=None)
+            versions[key] = cache.get(key)
+    return tuple(versions[key] for key in keys)
+
+
+async def _aversions(keys):
+    versions = await cache.aget_many(keys)
+    for key in keys:
+        if key not in versions:
+            await cache.aadd(key, _fresh_version(), timeout=None)
+            versions[key] = await cache.aget(key)
+    return tuple(versions[key] for key in keys)
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _fresh_version(), timeout=None)
+
+
+def _count(counter):
+    key = f'{PREFIX}:stats:{counter}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, timeout=None)
+
+
+async def _acount(counter):
+    key = f'{PREFIX}:stats:{counter}'
+    try:
+        await cache.aincr(key)
+    except ValueError:
+        await cache.aadd(key, 1, timeout=None)
+
+
+def normalize(origin='', destination='', date=''):
+    """Canonical form of a search: trimmed, case-folded cities and an ISO date."""
+    return (
+        (origin or '').strip().casefold(),
+        (destination or '').strip().casefold(),
+        date.isoformat() if hasattr(date, 'isoformat') else (date or ''),
+    )
+
+
+def _routes_key(routes_version, origin, destination):
+    return f'{PREFIX}:routes:{routes_version}:' + hashlib.sha1(
+        repr((origin, destination)).encode()
+    ).hexdigest()
+
+
+def _routes_query(origin, destination):
+    from .models import Route
+
+    routes = Route.objects.all()
+    if origin:
+        routes = routes.filter(origin__icontains=origin)
+    if destination:
+        routes = routes.filter(destination__icontains=destination)
+    return routes.values_list('id', flat=True)
+
+
+def _matching_routes(origin, destination):
+    """Ids of routes a search can return, cached until a Route changes."""
+    key = _routes_key(_versions([ROUTES_VERSION_KEY])[0], origin, destination)
+    route_ids = cache.get(key)
+    if route_ids is None:
+        route_ids = sorted(_routes_query(origin, destination))
+        cache.set(key, route_ids, timeout=None)
+    return route_ids
+
+
+async def _amatching_routes(origin, destination):
+    key = _routes_key((await _aversions([ROUTES_VERSION_KEY]))[0], origin, destination)
+    route_ids = await cache.aget(key)
+    if route_ids is None:
+        route_ids = sorted([route_id async for route_id in _routes_query(origin, destination)])
+        await cache.aset(key, route_ids, timeout=None)
+    return route_ids
+
+
+def _dependency_keys(route_ids):
+    if route_ids is None or len(route_ids) > settings.SEARCH_CACHE_MAX_ROUTES:
+        return [GLOBAL_VERSION_KEY]
+    return [_route_version_key(route_id) for route_id in route_ids]
+
+
+def _result_key(origin, destination, date, extra):
+    return f'{PREFIX}:result:' + hashlib.sha1(
+        repr((origin, destination, date, tuple(extra))).encode()
+    ).hexdigest()
+
+
+def get_or_compute(origin, destination, date, compute, extra=(), route_ids=None):
+    """
+    Return the cached result for a search, or compute and cache it.
+
+    Args:
+        origin, destination, date: Search criteria (normalized here)
+        compute: Callable producing the result on a miss (must return a
+            picklable value)
+        extra (tuple): Additional key parts, e.g. the page cursor
+        route_ids (list): Routes the result depends on, for results that
+            are not direct origin/destination matches (connections);
+            defaults to the routes the search matches
+
+    Returns:
+        Whatever compute() returns
+    """
+    origin, destination, date = normalize(origin, destination, date)
+    if route_ids is None and (origin or destination):
+        route_ids = _matching_routes(origin, destination)
+    versions = _versions(_dependency_keys(route_ids))
+    key = _result_key(origin, destination, date, extra)
+
+    entry = cache.get(key)
+    if entry is not None and entry[0] == versions:
+        _count('hits')
+        return entry[1]
+    _count('evictions' if entry is not None else 'misses')
+
+    result = compute()
+    cache.set(key, (versions, result), settings.SEARCH_CACHE_TIMEOUT)
+    return result
+
+
+async def aget_or_compute(origin, destination, date, acompute, extra=(), route_ids=None):
+    """Async version of get_or_compute(); `acompute` is a coroutine function."""
+    origin, destination, date = normalize(origin, destination, date)
+    if route_ids is None and (origin or destination):
+        route_ids = await _amatching_routes(origin, destination)
+    versions = await _aversions(_dependency_keys(route_ids))
+    key = _result_key(origin, destination, date, extra)
+
+    entry = await cache.aget(key)
+    if entry is not None and entry[0] == versions:
+        await _acount('hits')
+        return entry[1]
+    await _acount('evictions' if entry is not None else 'misses')
+
+    result = await acompute()
+    await cache.aset(key, (versions, result), settings.SEARCH_CACHE_TIMEOUT)
+    return result
+
+
+def search_versions(origin, destination, date):
+    """
+    Versions a search's results depend on, without computing them.
+
+    Equal tuples mean an unchanged result (up to departures dropping out
+    with time), so callers can build ETags from them.
+    """
+    origin, destination, date = normalize(origin, destination, date)
+    route_ids = _matching_routes(origin, destination) if origin or destination else None
+    return (origin, destination, date) + _versions(_dependency_keys(route_ids))
+
+
+async def asearch_versions(origin, destination, date):
+    """Async version of search_versions()."""
+    origin, destination, date = normalize(origin, destination, date)
+    route_ids = await _amatching_routes(origin, destination) if origin or destination else None
+    return (origin, destination, date) + await _aversions(_dependency_keys(route_ids))
+
+
+def route_version(route_id):
+    """Current version of one route, bumped by every change to its flights."""
+    return _versions([_route_version_key(route_id)])[0]
+
+
+async def aroute_version(route_id):
+    """Async version of route_version()."""
+    return (await _aversions([_route_version_key(route_id)]))[0]
+
+
+def invalidate_routes(route_ids):
+    """Bump the version of each route (and the global one) after a change."""
+    keys = [_route_version_key(route_id) for route_id in set(route_ids)]
+    for key in keys + [GLOBAL_VERSION_KEY]:
+        _bump(key)
+
+
+def invalidate_route_set():
+    """Forget which routes match which search, after routes are added or removed."""
+    _bump(ROUTES_VERSION_KEY)
+    _bump(GLOBAL_VERSION_KEY)
+
+
+def stats():
+    """Return the hit/miss/eviction counters."""
+    values = cache.get_many([f'{PREFIX}:stats:{counter}' for counter in COUNTERS])
+    return {counter: values.get(f'{PREFIX}:stats:{counter}', 0) for counter in COUNTERS}
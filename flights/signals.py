@@ -0,0 +1,24 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .autocomplete import city_index
+from .connections import route_graph
+from .fares import refresh_after_commit
+from .models import Flight, Route
+from .search_cache import invalidate_routes, invalidate_route_set
+
+
+@receiver([post_save, post_delete], sender=Route)
+def rebuild_city_index(sender, **kwargs):
+    """Refresh the autocomplete index and route graph once the route change is committed."""
+    transaction.on_commit(city_index.rebuild)
+    transaction.on_commit(route_graph.invalidate)
+    transaction.on_commit(invalidate_route_set)
+
+
+@receiver([post_save, post_delete], sender=Flight)
+def invalidate_flight_searches(sender, instance, **kwargs):
+    """Drop cached searches and refresh the route's fare once a flight edit is committed."""
+    transaction.on_commit(lambda: invalidate_routes([instance.route_id]))
+    refresh_after_commit([instance.route_id])
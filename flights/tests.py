@@ -1,3 +1,912 @@
-from django.test import TestCase
+import datetime
+import io
+import json
+import os
+import tempfile
+from datetime import timedelta
+
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.apps import apps
+from django.contrib.postgres.indexes import GinIndex
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.urls import resolve, reverse
+from django.utils import timezone
+
+from accounts.models import User
+from airline_booking.pagination import encode_cursor
+from airline_booking.testing import QueryPlanMixin
+from jobs.models import Job
+from jobs.queue import run_batch
+from .autocomplete import PrefixIndex, city_index
+from .connections import RouteGraph, find_connections, route_graph
+from .admin import ScheduleTemplateForm
+from .models import Flight, Route, RouteFare, ScheduleTemplate
+from .fares import rebuild_route_fares, refresh_after_commit, refresh_route_fares
+from .inventory import release_seats, take_seats
+from .pricing import compute_prices, reprice_flights
+from .schedule_import import import_schedule, iter_json
+from .schedules import departure_times, expand_template
+from . import search_cache
+from .views import aflight_list, flight_list
+
+
+def make_flight(route=None, seats=10, price=100, **kwargs):
+    if route is None:
+        route, _ = Route.objects.get_or_create(origin='Tehran', destination='Mashhad')
+    fields = dict(
+        route=route,
+        origin=route.origin,
+        destination=route.destination,
+        departure_time=timezone.now() + timedelta(days=7),
+        price=price,
+        seats_available=seats,
+        airplane_type='A320',
+        cancel_penalty_percent=10,
+        airline_name='Iran Air',
+    )
+    fields.update(kwargs)
+    return Flight.objects.create(**fields)
+
+
+@override_settings(ASYNC_VIEWS=False, SEARCH_CACHE_TIMEOUT=0)
+class FlightListPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='passenger')
+        start = timezone.now() + timedelta(days=1)
+        # Pairs of flights share a departure time so the id tiebreaker matters.
+        cls.flights = [
+            make_flight(departure_time=start + timedelta(hours=i // 2)) for i in range(60)
+        ]
+        make_flight(departure_time=timezone.now() - timedelta(days=1))
+        make_flight(seats=0)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def _get(self, **params):
+        return self.client.get(reverse('flights:list'), params)
+
+    def _ids(self, response):
+        return [flight['id'] for flight in response.context['flights']]
+
+    def test_walks_every_available_flight_once(self):
+        seen, cursor = [], None
+        while True:
+            response = self._get(**({'cursor': cursor} if cursor else {}))
+            seen += self._ids(response)
+            page = response.context['page']
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        self.assertEqual(seen, [flight.id for flight in self.flights])
+
+    def test_previous_cursor_returns_the_earlier_page(self):
+        first = self._get()
+        second = self._get(cursor=first.context['page'].next_cursor)
+        back = self._get(cursor=second.context['page'].previous_cursor)
+        self.assertEqual(self._ids(back), self._ids(first))
+        self.assertFalse(back.context['page'].has_previous)
+
+    def test_deep_pages_use_the_same_number_of_queries(self):
+        first = self._get()
+        with self.assertNumQueries(3):
+            self._get()
+        second = self._get(cursor=first.context['page'].next_cursor)
+        with self.assertNumQueries(3):
+            self._get(cursor=second.context['page'].next_cursor)
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        self.assertEqual(self._ids(self._get(cursor='not-a-cursor')), self._ids(self._get()))
+
+    def test_tampered_cursor_falls_back_to_first_page(self):
+        first = self._ids(self._get())
+        for values in (
+            ['garbage', 1], ['2026-01-01T00:00:00+00:00', 'abc'], [None, 1], [{}, []],
+            ['2026-01-01T00:00:00+00:00'], ['2026-01-01T00:00:00+00:00', 1, 2],
+        ):
+            for direction in ('n', 'p'):
+                response = self._get(cursor=encode_cursor(direction, values))
+                self.assertEqual(response.status_code, 200, values)
+                self.assertEqual(self._ids(response), first, values)
+        # Well-formed but out of the id range: nothing after it, no error.
+        response = self._get(cursor=encode_cursor('n', ['2026-01-01T00:00:00+00:00', 10 ** 30]))
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(ASYNC_VIEWS=True)
+class FlightListPaginationAsyncViewTests(FlightListPaginationTests):
+    """FlightListPaginationTests against the async views served under ASGI."""
+
+
+class CityAutocompleteTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Route.objects.create(origin='Tehran', destination='New York')
+        Route.objects.create(origin='Tabriz', destination='Newcastle')
+        Route.objects.create(origin='Tehran', destination='Mashhad')
+
+    def setUp(self):
+        city_index.rebuild()
+
+    def _suggest(self, field, q):
+        return self.client.get(reverse('flights:autocomplete'), {'field': field, 'q': q})
+
+    def test_prefix_index_matches_word_starts(self):
+        index = PrefixIndex(['New York', 'Newcastle', 'York'])
+        self.assertEqual(index.search('new'), ['New York', 'Newcastle'])
+        self.assertEqual(index.search('YORK'), ['New York', 'York'])
+        self.assertEqual(index.search(''), [])
+
+    def test_lookups_do_not_query_the_database(self):
+        with self.assertNumQueries(0):
+            response = self._suggest('origin', 'T')
+        self.assertEqual(response.json(), {'results': ['Tabriz', 'Tehran']})
+        self.assertEqual(self._suggest('destination', 'new').json()['results'], ['New York', 'Newcastle'])
+
+    def test_route_changes_rebuild_the_index(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Route.objects.create(origin='Shiraz', destination='Isfahan')
+        self.assertEqual(self._suggest('origin', 'sh').json()['results'], ['Shiraz'])
+
+    def test_unknown_field_is_rejected(self):
+        self.assertEqual(self._suggest('airline', 'x').status_code, 400)
+
+
+class FlightQueryPlanTests(QueryPlanMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        for i in range(200):
+            make_flight(departure_time=now + timedelta(hours=i - 50), seats=i % 5)
+
+    def test_available_uses_partial_index(self):
+        self.assertUsesIndex(Flight.objects.available(), 'flight_bookable_departure_idx')
+
+    def test_past_uses_departure_index(self):
+        self.assertUsesIndex(Flight.objects.past())
+
+    def test_search_by_date_is_a_range_scan(self):
+        qs = Flight.objects.search(date=timezone.localdate() + timedelta(days=1))
+        self.assertUsesIndex(qs, 'flight_bookable_departure_idx')
+        self.assertNotIn('::date', str(qs.query))
+
+    def test_list_page_uses_partial_index(self):
+        qs = Flight.objects.available().order_by('departure_time', 'id')[:26]
+        self.assertUsesIndex(qs, 'flight_bookable_departure_idx')
+
+
+class TrigramIndexTests(TestCase):
+
+    def test_every_trigram_index_renders_valid_ddl(self):
+        # The opclass must follow the parenthesized expression; inside it
+        # (as without django.contrib.postgres) PostgreSQL rejects the DDL.
+        indexes = [
+            (model, index)
+            for model in apps.get_models()
+            for index in model._meta.indexes
+            if isinstance(index, GinIndex) and index.name.endswith('_trgm')
+        ]
+        self.assertEqual(len(indexes), 9)
+        with connection.schema_editor(collect_sql=True) as editor:
+            for model, index in indexes:
+                sql = str(index.create_sql(model, editor))
+                self.assertRegex(sql, r'USING gin \(\(UPPER\("\w+"\)\) gin_trgm_ops\)$', index.name)
+
+
+class SearchCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='passenger')
+        cls.mashhad = make_flight(route=Route.objects.create(origin='Tehran', destination='Mashhad'))
+        cls.shiraz = make_flight(route=Route.objects.create(origin='Tehran', destination='Shiraz'))
+        cls.kish = make_flight(route=Route.objects.create(origin='Tabriz', destination='Kish'))
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def _seats(self, **params):
+        response = self.client.get(reverse('flights:list'), params)
+        return {flight['id']: flight['seats_available'] for flight in response.context['flights']}
+
+    def test_repeated_search_is_served_from_cache(self):
+        self._seats(origin='Tehran', destination='Mashhad')
+        # Session and user lookups only; the flight page comes from the cache.
+        with self.assertNumQueries(2):
+            self._seats(origin=' tehran ', destination='MASHHAD')
+        self.assertEqual(search_cache.stats(), {'hits': 1, 'misses': 1, 'evictions': 0})
+
+    def test_seat_change_invalidates_only_matching_searches(self):
+        self._seats(destination='Mashhad')
+        self._seats(origin='Tabriz')
+        with self.captureOnCommitCallbacks(execute=True):
+            take_seats(self.mashhad.id)
+
+        self.assertEqual(self._seats(destination='Mashhad'), {self.mashhad.id: 9})
+        with self.assertNumQueries(2):
+            self._seats(origin='Tabriz')
+        self.assertEqual(search_cache.stats(), {'hits': 1, 'misses': 2, 'evictions': 1})
+
+    def test_broad_search_follows_every_change(self):
+        self._seats()
+        with self.captureOnCommitCallbacks(execute=True):
+            take_seats(self.kish.id)
+        self.assertEqual(self._seats()[self.kish.id], 9)
+
+    def test_flight_edit_invalidates_its_route(self):
+        self._seats(origin='Tehran')
+        with self.captureOnCommitCallbacks(execute=True):
+            Flight.objects.filter(pk=self.shiraz.pk).update(seats_available=3)
+            Flight.objects.get(pk=self.shiraz.pk).save()
+        self.assertEqual(self._seats(origin='Tehran')[self.shiraz.id], 3)
+
+    def test_cached_search_returns_rows(self):
+        rows = Flight.objects.cached_search('tehran', '', '', fields=('id', 'destination'))
+        self.assertEqual({row['destination'] for row in rows}, {'Mashhad', 'Shiraz'})
+        with self.assertNumQueries(0):
+            self.assertEqual(Flight.objects.cached_search('Tehran', fields=('id', 'destination')), rows)
+
+
+class AsyncViewsSettingTests(TestCase):
+
+    def test_setting_picks_the_view_of_each_pair(self):
+        for enabled, view in ((True, aflight_list), (False, flight_list)):
+            with override_settings(ASYNC_VIEWS=enabled):
+                self.assertIs(resolve(reverse('flights:list')).func, view)
+
+
+@override_settings(ASYNC_VIEWS=True)
+class AsyncFlightViewTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='passenger')
+        cls.flight = make_flight()
+
+    def setUp(self):
+        cache.clear()
+
+    async def test_login_is_still_required(self):
+        for url in (reverse('flights:list'), reverse('flights:detail', args=[self.flight.id])):
+            response = await self.async_client.get(url)
+            self.assertEqual(response.status_code, 302)
+            self.assertIn(reverse('accounts:login'), response.url)
+
+    async def test_list_and_detail_render(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('flights:list'), {'origin': 'teh'})
+        self.assertEqual([f['id'] for f in response.context['flights']], [self.flight.id])
+        response = await self.async_client.get(reverse('flights:detail', args=[self.flight.id]))
+        self.assertContains(response, 'Tehran → Mashhad')
+        self.assertContains(response, 'passenger')
+
+
+@override_settings(ASYNC_VIEWS=False)
+class FlightApiTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.mashhad = make_flight()
+        cls.later = make_flight(departure_time=cls.mashhad.departure_time + timedelta(hours=2))
+        cls.shiraz = make_flight(route=Route.objects.create(origin='Tehran', destination='Shiraz'))
+
+    def setUp(self):
+        cache.clear()
+
+    async def _get(self, url, params=None, etag=None):
+        headers = {'If-None-Match': etag} if etag else {}
+        response = await self.async_client.get(url, params or {}, headers=headers)
+        if response.streaming and response.is_async:
+            response.data = json.loads(b''.join([chunk async for chunk in response.streaming_content]))
+        elif response.streaming:
+            # The sync view's stream reads the database as it goes.
+            response.data = json.loads(await sync_to_async(b''.join)(response.streaming_content))
+        elif response.status_code in (200, 400):
+            response.data = response.json()
+        return response
+
+    async def test_search_streams_results_in_departure_order(self):
+        with self.settings(API_STREAM_CHUNK_SIZE=1):
+            response = await self._get(reverse('flights:api_search'), {'origin': 'teh', 'destination': 'mash'})
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual([row['id'] for row in response.data['results']], [self.mashhad.id, self.later.id])
+        self.assertEqual(response.data['results'][0]['price'], 100)
+
+        response = await self._get(reverse('flights:api_search'), {'date': 'not-a-date'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('date', response.data['errors'])
+
+    def test_search_etag_follows_seat_changes(self):
+        url, params = reverse('flights:api_search'), {'destination': 'Mashhad'}
+        etag = self.client.get(url, params)['ETag']
+
+        def get():
+            return self.client.get(url, params, headers={'If-None-Match': etag})
+
+        response = get()
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            take_seats(self.shiraz.id)
+        self.assertEqual(get().status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            take_seats(self.mashhad.id)
+        response = get()
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_not_modified_needs_no_query(self):
+        url = reverse('flights:api_availability', args=[self.mashhad.id])
+        response = self.client.get(url)
+        self.assertEqual(response.json(), {
+            'id': self.mashhad.id, 'seats_available': 10, 'price': 100, 'is_available': True,
+        })
+        with self.assertNumQueries(0):
+            response = self.client.get(url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    async def test_detail(self):
+        url = reverse('flights:api_detail', args=[self.mashhad.id])
+        response = await self._get(url)
+        self.assertEqual(response.data['route_id'], self.mashhad.route_id)
+        arrival = self.mashhad.departure_time + timedelta(minutes=90)
+        self.assertEqual(response.data['arrival_time'], DjangoJSONEncoder().default(arrival))
+        self.assertEqual((await self._get(url, etag=response['ETag'])).status_code, 304)
+        self.assertEqual((await self._get(reverse('flights:api_detail', args=[0]))).status_code, 404)
+        self.assertEqual((await self.async_client.post(url)).status_code, 405)
+
+
+@override_settings(ASYNC_VIEWS=True)
+class FlightApiAsyncViewTests(FlightApiTests):
+    """FlightApiTests against the async views served under ASGI."""
+
+
+@override_settings(ASYNC_VIEWS=False)
+class FareCalendarTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='traveller')
+        route = Route.objects.create(origin='Tehran', destination='Shiraz')
+        cls.day = timezone.localdate() + timedelta(days=5)
+
+        def on(offset, price, **kwargs):
+            naive = datetime.datetime.combine(cls.day + timedelta(days=offset), datetime.time(10))
+            return make_flight(route=route, departure_time=timezone.make_aware(naive), price=price, **kwargs)
+
+        on(-1, 300)
+        on(-1, 250)
+        cls.centre = on(0, 200)
+        on(2, 180)
+        on(2, 50, seats=0)
+        on(4, 10)
+        make_flight(price=1, departure_time=cls.centre.departure_time)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_one_query_per_window(self):
+        with self.assertNumQueries(2):  # matching routes + the GROUP BY
+            calendar = Flight.objects.fare_calendar('tehran', 'shiraz', self.day)
+        self.assertEqual([day['date'] for day in calendar], [self.day + timedelta(days=i) for i in range(-3, 4)])
+        self.assertEqual(
+            [(day['min_price'], day['flights']) for day in calendar],
+            [(None, 0), (None, 0), (250, 2), (200, 1), (None, 0), (180, 1), (None, 0)],
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(Flight.objects.fare_calendar('Tehran', 'Shiraz', self.day.isoformat()), calendar)
+
+    def test_booking_refreshes_calendar(self):
+        Flight.objects.fare_calendar('Tehran', 'Shiraz', self.day, days=0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.centre.seats_available = 0
+            self.centre.save()
+        [day] = Flight.objects.fare_calendar('Tehran', 'Shiraz', self.day, days=0)
+        self.assertEqual((day['min_price'], day['flights']), (None, 0))
+
+    def test_json_endpoint(self):
+        url = reverse('flights:fare_calendar')
+        response = self.client.get(url, {'origin': 'Tehran', 'destination': 'Shiraz', 'date': self.day, 'days': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['days'], [
+            {'date': (self.day - timedelta(days=1)).isoformat(), 'min_price': 250, 'flights': 2},
+            {'date': self.day.isoformat(), 'min_price': 200, 'flights': 1},
+            {'date': (self.day + timedelta(days=1)).isoformat(), 'min_price': None, 'flights': 0},
+        ])
+        self.assertEqual(self.client.get(url, {'origin': 'Tehran'}).status_code, 400)
+        response = self.client.get(url, {'origin': 'Tehran', 'destination': 'Shiraz', 'days': 100})
+        self.assertEqual(response.status_code, 400)
+
+    def test_flexible_search_mode(self):
+        params = {'origin': 'Tehran', 'destination': 'Shiraz', 'date': self.day.isoformat()}
+        response = self.client.get(reverse('flights:list'), params)
+        self.assertIsNone(response.context['fare_calendar'])
+        self.assertNotContains(response, 'Lowest fares by day')
+
+        response = self.client.get(reverse('flights:list'), {**params, 'flexible': 'on'})
+        self.assertContains(response, 'Lowest fares by day')
+        self.assertEqual(len(response.context['fare_calendar']), 7)
+        self.assertEqual([f['id'] for f in response.context['flights']], [self.centre.id])
+
+
+@override_settings(ASYNC_VIEWS=True)
+class FareCalendarAsyncViewTests(FareCalendarTests):
+    """FareCalendarTests against the async views served under ASGI."""
+
+
+class RouteFareTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='traveller')
+        cls.route = Route.objects.create(origin='Tehran', destination='Shiraz')
+        cls.other = Route.objects.create(origin='Tehran', destination='Kish')
+        cls.empty = Route.objects.create(origin='Kish', destination='Shiraz')
+        now = timezone.now()
+        cls.cheapest = make_flight(route=cls.route, price=150, seats=2, departure_time=now + timedelta(days=3))
+        cls.next = make_flight(route=cls.route, price=300, seats=5, departure_time=now + timedelta(days=1))
+        make_flight(route=cls.route, price=10, seats=0)
+        make_flight(route=cls.route, price=10, departure_time=now - timedelta(hours=1))
+        make_flight(route=cls.other, price=90)
+        rebuild_route_fares()
+        Job.objects.all().delete()
+
+    def test_summary_per_route(self):
+        fare = RouteFare.objects.get(route=self.route)
+        self.assertEqual(fare.lowest_price, 150)
+        self.assertEqual(fare.cheapest_flight_id, self.cheapest.id)
+        self.assertEqual(fare.next_departure, self.next.departure_time)
+        self.assertEqual((fare.flights, fare.seats_available), (2, 7))
+        empty = RouteFare.objects.get(route=self.empty)
+        self.assertEqual((empty.lowest_price, empty.next_departure, empty.flights), (None, None, 0))
+
+    def test_seat_changes_refresh_only_their_route(self):
+        RouteFare.objects.filter(route=self.other).update(lowest_price=1)
+        take_seats(self.cheapest.id, 2)
+        self.assertEqual(RouteFare.objects.get(route=self.route).lowest_price, 150)
+        run_batch()
+        fare = RouteFare.objects.get(route=self.route)
+        self.assertEqual((fare.lowest_price, fare.flights, fare.seats_available), (300, 1, 5))
+        self.assertEqual(RouteFare.objects.get(route=self.other).lowest_price, 1)
+
+        release_seats(self.cheapest.id, 1)
+        run_batch()
+        self.assertEqual(RouteFare.objects.get(route=self.route).lowest_price, 150)
+
+    def test_price_edit_refreshes_route(self):
+        self.next.price = 120
+        self.next.save()
+        run_batch()
+        self.assertEqual(RouteFare.objects.get(route=self.route).cheapest_flight_id, self.next.id)
+
+    def test_queued_refreshes_are_merged(self):
+        take_seats(self.cheapest.id, 1)
+        take_seats(self.next.id, 1)
+        Flight.objects.filter(route=self.other).update(price=80)
+        refresh_after_commit([self.other.id])
+        self.assertEqual(Job.objects.filter(task='refresh_route_fares', status='queued').count(), 3)
+        with self.assertNumQueries(9):  # claim (4), one refresh (4), mark done (1)
+            run_batch()
+        self.assertEqual(Job.objects.filter(task='refresh_route_fares', status='done').count(), 3)
+        self.assertEqual(RouteFare.objects.get(route=self.route).seats_available, 5)
+        self.assertEqual(RouteFare.objects.get(route=self.other).lowest_price, 80)
+
+    def test_rolled_back_change_queues_nothing(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            take_seats(self.cheapest.id, 1)
+            raise RuntimeError
+        self.assertFalse(Job.objects.filter(task='refresh_route_fares').exists())
+
+    def test_refresh_query_count(self):
+        with self.assertNumQueries(4):  # savepoint, lock, upsert, release
+            self.assertEqual(refresh_route_fares([self.route.id, self.other.id, self.route.id]), 2)
+
+    def test_refresh_handles_bigint_route_ids(self):
+        route = Route.objects.create(id=2**31 + 7, origin='Kish', destination='Tehran')
+        make_flight(route=route, price=75)
+        self.assertEqual(refresh_route_fares([route.id]), 1)
+        self.assertEqual(RouteFare.objects.get(route=route).lowest_price, 75)
+
+    def test_rebuild_command(self):
+        RouteFare.objects.all().delete()
+        out = io.StringIO()
+        call_command('rebuild_route_fares', '--batch-size', '2', stdout=out)
+        self.assertIn('Recomputed 3 route fares', out.getvalue())
+        self.assertEqual(RouteFare.objects.count(), 3)
+
+        RouteFare.objects.filter(route=self.other).update(next_departure=timezone.now() - timedelta(days=1))
+        out = io.StringIO()
+        call_command('rebuild_route_fares', '--departed', stdout=out)
+        self.assertIn('Recomputed 1 route fares', out.getvalue())
+        self.assertGreater(RouteFare.objects.get(route=self.other).next_departure, timezone.now())
+
+    def test_cheapest_from_and_matrix_pages(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('flights:cheapest'), {'origin': 'tehran'})
+        self.assertEqual([fare.destination for fare in response.context['fares']], ['Kish', 'Shiraz'])
+        self.assertContains(response, '150 $')
+
+        response = self.client.get(reverse('flights:fare_matrix'))
+        self.assertEqual(response.context['destinations'], ['Kish', 'Shiraz'])
+        self.assertEqual(response.context['rows'], [('Tehran', [90, 150])])
+
+
+@override_settings(
+    PRICING_CURVES={'load_factor': [(0.0, 1.0), (1.0, 2.0)], 'days_to_departure': [(0, 1.5), (10, 1.0)]},
+    PRICING_MIN_MULTIPLIER=0.5, PRICING_MAX_MULTIPLIER=3.0, PRICING_ROUND_TO=1,
+)
+class DynamicPricingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.now = timezone.now()
+        far = cls.now + timedelta(days=20)
+        cls.half_full = make_flight(price=100, base_price=100, capacity=100, seats=50, departure_time=far)
+        cls.unchanged = make_flight(price=100, base_price=100, capacity=100, seats=100, departure_time=far)
+        cls.legacy = make_flight(price=200, seats=10, departure_time=far)
+        cls.departed = make_flight(price=100, base_price=100, capacity=100, seats=0,
+                                   departure_time=cls.now - timedelta(hours=1))
+        rebuild_route_fares()
+
+    def test_curves_are_interpolated_and_clamped(self):
+        now = timezone.now()
+        days = np.array([20, 5, 0, 20]) * 86400 + now.timestamp()
+        prices, load_factors, days_left = compute_prices(
+            np.array([100, 100, 100, 7]), np.array([100, 100, 100, 0]), np.array([50, 100, 0, 0]), days, now,
+        )
+        self.assertEqual(prices.tolist(), [150, 125, 300, 14])
+        self.assertEqual(load_factors.tolist(), [0.5, 0.0, 1.0, 1.0])
+        self.assertEqual(np.round(days_left).tolist(), [20, 5, 0, 20])
+
+    def test_dry_run_writes_nothing(self):
+        result = reprice_flights(dry_run=True, now=self.now)
+        self.assertEqual(result.flights, 3)
+        self.assertEqual(result.ids.tolist(), [self.half_full.id])
+        self.assertEqual((result.old_prices.tolist(), result.new_prices.tolist()), ([100], [150]))
+        self.assertEqual(Flight.objects.get(pk=self.half_full.pk).price, 100)
+
+    def test_only_changed_prices_are_written(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            result = reprice_flights(now=self.now)
+        run_batch()
+        self.assertEqual(result.changed, 1)
+        prices = dict(Flight.objects.values_list('id', 'price'))
+        self.assertEqual(prices[self.half_full.id], 150)
+        self.assertEqual(prices[self.unchanged.id], 100)
+        self.assertEqual(prices[self.departed.id], 100)
+        self.assertEqual(RouteFare.objects.get(route=self.half_full.route).lowest_price, 100)
+
+        legacy = Flight.objects.get(pk=self.legacy.pk)
+        self.assertEqual((legacy.base_price, legacy.capacity), (200, 10))
+        # Seats sold after the first run now raise the price of the legacy flight.
+        take_seats(legacy.id, 5)
+        result = reprice_flights(now=self.now)
+        self.assertEqual(result.ids.tolist(), [legacy.id])
+        self.assertEqual(result.new_prices.tolist(), [300])
+        self.assertEqual(reprice_flights(now=self.now).changed, 0)
+
+    def test_command_dry_run_diff(self):
+        out = io.StringIO()
+        call_command('reprice_flights', '--dry-run', stdout=out)
+        output = out.getvalue()
+        self.assertIn('Tehran → Mashhad', output)
+        self.assertIn('+50.0%', output)
+        self.assertIn('Would change 1 of 3 future flight prices', output)
+        self.assertEqual(Flight.objects.get(pk=self.half_full.pk).price, 100)
+
+
+class ConnectionSearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='traveller')
+        routes = {
+            (origin, destination): Route.objects.create(origin=origin, destination=destination)
+            for origin, destination in [
+                ('Tehran', 'Isfahan'), ('Isfahan', 'Kish'),
+                ('Tehran', 'Tabriz'), ('Tabriz', 'Rasht'), ('Rasht', 'Ahvaz'),
+            ]
+        }
+        cls.day = (timezone.localtime() + timedelta(days=3)).date()
+
+        def at(hour, minute=0, days=0):
+            naive = datetime.datetime.combine(cls.day + timedelta(days=days), datetime.time(hour, minute))
+            return timezone.make_aware(naive)
+
+        def flight(origin, destination, when, **kwargs):
+            return make_flight(route=routes[origin, destination], departure_time=when, **kwargs)
+
+        # Lands in Isfahan 09:30; the 09:50 is too tight, the 16:00 too late.
+        cls.first_leg = flight('Tehran', 'Isfahan', at(8), duration_minutes=90, price=120)
+        flight('Isfahan', 'Kish', at(9, 50))
+        cls.second_leg = flight('Isfahan', 'Kish', at(11), duration_minutes=60, price=80)
+        cls.sold_out = flight('Isfahan', 'Kish', at(12), seats=0)
+        flight('Isfahan', 'Kish', at(16))
+
+        cls.two_stop_legs = [
+            flight('Tehran', 'Tabriz', at(22), duration_minutes=120),
+            flight('Tabriz', 'Rasht', at(3, days=1), duration_minutes=60),
+            flight('Rasht', 'Ahvaz', at(5, days=1), duration_minutes=100),
+        ]
+
+    def setUp(self):
+        cache.clear()
+        route_graph.invalidate()
+        self.client.force_login(self.user)
+
+    def test_graph_paths(self):
+        graph = RouteGraph([
+            (1, 'A', 'B'), (2, 'B', 'C'), (3, 'A', 'C'), (4, 'C', 'D'), (5, 'B', 'A'), (6, 'C', 'B'),
+        ])
+        self.assertEqual(graph.cities('b'), {'B'})
+        self.assertEqual(sorted(graph.paths({'A'}, {'C'})), [(1, 2)])
+        self.assertEqual(sorted(graph.paths({'A'}, {'D'})), [(1, 2, 4), (3, 4)])
+        self.assertEqual(graph.paths({'A'}, {'D'}, max_stops=1), [(3, 4)])
+
+    def test_one_stop_within_layover_limits(self):
+        itineraries = find_connections('tehran', 'kish', self.day)
+        self.assertEqual(len(itineraries), 1)
+        itinerary = itineraries[0]
+        self.assertEqual([leg['id'] for leg in itinerary.legs], [self.first_leg.id, self.second_leg.id])
+        self.assertEqual(itinerary.price, 200)
+        self.assertEqual(itinerary.duration, timedelta(hours=4))
+        self.assertEqual(itinerary.layovers, [timedelta(minutes=90)])
+        self.assertEqual(itinerary.duration_label, '4h 00m')
+
+    def test_two_stops_across_midnight(self):
+        [itinerary] = find_connections('Tehran', 'Ahvaz', self.day)
+        self.assertEqual([leg['id'] for leg in itinerary.legs], [leg.id for leg in self.two_stop_legs])
+        self.assertEqual(itinerary.stops, 2)
+        self.assertEqual(itinerary.arrival_time, self.two_stop_legs[-1].arrival_time)
+
+    @override_settings(CONNECTION_MAX_STOPS=1)
+    def test_max_stops(self):
+        self.assertEqual(find_connections('Tehran', 'Ahvaz', self.day), [])
+
+    def test_single_flight_query(self):
+        route_graph.get()
+        with self.assertNumQueries(1):
+            find_connections('Tehran', 'Kish', self.day)
+        with self.assertNumQueries(0):
+            find_connections('Tehran', 'Kish', self.day)
+
+    def test_booking_a_leg_drops_cached_results(self):
+        self.assertEqual(len(find_connections('Tehran', 'Kish', self.day)), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            Flight.objects.filter(pk=self.second_leg.pk).update(seats_available=0)
+            search_cache.invalidate_routes([self.second_leg.route_id])
+        self.assertEqual(find_connections('Tehran', 'Kish', self.day), [])
+
+    def test_new_route_rebuilds_graph(self):
+        self.assertEqual(find_connections('Tehran', 'Shiraz', self.day), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            route = Route.objects.create(origin='Kish', destination='Shiraz')
+        make_flight(route=route, departure_time=self.second_leg.arrival_time + timedelta(hours=1))
+        [itinerary] = find_connections('Tehran', 'Shiraz', self.day)
+        self.assertEqual(itinerary.stops, 2)
+
+    def test_list_shows_connections_without_direct_flights(self):
+        response = self.client.get(
+            reverse('flights:list'),
+            {'origin': 'Tehran', 'destination': 'Kish', 'date': self.day.isoformat()},
+        )
+        self.assertContains(response, 'Connecting Flights')
+        self.assertContains(response, '200 $')
+        self.assertEqual(len(response.context['connections']), 1)
+
+        response = self.client.get(reverse('flights:list'), {'origin': 'Tehran', 'destination': 'Isfahan'})
+        self.assertNotContains(response, 'Connecting Flights')
+
+
+class ScheduleImportTests(TestCase):
+
+    HEADER = 'origin,destination,departure_time,price,seats,airplane_type,cancel_penalty_percent,airline_name\n'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.existing = Route.objects.create(origin='Tehran', destination='Mashhad')
+
+    def _records(self, count, price=100, start='2031-03-01T08:15:00+00:00'):
+        first = timezone.datetime.fromisoformat(start)
+        cities = ['Tehran', 'Mashhad', 'Shiraz', 'Kish']
+        return [
+            {
+                'origin': cities[i % 4], 'destination': cities[(i + 1) % 4],
+                'departure_time': (first + timedelta(hours=i)).isoformat(),
+                'price': price, 'seats': 150, 'airplane_type': 'A320',
+                'cancel_penalty_percent': 10, 'airline_name': 'Iran Air',
+            }
+            for i in range(count)
+        ]
+
+    def _write(self, text, suffix):
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(fd, 'w') as handle:
+            handle.write(text)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def _csv(self, records):
+        lines = [','.join(str(record.get(key, '')) for key in self.HEADER.strip().split(',')) for record in records]
+        return self._write(self.HEADER + '\n'.join(lines) + '\n', '.csv')
+
+    def _import(self, path, *args):
+        out = io.StringIO()
+        call_command('import_schedule', path, *args, stdout=out, stderr=io.StringIO())
+        return out.getvalue()
+
+    def test_csv_import_creates_flights_and_routes_in_bulk(self):
+        path = self._csv(self._records(400))
+        # Route lookups only: one load of the map, one bulk upsert and one
+        # read-back, plus the queued fare refresh. The four COPY batches go
+        # through the raw cursor, which Django's query log does not see.
+        with self.assertNumQueries(6):
+            output = self._import(path, '--batch-size', '100')
+        self.assertIn('Imported 400 rows', output)
+        self.assertIn('rows/s', output)
+        self.assertEqual(Flight.objects.count(), 400)
+        self.assertEqual(Route.objects.count(), 4)
+        flight = Flight.objects.filter(route=self.existing).first()
+        self.assertEqual((flight.origin, flight.destination, flight.seats_available), ('Tehran', 'Mashhad', 150))
+
+    def test_json_array_and_json_lines_stream(self):
+        records = self._records(30)
+        array = json.dumps(records, indent=2)
+        lines = '\n'.join(json.dumps(record) for record in records)
+        for text in (array, lines):
+            self.assertEqual(list(iter_json(io.StringIO(text), chunk_size=7)), records)
+        self._import(self._write(array, '.json'))
+        self.assertEqual(Flight.objects.count(), 30)
+
+    def test_upsert_updates_instead_of_duplicating(self):
+        for copy in ([], ['--no-copy']):
+            with self.subTest(copy=copy):
+                Flight.objects.all().delete()
+                self._import(self._csv(self._records(50)), *copy)
+                take_seats(Flight.objects.first().id, 5)
+                output = self._import(self._csv(self._records(60, price=120)), '--upsert', *copy)
+                self.assertIn('10 flights created, 50 updated', output)
+                self.assertEqual(Flight.objects.count(), 60)
+                self.assertFalse(Flight.objects.exclude(price=120).exists())
+                self.assertEqual(Flight.objects.filter(seats_available=145).count(), 1)
+
+    def test_fallback_without_copy(self):
+        result = import_schedule(self._records(25), batch_size=10, use_copy=False)
+        self.assertEqual((result.rows, result.created), (25, 25))
+        self.assertEqual(Flight.objects.count(), 25)
+
+    def test_bad_rows_are_reported_and_skipped(self):
+        records = self._records(5)
+        records[1]['price'] = 'free'
+        records[3]['departure_time'] = 'tomorrow'
+        del records[4]['airline_name']
+        result = import_schedule(records)
+        self.assertEqual(result.rows, 2)
+        self.assertEqual([line for line, _ in result.errors], [2, 4, 5])
+        with self.assertRaises(CommandError):
+            self._import(self._csv(records), '--max-errors', '1')
+        self.assertEqual(Flight.objects.count(), 2)
+
+
+class ScheduleTemplateTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.route = Route.objects.create(origin='Tehran', destination='Kish')
+        cls.template = ScheduleTemplate.objects.create(
+            route=cls.route, airline_name='Iran Air',
+            weekdays=ScheduleTemplate.weekday_mask(range(5)),
+            departure_local_time=datetime.time(8, 15),
+            valid_from=datetime.date(2031, 3, 3), valid_until=datetime.date(2031, 10, 31),
+            airplane_type='A320', price=150, seats=180,
+        )
+
+    def _departures(self, **filters):
+        return list(
+            Flight.objects.filter(route=self.route, **filters)
+            .order_by('departure_time').values_list('departure_time', flat=True)
+        )
+
+    def test_departures_follow_weekday_mask_and_time(self):
+        times = departure_times(self.template, end=datetime.date(2031, 3, 16)).astype(datetime.datetime)
+        self.assertEqual(len(times), 10)
+        self.assertEqual({value.weekday() for value in times}, {0, 1, 2, 3, 4})
+        self.assertEqual({(value.hour, value.minute) for value in times}, {(8, 15)})
+
+    @override_settings(TIME_ZONE='Europe/London')
+    def test_local_time_is_kept_across_daylight_saving(self):
+        times = departure_times(
+            self.template, datetime.date(2031, 3, 28), datetime.date(2031, 3, 31)
+        ).astype(datetime.datetime)
+        # Friday 28 March in GMT, Monday 31 March in BST.
+        self.assertEqual([value.hour for value in times], [8, 7])
+
+    def test_overlapping_runs_create_no_duplicates(self):
+        self.assertEqual(expand_template(self.template, end=datetime.date(2031, 3, 31)), 21)
+        make_flight(
+            route=self.route, airline_name='Iran Air',
+            departure_time=timezone.make_aware(datetime.datetime(2031, 4, 1, 8, 15)),
+        )
+        # Lock, existing lookup, one INSERT and the queued fare refresh,
+        # however many flights exist.
+        with self.assertNumQueries(6):
+            created = expand_template(self.template, datetime.date(2031, 3, 20), datetime.date(2031, 4, 30))
+        self.assertEqual(created, 21)
+        self.assertEqual(expand_template(self.template), 175 - 43)
+        departures = self._departures()
+        self.assertEqual(len(departures), 175)
+        self.assertEqual(len(set(departures)), 175)
+        self.assertEqual(expand_template(self.template), 0)
+
+    def test_admin_form_edits_weekday_mask(self):
+        form = ScheduleTemplateForm(instance=self.template)
+        self.assertEqual(form.initial['operating_days'], [0, 1, 2, 3, 4])
+        data = {
+            'route': self.route.pk, 'airline_name': 'Iran Air', 'operating_days': ['5', '6'],
+            'departure_local_time': '21:40', 'valid_from': '2031-06-01', 'valid_until': '2031-06-30',
+            'duration_minutes': 75, 'airplane_type': 'A321', 'price': 90, 'seats': 200, 'cancel_penalty_percent': 20,
+            'is_active': 'on',
+        }
+        form = ScheduleTemplateForm(data)
+        self.assertTrue(form.is_valid(), form.errors)
+        template = form.save()
+        self.assertEqual(template.weekdays, 0b1100000)
+        self.assertFalse(ScheduleTemplateForm({**data, 'valid_until': '2031-05-01'}).is_valid())
+
+
+@override_settings(ADMIN_EXACT_COUNT_LIMIT=-1)
+class FlightAdminTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username='ops', password='x')
+        cls.flight = make_flight(airline_name='Mahan Air')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def _changelist(self, queries, **params):
+        # Session, user, airline filter choices, EXPLAIN (no COUNT), page.
+        with self.assertNumQueries(queries):
+            return self.client.get(reverse('admin:flights_flight_changelist'), params)
+
+    def test_changelist_queries_do_not_grow_with_routes(self):
+        self._changelist(5)
+        for i in range(20):
+            make_flight(
+                route=Route.objects.create(origin=f'City {i}', destination='Kish'),
+                airline_name=f'Airline {i % 4}',
+            )
+        response = self._changelist(5)
+        self.assertEqual(response.context['cl'].result_count, response.context['cl'].paginator.count)
+        # Routes are picked from the list, not a sidebar of every Route.
+        self.assertNotContains(response, 'data-filter-title="route"')
+        self.assertContains(response, f'href="?route={self.flight.route_id}"')
+
+    def test_route_filter_loads_only_the_chosen_route(self):
+        other = make_flight(route=Route.objects.create(origin='Tabriz', destination='Kish'))
+        response = self._changelist(6, route=other.route_id)
+        self.assertEqual([flight.pk for flight in response.context['cl'].result_list], [other.pk])
+        self.assertContains(response, 'data-filter-title="route"')
+
+    def test_airline_names_skip_through_the_index(self):
+        make_flight(airline_name='Iran Air')
+        make_flight(airline_name='Iran Air')
+        self.assertEqual(Flight.objects.airline_names(), ['Iran Air', 'Mahan Air'])
+        response = self._changelist(5, airline_name='Iran Air')
+        self.assertEqual(len(response.context['cl'].result_list), 2)
 
-# Create your tests here.
@@ -1,9 +1,34 @@
+from django.conf import settings
 from django.urls import path
-from .views import flight_list, flight_detail
+from . import api
+from .views import (
+    flight_list, aflight_list, flight_detail, aflight_detail, fare_calendar, afare_calendar,
+    cheapest_from, fare_matrix, city_autocomplete, search_cache_status,
+)
 
 app_name = "flights"
 
 urlpatterns = [
-    path("", flight_list, name="list"),
-    path("<int:pk>/", flight_detail, name="detail"),
+    path("", aflight_list if settings.ASYNC_VIEWS else flight_list, name="list"),
+    path("<int:pk>/", aflight_detail if settings.ASYNC_VIEWS else flight_detail, name="detail"),
+    path("fare-calendar/", afare_calendar if settings.ASYNC_VIEWS else fare_calendar, name="fare_calendar"),
+    path("cheapest/", cheapest_from, name="cheapest"),
+    path("fare-matrix/", fare_matrix, name="fare_matrix"),
+    path(
+        "api/flights/",
+        api.aflight_search if settings.ASYNC_VIEWS else api.flight_search,
+        name="api_search",
+    ),
+    path(
+        "api/flights/<int:pk>/",
+        api.aflight_detail if settings.ASYNC_VIEWS else api.flight_detail,
+        name="api_detail",
+    ),
+    path(
+        "api/flights/<int:pk>/availability/",
+        api.aflight_availability if settings.ASYNC_VIEWS else api.flight_availability,
+        name="api_availability",
+    ),
+    path("autocomplete/", city_autocomplete, name="autocomplete"),
+    path("search-cache/", search_cache_status, name="search_cache_status"),
 ]
\ No newline at end of file
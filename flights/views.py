@@ -1,11 +1,62 @@
 import logging
-from django.shortcuts import render, get_object_or_404
+from django.conf import settings
+from django.http import JsonResponse
+from django.shortcuts import render, get_object_or_404, aget_object_or_404
 from django.contrib.auth.decorators import login_required
-from .models import Flight
-from .forms import SearchForm
+from django.contrib.admin.views.decorators import staff_member_required
+from django.views.decorators.http import require_GET
+from airline_booking.pagination import paginate, apaginate
+from airline_booking.shortcuts import arender
+from logs.audit import audit
+from .autocomplete import city_index, AUTOCOMPLETE_FIELDS
+from .connections import find_connections, afind_connections
+from .search_cache import get_or_compute, aget_or_compute, stats as search_cache_stats
+from .models import Flight, RouteFare
+from .forms import SearchForm, FareCalendarForm
 
 logger = logging.getLogger(__name__)
 
+FLIGHTS_PER_PAGE = 25
+
+# Columns rendered by flights/list.html; the list never builds Flight instances.
+LIST_COLUMNS = (
+    'id', 'origin', 'destination', 'departure_time', 'price', 'seats_available', 'airline_name',
+)
+
+
+# SearchForm fields passed on to FlightManager.search().
+SEARCH_FIELDS = ('origin', 'destination', 'date')
+
+
+def _search_params(form):
+    """Non-empty search criteria from a submitted SearchForm."""
+    if not form.is_valid():
+        return {}
+    return {key: form.cleaned_data[key] for key in SEARCH_FIELDS if form.cleaned_data[key]}
+
+
+def _wants_fare_calendar(form, search_params):
+    """Flexible-dates mode needs both cities of the route."""
+    return (
+        form.is_valid() and form.cleaned_data['flexible']
+        and 'origin' in search_params and 'destination' in search_params
+    )
+
+
+def _fare_calendar_json(calendar):
+    return [
+        {'date': day['date'].isoformat(), 'min_price': day['min_price'], 'flights': day['flights']}
+        for day in calendar
+    ]
+
+
+def _search_details(search_params):
+    return ', '.join(f'{key}={value}' for key, value in search_params.items())
+
+
+def _flight_page_query(search_params):
+    return Flight.objects.search(**search_params).values(*LIST_COLUMNS)
+
 
 @login_required
 def flight_list(request):
@@ -16,33 +67,99 @@ def flight_list(request):
     - origin: Departure city
     - destination: Arrival city
     - date: Flight date
+
+    Only bookable flights are listed, a page at a time, ordered by
+    (departure_time, id). The `cursor` query parameter carries the opaque
+    position token for the next/previous page. Pages come from the
+    versioned search cache (flights.search_cache).
+
+    When an origin and destination are given but no direct flight
+    matches, connecting itineraries with up to CONNECTION_MAX_STOPS stops
+    are listed instead (flights.connections).
+
+    With `flexible` ticked the page also shows the fare calendar: the
+    cheapest fare per day for FARE_CALENDAR_DAYS either side of the date.
     """
     form = SearchForm(request.GET or None)
-    flights = Flight.objects.all()
-
-    search_params = {}
+    search_params = _search_params(form)
     if form.is_valid():
-        origin = form.cleaned_data.get("origin")
-        destination = form.cleaned_data.get("destination")
-        date = form.cleaned_data.get("date")
-
-        if origin:
-            flights = flights.filter(route__origin__icontains=origin)
-            search_params['origin'] = origin
+        logger.info(
+            f'User {request.user.username} searched for flights with params: {search_params}'
+        )
+        audit(request, 'flight_search', _search_details(search_params))
 
-        if destination:
-            flights = flights.filter(route__destination__icontains=destination)
-            search_params['destination'] = destination
+    # Pages are cached per search and cursor, and dropped when a booking or
+    # edit touches one of the routes the search can match.
+    cursor = request.GET.get('cursor')
+    page = get_or_compute(
+        search_params.get('origin'), search_params.get('destination'), search_params.get('date'),
+        lambda: paginate(
+            _flight_page_query(search_params), ('departure_time', 'id'), cursor, FLIGHTS_PER_PAGE
+        ),
+        extra=('list', cursor),
+    )
+    connections = []
+    if not page and not cursor:
+        connections = find_connections(
+            search_params.get('origin'), search_params.get('destination'), search_params.get('date')
+        )
+    fare_calendar = None
+    if _wants_fare_calendar(form, search_params):
+        fare_calendar = Flight.objects.fare_calendar(
+            search_params['origin'], search_params['destination'], search_params.get('date', '')
+        )
+    return render(
+        request, "flights/list.html",
+        {
+            "form": form, "flights": page, "page": page,
+            "connections": connections, "fare_calendar": fare_calendar,
+        },
+    )
 
-        if date:
-            flights = flights.filter(departure_time__date=date)
-            search_params['date'] = date
 
+@login_required
+async def aflight_list(request):
+    """Async version of flight_list, served when ASYNC_VIEWS is on (ASGI)."""
+    form = SearchForm(request.GET or None)
+    search_params = _search_params(form)
+    user = await request.auser()
+    if form.is_valid():
         logger.info(
-            f'User {request.user.username} searched for flights with params: {search_params}'
+            f'User {user.username} searched for flights with params: {search_params}'
+        )
+        audit(request, 'flight_search', _search_details(search_params), user=user)
+
+    cursor = request.GET.get('cursor')
+    page = await aget_or_compute(
+        search_params.get('origin'), search_params.get('destination'), search_params.get('date'),
+        lambda: apaginate(
+            _flight_page_query(search_params), ('departure_time', 'id'), cursor, FLIGHTS_PER_PAGE
+        ),
+        extra=('list', cursor),
+    )
+    connections = []
+    if not page and not cursor:
+        connections = await afind_connections(
+            search_params.get('origin'), search_params.get('destination'), search_params.get('date')
+        )
+    fare_calendar = None
+    if _wants_fare_calendar(form, search_params):
+        fare_calendar = await Flight.objects.afare_calendar(
+            search_params['origin'], search_params['destination'], search_params.get('date', '')
         )
+    return await arender(
+        request, "flights/list.html",
+        {
+            "form": form, "flights": page, "page": page,
+            "connections": connections, "fare_calendar": fare_calendar,
+        },
+    )
 
-    return render(request, "flights/list.html", {"form": form, "flights": flights})
+
+def _detail_context(flight):
+    # Most seats the booking form lets one request hold.
+    max_seats = min(flight.seats_available, settings.GROUP_BOOKING_MAX_SEATS)
+    return {"flight": flight, "max_seats": max_seats}
 
 
 @login_required
@@ -50,6 +167,121 @@ def flight_detail(request, pk):
     """
     Display detailed information about a specific flight.
     """
-    flight = get_object_or_404(Flight, pk=pk)
+    flight = get_object_or_404(Flight.objects.select_related('route'), pk=pk)
     logger.info(f'User {request.user.username} viewed flight detail: {flight}')
-    return render(request, "flights/detail.html", {"flight": flight})
+    return render(request, "flights/detail.html", _detail_context(flight))
+
+
+@login_required
+async def aflight_detail(request, pk):
+    """Async version of flight_detail, served when ASYNC_VIEWS is on (ASGI)."""
+    flight = await aget_object_or_404(Flight.objects.select_related('route'), pk=pk)
+    user = await request.auser()
+    logger.info(f'User {user.username} viewed flight detail: {flight}')
+    return await arender(request, "flights/detail.html", _detail_context(flight))
+
+
+@login_required
+@require_GET
+def fare_calendar(request):
+    """
+    Cheapest fare and number of bookable flights per day around a date.
+
+    Query parameters:
+    - origin, destination: Cities of the route (required)
+    - date: Centre of the window, defaults to today
+    - days: Days either side (0 to FARE_CALENDAR_MAX_DAYS, default
+      FARE_CALENDAR_DAYS)
+
+    One aggregated query, cached like the search results, instead of a
+    flight_list search per neighbouring date.
+    """
+    form = FareCalendarForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({"errors": form.errors}, status=400)
+    params = form.cleaned_data
+    calendar = Flight.objects.fare_calendar(
+        params['origin'], params['destination'], params['date'] or '', params['days'],
+    )
+    return JsonResponse({
+        "origin": params['origin'],
+        "destination": params['destination'],
+        "days": _fare_calendar_json(calendar),
+    })
+
+
+@login_required
+@require_GET
+async def afare_calendar(request):
+    """Async version of fare_calendar, served when ASYNC_VIEWS is on (ASGI)."""
+    form = FareCalendarForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({"errors": form.errors}, status=400)
+    params = form.cleaned_data
+    calendar = await Flight.objects.afare_calendar(
+        params['origin'], params['destination'], params['date'] or '', params['days'],
+    )
+    return JsonResponse({
+        "origin": params['origin'],
+        "destination": params['destination'],
+        "days": _fare_calendar_json(calendar),
+    })
+
+
+@login_required
+def cheapest_from(request):
+    """
+    Cheapest bookable fare to every destination from one city.
+
+    Query parameters:
+    - origin: Departure city (case-insensitive)
+
+    Reads the RouteFare read model, one row per route, instead of
+    aggregating future flights.
+    """
+    origin = request.GET.get('origin', '').strip()
+    fares = list(RouteFare.objects.cheapest_from(origin)) if origin else []
+    return render(request, "flights/cheapest.html", {"origin": origin, "fares": fares})
+
+
+@login_required
+def fare_matrix(request):
+    """Lowest bookable fare for every origin × destination, from RouteFare."""
+    origins, destinations, rows = RouteFare.objects.matrix()
+    return render(
+        request, "flights/fare_matrix.html", {"destinations": destinations, "rows": rows},
+    )
+
+
+@require_GET
+def city_autocomplete(request):
+    """
+    Suggest city names for the search form as the user types.
+
+    Query parameters:
+    - field: "origin" or "destination"
+    - q: Prefix typed so far
+
+    Served from the in-memory city index and left public on purpose: a
+    session lookup for login_required would cost a database query per
+    keystroke, and route city names are not private.
+    """
+    field = request.GET.get("field")
+    if field not in AUTOCOMPLETE_FIELDS:
+        return JsonResponse({"error": "field must be origin or destination"}, status=400)
+    results = city_index.suggest(field, request.GET.get("q", ""))
+    return JsonResponse({"results": results})
+
+
+@staff_member_required
+def search_cache_status(request):
+    """
+    Report flight search cache hit/miss/eviction counters (staff only).
+
+    Served by the web process itself so the figures are visible even with
+    the per-process local-memory cache backend.
+    """
+    counters = search_cache_stats()
+    lookups = sum(counters.values())
+    counters["hit_rate"] = round(counters["hits"] / lookups, 4) if lookups else 0
+    return JsonResponse(counters)
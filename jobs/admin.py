@@ -0,0 +1,28 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    """
+    Admin interface for Job model.
+
+    Features:
+    - List display with task, status and retry information
+    - Filtering by status and task
+    - Retry action for failed jobs
+    """
+    list_display = ('id', 'task', 'status', 'attempts', 'max_attempts', 'run_after', 'created_at')
+    list_filter = ('status', 'task')
+    readonly_fields = ('created_at', 'locked_at', 'finished_at', 'last_error')
+    ordering = ('-id',)
+    actions = ['retry_jobs']
+
+    @admin.action(description='Retry selected jobs now')
+    def retry_jobs(self, request, queryset):
+        count = queryset.exclude(status='running').update(
+            status='queued', attempts=0, run_after=timezone.now(), finished_at=None,
+        )
+        self.message_user(request, f'{count} jobs queued for retry.')
@@ -0,0 +1,99 @@
+import logging
+import multiprocessing
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.utils.module_loading import autodiscover_modules
+
+from jobs.queue import requeue_stale, run_batch
+
+logger = logging.getLogger(__name__)
+
+
+def _work(options, stop):
+    """Claim and run batches until stopped (or, with --once, until the queue is drained)."""
+    try:
+        while not stop.is_set():
+            if run_batch(options['batch_size']):
+                continue
+            if options['once']:
+                break
+            requeue_stale(options['lease'])
+            stop.wait(options['poll_interval'])
+    except Exception:
+        logger.exception('Job worker thread crashed')
+        raise
+    finally:
+        connection.close()
+
+
+def _run_threads(options):
+    stop = threading.Event()
+    threads = [
+        threading.Thread(target=_work, args=(options, stop), name=f'jobs-{i}', daemon=True)
+        for i in range(options['threads'])
+    ]
+    for thread in threads:
+        thread.start()
+    try:
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(0.5)
+    except KeyboardInterrupt:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+
+class Command(BaseCommand):
+    help = "Run background jobs from the database queue with a pool of processes and threads."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=1,
+            help='Worker processes to fork (default: 1, run in this process).',
+        )
+        parser.add_argument(
+            '--threads', type=int, default=4,
+            help='Worker threads per process.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=50,
+            help='Jobs claimed per query; emails in one batch share an SMTP connection.',
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=1.0,
+            help='Seconds to sleep when the queue has nothing due.',
+        )
+        parser.add_argument(
+            '--lease', type=int, default=settings.JOBS_LEASE_SECONDS,
+            help='Seconds before a running job is assumed lost and requeued.',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Exit once no job is due instead of polling forever.',
+        )
+
+    def handle(self, *args, **options):
+        autodiscover_modules('tasks')
+        logger.info(
+            f"Job worker started: {options['processes']} processes x {options['threads']} threads"
+        )
+        if options['processes'] <= 1:
+            _run_threads(options)
+            return
+
+        # Children must not share the parent's database socket.
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        processes = [context.Process(target=_run_threads, args=(options,)) for _ in range(options['processes'])]
+        for process in processes:
+            process.start()
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            for process in processes:
+                process.join()
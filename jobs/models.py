@@ -0,0 +1,83 @@
+from datetime import timedelta
+
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+
+class JobManager(models.Manager):
+    """
+    Custom manager for Job model.
+
+    Provides querysets for the queue's lifecycle:
+    - ready(): Queued jobs whose run_after time has come
+    - stale(lease_seconds): Running jobs whose worker stopped reporting back
+    - failed(): Jobs that used up all their attempts
+    """
+
+    def ready(self):
+        """Return queued jobs that are due to run."""
+        return self.filter(status='queued', run_after__lte=timezone.now())
+
+    def stale(self, lease_seconds):
+        """Return running jobs locked longer than `lease_seconds` ago."""
+        return self.filter(
+            status='running',
+            locked_at__lt=timezone.now() - timedelta(seconds=lease_seconds),
+        )
+
+    def failed(self):
+        """Return jobs that will not be retried."""
+        return self.filter(status='failed')
+
+
+class Job(models.Model):
+    """
+    A unit of background work stored in the database.
+
+    Rows are written in the same transaction as the change that needs them
+    (e.g. a new user and their verification email), so work is never lost
+    or sent for a rolled-back change. Workers claim rows with
+    SELECT ... FOR UPDATE SKIP LOCKED; see jobs.queue.
+    """
+
+    STATUS_CHOICES = [
+        ("queued", "Queued"),
+        ("running", "Running"),
+        ("done", "Done"),
+        ("failed", "Failed"),
+    ]
+
+    task = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="queued")
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    # Use custom manager
+    objects = JobManager()
+
+    class Meta:
+        indexes = [
+            # Dequeue scans only rows that can still run.
+            models.Index(
+                fields=['run_after', 'id'],
+                condition=Q(status='queued'),
+                name='job_ready_idx',
+            ),
+            models.Index(
+                fields=['locked_at'],
+                condition=Q(status='running'),
+                name='job_running_idx',
+            ),
+        ]
+        verbose_name = "Job"
+        verbose_name_plural = "Jobs"
+
+    def __str__(self):
+        return f"{self.task} #{self.id} - {self.status}"
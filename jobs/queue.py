@@ -0,0 +1,174 @@
+"""
+Durable background jobs backed by the jobs_job table.
+
+Web requests only insert a Job row (in the same transaction as the change
+that needs it) and return; the run_jobs worker command claims due rows with
+SELECT ... FOR UPDATE SKIP LOCKED, so any number of worker processes and
+threads can share the queue without handing the same job out twice.
+
+Usage:
+    @task('send_mail', batch=True)
+    def send_mail_batch(payloads): ...
+
+    enqueue('send_mail', {'subject': ..., 'to': [...]})
+
+Failed jobs are retried with exponential backoff until max_attempts; a job
+whose worker died while running it is requeued once its lease expires.
+"""
+import logging
+import random
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}
+
+
+class UnknownTask(LookupError):
+    """No handler is registered for a job's task name; retrying cannot help."""
+
+
+def task(name, batch=False):
+    """
+    Register a function as the handler for jobs named `name`.
+
+    A plain handler is called once per job with its payload. A batch handler
+    is called with the payloads of every claimed job of its kind and returns
+    one entry per payload: None on success or the exception that failed it.
+    """
+    def decorator(func):
+        TASKS[name] = (func, batch)
+        return func
+    return decorator
+
+
+def enqueue(name, payload=None, delay=0, max_attempts=None):
+    """
+    Add a job to the queue.
+
+    Args:
+        name (str): Registered task name
+        payload (dict): JSON-serializable arguments for the handler
+        delay (int): Seconds to wait before the job becomes due
+        max_attempts (int): Defaults to settings.JOBS_MAX_ATTEMPTS
+
+    Returns:
+        Job
+    """
+    return Job.objects.create(
+        task=name,
+        payload=payload or {},
+        run_after=timezone.now() + timedelta(seconds=delay),
+        max_attempts=max_attempts or settings.JOBS_MAX_ATTEMPTS,
+    )
+
+
+def claim(batch_size=50):
+    """
+    Lock up to `batch_size` due jobs, mark them running and return them.
+
+    Rows locked by another worker are skipped rather than waited for.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = list(
+            Job.objects.ready()
+            .order_by('run_after', 'id')
+            .select_for_update(skip_locked=True)[:batch_size]
+        )
+        if jobs:
+            Job.objects.filter(pk__in=[job.pk for job in jobs]).update(
+                status='running', locked_at=now, attempts=F('attempts') + 1,
+            )
+    for job in jobs:
+        job.status, job.locked_at, job.attempts = 'running', now, job.attempts + 1
+    return jobs
+
+
+def requeue_stale(lease_seconds=None):
+    """Put jobs whose worker never reported back on the queue again."""
+    lease_seconds = lease_seconds or settings.JOBS_LEASE_SECONDS
+    count = Job.objects.stale(lease_seconds).update(
+        status='queued', run_after=timezone.now(), locked_at=None,
+    )
+    if count:
+        logger.warning(f'Requeued {count} jobs running longer than {lease_seconds}s')
+    return count
+
+
+def backoff(attempts):
+    """Seconds to wait before retry number `attempts` (1-based), with jitter."""
+    delay = min(settings.JOBS_RETRY_MAX_DELAY, settings.JOBS_RETRY_BASE_DELAY * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+def _execute(jobs):
+    """Run claimed jobs; return a list of (job, error) with error None on success."""
+    by_task = {}
+    for job in jobs:
+        by_task.setdefault(job.task, []).append(job)
+
+    results = []
+    for name, group in by_task.items():
+        if name not in TASKS:
+            error = UnknownTask(f'No handler registered for task {name!r}')
+            results += [(job, error) for job in group]
+            continue
+        func, batch = TASKS[name]
+        if batch:
+            try:
+                errors = func([job.payload for job in group])
+            except Exception as exc:
+                errors = [exc] * len(group)
+            results += list(zip(group, errors))
+        else:
+            for job in group:
+                try:
+                    func(job.payload)
+                    results.append((job, None))
+                except Exception as exc:
+                    results.append((job, exc))
+    return results
+
+
+def _record(results):
+    now = timezone.now()
+    done = [job.pk for job, error in results if error is None]
+    if done:
+        Job.objects.filter(pk__in=done).update(status='done', finished_at=now, last_error='')
+
+    for job, error in results:
+        if error is None:
+            continue
+        message = ''.join(traceback.format_exception(error)).strip()
+        if job.attempts >= job.max_attempts or isinstance(error, UnknownTask):
+            Job.objects.filter(pk=job.pk).update(status='failed', finished_at=now, last_error=message)
+            logger.error(f'Job {job.task} #{job.pk} failed after {job.attempts} attempts: {error}')
+        else:
+            retry_at = now + timedelta(seconds=backoff(job.attempts))
+            Job.objects.filter(pk=job.pk).update(
+                status='queued', run_after=retry_at, locked_at=None, last_error=message,
+            )
+            logger.warning(f'Job {job.task} #{job.pk} attempt {job.attempts} failed, retrying at {retry_at}: {error}')
+    return len(done)
+
+
+def run_batch(batch_size=50):
+    """
+    Claim and run one batch of due jobs.
+
+    Returns:
+        int: Number of jobs claimed (0 when the queue has nothing due)
+    """
+    jobs = claim(batch_size)
+    if jobs:
+        _record(_execute(jobs))
+    return len(jobs)
@@ -0,0 +1,40 @@
+"""
+Built-in job handlers.
+
+send_mail is a batch task: every verification (or other) email claimed in
+one batch goes out over a single backend connection, so an SMTP worker logs
+in once per batch instead of once per message.
+"""
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+
+from .queue import enqueue, task
+
+
+def send_mail_later(subject, message, recipient_list, from_email=None):
+    """Queue an email; takes the same arguments as django.core.mail.send_mail()."""
+    return enqueue('send_mail', {
+        'subject': subject,
+        'message': message,
+        'from_email': from_email or settings.DEFAULT_FROM_EMAIL,
+        'recipient_list': list(recipient_list),
+    })
+
+
+@task('send_mail', batch=True)
+def send_mail_batch(payloads):
+    """Send queued emails over one connection; a failing message fails only its job."""
+    errors = []
+    with get_connection(fail_silently=False) as connection:
+        for payload in payloads:
+            message = EmailMessage(
+                payload['subject'], payload['message'],
+                payload['from_email'], payload['recipient_list'],
+                connection=connection,
+            )
+            try:
+                connection.send_messages([message])
+                errors.append(None)
+            except Exception as exc:
+                errors.append(exc)
+    return errors
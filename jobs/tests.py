@@ -0,0 +1,134 @@
+import threading
+from datetime import timedelta
+from unittest import mock
+
+from django.core import mail
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Job
+from .queue import TASKS, claim, enqueue, requeue_stale, run_batch, task
+from . import tasks
+
+
+class RegistrationEmailTests(TestCase):
+
+    def test_register_queues_email_instead_of_sending(self):
+        response = self.client.post(reverse('accounts:register'), {
+            'username': 'newcomer',
+            'email': 'newcomer@example.com',
+            'password1': 'a-Strong-pass-123',
+            'password2': 'a-Strong-pass-123',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(mail.outbox, [])
+        job = Job.objects.get()
+        self.assertEqual((job.task, job.status), ('send_mail', 'queued'))
+
+        run_batch()
+        self.assertEqual(mail.outbox[0].to, ['newcomer@example.com'])
+        self.assertIn('/accounts/verify-email/', mail.outbox[0].body)
+        self.assertEqual(Job.objects.get().status, 'done')
+
+
+class JobQueueTests(TestCase):
+
+    def setUp(self):
+        self.calls = []
+        TASKS.pop('test.flaky', None)
+
+        @task('test.flaky')
+        def flaky(payload):
+            self.calls.append(payload)
+            if payload.get('fail'):
+                raise RuntimeError('boom')
+
+        self.addCleanup(TASKS.pop, 'test.flaky', None)
+
+    def test_batch_of_emails_shares_one_connection(self):
+        for i in range(5):
+            tasks.send_mail_later('Hello', 'Body', [f'user{i}@example.com'])
+        with mock.patch.object(tasks, 'get_connection', wraps=tasks.get_connection) as get_connection:
+            self.assertEqual(run_batch(batch_size=10), 5)
+        get_connection.assert_called_once()
+        self.assertEqual(len(mail.outbox), 5)
+
+    def test_failed_job_is_retried_with_backoff(self):
+        job = enqueue('test.flaky', {'fail': True}, max_attempts=2)
+        run_batch()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('queued', 1))
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertIn('RuntimeError: boom', job.last_error)
+
+        # Not due yet, so the next batch leaves it alone.
+        self.assertEqual(run_batch(), 0)
+
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        run_batch()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 2))
+        self.assertEqual(len(self.calls), 2)
+
+    def test_unknown_task_fails_without_retry(self):
+        job = enqueue('test.missing')
+        run_batch()
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertIn('No handler registered', job.last_error)
+
+    def test_lookup_errors_in_handlers_are_retried(self):
+        task('test.buggy')(lambda payload: payload['missing'])
+        self.addCleanup(TASKS.pop, 'test.buggy', None)
+        job = enqueue('test.buggy', max_attempts=2)
+        run_batch()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('queued', 1))
+        self.assertIn("KeyError: 'missing'", job.last_error)
+
+    def test_stale_running_job_is_requeued(self):
+        job = enqueue('test.flaky')
+        self.assertEqual(claim(), [job])
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(requeue_stale(lease_seconds=60), 1)
+        run_batch()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('done', 2))
+
+
+@skipUnlessDBFeature('has_select_for_update_skip_locked')
+class ConcurrentWorkerTests(TransactionTestCase):
+
+    def test_workers_never_claim_the_same_job(self):
+        Job.objects.bulk_create(Job(task='send_mail') for _ in range(300))
+        claimed, lock = [], threading.Lock()
+        start = threading.Barrier(8)
+
+        def worker():
+            start.wait()
+            try:
+                while jobs := claim(batch_size=7):
+                    with lock:
+                        claimed.extend(job.pk for job in jobs)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(claimed), 300)
+        self.assertEqual(len(set(claimed)), 300)
+
+    @override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+    def test_run_jobs_command_drains_the_queue(self):
+        for i in range(40):
+            tasks.send_mail_later('Hello', 'Body', [f'user{i}@example.com'])
+        call_command('run_jobs', threads=4, batch_size=5, once=True)
+        self.assertEqual(Job.objects.filter(status='done').count(), 40)
+        self.assertEqual(len(mail.outbox), 40)
@@ -1,19 +1,53 @@
+import datetime
+import ipaddress
+
 from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
+from django.utils import timezone
+
+from airline_booking.admin_search import IndexedSearchMixin
+from airline_booking.exports import ExportActionsMixin
+from airline_booking.pagination import EstimatedCountPaginator
 from .models import Log
+from .partitions import add_months, month_start
+
+
+class RecentLogChangeList(ChangeList):
+    """Change list limited to the admin's recent months unless a timestamp filter is chosen."""
+
+    def get_queryset(self, request, exclude_parameters=None):
+        queryset = super().get_queryset(request, exclude_parameters)
+        if any(key.startswith('timestamp') for key in request.GET):
+            return queryset
+        return queryset.filter(timestamp__gte=self.model_admin.recent_since())
 
 
 @admin.register(Log)
-class LogAdmin(admin.ModelAdmin):
+class LogAdmin(IndexedSearchMixin, ExportActionsMixin, admin.ModelAdmin):
     """
     Admin interface for Log model.
     
     Displays activity logs for auditing and monitoring purposes.
     Allows filtering by action type, user, and timestamp.
+
+    Unless a timestamp filter is chosen, only the last `recent_months`
+    months are listed, so the list, counts and searches touch just the
+    newest partitions of the log table. The change view is not limited:
+    any entry stays reachable by its URL. Exports (gzipped, logs being the
+    largest table) follow the same filters. Searching for an IP address
+    matches ip_address exactly, through its index.
     """
     list_display = ('id', 'user', 'action', 'timestamp', 'ip_address')
     list_filter = ('action', 'timestamp')
-    search_fields = ('user__username', 'details', 'ip_address')
+    search_fields = ('user__username', 'details')
     readonly_fields = ('timestamp', 'user', 'action', 'details', 'ip_address')
+    ordering = ('-timestamp',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    recent_months = 2
+    export_fields = ('id', 'timestamp', 'user_id', 'user__username', 'action', 'details', 'ip_address')
+    export_ordering = ('-timestamp',)
+    export_gzip = True
     
     def has_add_permission(self, request):
         """Prevent manual addition of logs - should only be created by system."""
@@ -27,3 +61,18 @@ class LogAdmin(admin.ModelAdmin):
         """Override to use select_related efficiently."""
         qs = super().get_queryset(request)
         return qs.select_related('user')
+
+    def get_changelist(self, request, **kwargs):
+        return RecentLogChangeList
+
+    def recent_since(self):
+        """Start of the oldest month the change list shows by default."""
+        since = add_months(month_start(timezone.localdate()), 1 - self.recent_months)
+        return timezone.make_aware(datetime.datetime.combine(since, datetime.time.min))
+
+    def get_search_results(self, request, queryset, search_term):
+        try:
+            address = ipaddress.ip_address(search_term.strip())
+        except ValueError:
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(ip_address=str(address)), False
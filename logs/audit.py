@@ -0,0 +1,171 @@
+"""
+Buffered audit trail writer for the Log model.
+
+Views call audit() with a structured event; it is appended to an in-process
+buffer and the request moves on without touching the database. A background
+flusher thread writes the buffer with one Log.objects.bulk_create() per
+batch whenever AUDIT_BATCH_SIZE events are waiting or AUDIT_FLUSH_INTERVAL
+seconds have passed, and once more when the process exits.
+
+The buffer holds at most AUDIT_BUFFER_SIZE events. When it is full
+(the database is slow or down) AUDIT_OVERFLOW decides what happens:
+- "drop": discard the new event at once and count it (default; requests
+  are never slowed down by auditing)
+- "block": wait up to AUDIT_BLOCK_TIMEOUT seconds for the flusher to make
+  room, then drop
+"""
+import atexit
+import ipaddress
+import logging
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class AuditBuffer:
+    """Bounded, thread-safe queue of pending Log rows plus its flusher thread."""
+
+    def __init__(self):
+        self._events = deque()
+        self._lock = threading.Condition()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._closed = False
+        self.dropped = 0
+        self.written = 0
+
+    def record(self, action, user_id=None, ip_address=None, details=''):
+        """
+        Queue one event.
+
+        Returns:
+            bool: False if the event was dropped because the buffer is full
+        """
+        event = (action, user_id, ip_address, details, timezone.now())
+        with self._lock:
+            if len(self._events) >= settings.AUDIT_BUFFER_SIZE and settings.AUDIT_OVERFLOW == 'block':
+                self._lock.wait_for(
+                    lambda: len(self._events) < settings.AUDIT_BUFFER_SIZE,
+                    timeout=settings.AUDIT_BLOCK_TIMEOUT,
+                )
+            if len(self._events) >= settings.AUDIT_BUFFER_SIZE:
+                self.dropped += 1
+                if self.dropped % 1000 == 1:
+                    logger.warning(f'Audit buffer full, {self.dropped} events dropped so far')
+                return False
+            self._events.append(event)
+            pending = len(self._events)
+
+        if pending >= settings.AUDIT_BATCH_SIZE:
+            self._wakeup.set()
+        self._ensure_flusher()
+        return True
+
+    def flush(self):
+        """Write every buffered event in batches; returns the number written."""
+        from .models import Log
+
+        total = 0
+        while True:
+            with self._lock:
+                batch = [self._events.popleft() for _ in range(min(len(self._events), settings.AUDIT_BATCH_SIZE))]
+                self._lock.notify_all()
+            if not batch:
+                return total
+            try:
+                Log.objects.bulk_create([
+                    Log(action=action, user_id=user_id, ip_address=ip_address, details=details, timestamp=timestamp)
+                    for action, user_id, ip_address, details, timestamp in batch
+                ])
+            except Exception:
+                logger.exception(f'Failed to write {len(batch)} audit events, retrying on next flush')
+                self._requeue(batch)
+                return total
+            total += len(batch)
+            self.written += len(batch)
+
+    def _requeue(self, batch):
+        # Put a failed batch back in front, as far as the bound allows.
+        with self._lock:
+            room = max(0, settings.AUDIT_BUFFER_SIZE - len(self._events))
+            self.dropped += len(batch) - min(room, len(batch))
+            self._events.extendleft(reversed(batch[:room]))
+
+    def clear(self):
+        """Discard buffered events without writing them."""
+        with self._lock:
+            self._events.clear()
+            self._lock.notify_all()
+
+    def __len__(self):
+        return len(self._events)
+
+    def close(self):
+        """Stop the flusher and write whatever is left (registered with atexit)."""
+        self._closed = True
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=settings.AUDIT_FLUSH_INTERVAL + 5)
+        self.flush()
+
+    def _ensure_flusher(self):
+        if self._thread is not None or not settings.AUDIT_BACKGROUND_FLUSH:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='audit-flusher', daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _run(self):
+        try:
+            while not self._closed:
+                self._wakeup.wait(settings.AUDIT_FLUSH_INTERVAL)
+                self._wakeup.clear()
+                started = time.monotonic()
+                written = self.flush()
+                if written:
+                    logger.debug(f'Wrote {written} audit events in {time.monotonic() - started:.3f}s')
+        finally:
+            connection.close()
+
+
+audit_log = AuditBuffer()
+
+
+def audit(request, action, details='', user=None):
+    """
+    Record an audit event for `request`.
+
+    Args:
+        request: Current request (source of the client IP and, unless
+            `user` is given, the user)
+        action (str): One of Log.ACTION_CHOICES
+        details (str): Free-text description
+        user: Acting user; pass it explicitly from async views, where
+            request.user must not be evaluated lazily
+
+    Returns:
+        bool: False if the event was dropped
+    """
+    # Imported here: accounts.views itself records login/logout events.
+    from accounts.views import get_client_ip
+
+    if user is None:
+        user = getattr(request, 'user', None)
+    user_id = user.pk if user is not None and user.is_authenticated else None
+    return audit_log.record(action, user_id, _valid_ip(get_client_ip(request)), details)
+
+
+def _valid_ip(value):
+    # A malformed X-Forwarded-For must not make the whole batch fail to insert.
+    try:
+        return str(ipaddress.ip_address((value or '').strip()))
+    except ValueError:
+        return None
@@ -0,0 +1,24 @@
+from airline_booking.exports import ExportCommand
+from logs.admin import LogAdmin
+from logs.models import Log
+
+
+class Command(ExportCommand):
+    help = (
+        "Stream activity logs as CSV or JSON Lines. --since/--until limit the "
+        "scan to the matching monthly partitions."
+    )
+    model = Log
+    fields = LogAdmin.export_fields
+    date_field = 'timestamp'
+    ordering = ('timestamp',)
+
+    def add_filters(self, parser):
+        parser.add_argument('--action', choices=[value for value, _ in Log.ACTION_CHOICES])
+        parser.add_argument('--user-id', type=int, help='Only rows for this user id.')
+
+    def filter(self, queryset, options):
+        for option, field in (('action', 'action'), ('user_id', 'user_id')):
+            if options[option] is not None:
+                queryset = queryset.filter(**{field: options[option]})
+        return queryset
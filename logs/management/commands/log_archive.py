@@ -0,0 +1,72 @@
+import datetime
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from logs.partitions import archive_path, archive_paths, read_archives, restore_archive
+
+
+def _month(value):
+    try:
+        return datetime.datetime.strptime(value, '%Y-%m').date()
+    except ValueError:
+        raise CommandError(f'Expected a month as YYYY-MM, got {value!r}')
+
+
+class Command(BaseCommand):
+    help = "List, search or re-attach archived months of the log table."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--archive-dir', default=settings.LOG_ARCHIVE_DIR,
+            help='Directory holding the compressed archives.',
+        )
+        subcommands = parser.add_subparsers(dest='subcommand', required=True)
+
+        subcommands.add_parser('list', help='List archived months.')
+
+        query = subcommands.add_parser('query', help='Print matching rows of an archive without loading it.')
+        query.add_argument('month', type=_month, help='Month as YYYY-MM.')
+        query.add_argument('--action', help='Only rows with this action.')
+        query.add_argument('--user-id', type=int, help='Only rows for this user id.')
+        query.add_argument('--contains', help='Only rows whose details contain this text.')
+
+        restore = subcommands.add_parser(
+            'restore',
+            help='Load the archives of a month back into the database as an attached partition. '
+                 'manage_log_partitions archives it again once it is past retention.',
+        )
+        restore.add_argument('month', type=_month, help='Month as YYYY-MM.')
+
+    def handle(self, *args, **options):
+        directory = options['archive_dir']
+        if options['subcommand'] == 'list':
+            names = sorted(os.listdir(directory)) if os.path.isdir(directory) else []
+            for name in names:
+                if name.endswith('.jsonl.gz'):
+                    size = os.path.getsize(os.path.join(directory, name))
+                    self.stdout.write(f'{name}  {size} bytes')
+            return
+
+        paths = archive_paths(directory, options['month'])
+        if not paths:
+            raise CommandError(f"No archive at {archive_path(directory, options['month'])}")
+
+        if options['subcommand'] == 'restore':
+            try:
+                rows = restore_archive(paths, options['month'])
+            except ValueError as exc:
+                raise CommandError(str(exc))
+            self.stdout.write(f"Restored {rows} rows for {options['month']:%Y-%m}")
+            return
+
+        for record in read_archives(paths):
+            if options['action'] and record['action'] != options['action']:
+                continue
+            if options['user_id'] is not None and record['user_id'] != options['user_id']:
+                continue
+            if options['contains'] and options['contains'] not in (record['details'] or ''):
+                continue
+            self.stdout.write(json.dumps(record))
@@ -0,0 +1,64 @@
+import logging
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from logs.partitions import (
+    add_months, archive_partition, attached_partitions, detached_partitions,
+    ensure_partitions, missing_partitions, month_start, partition_name,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Create upcoming monthly partitions of the log table and archive "
+        "months older than the retention period (run daily from cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ahead', type=int, default=settings.LOG_PARTITIONS_AHEAD,
+            help='Months to create partitions for in advance.',
+        )
+        parser.add_argument(
+            '--retention', type=int, default=settings.LOG_RETENTION_MONTHS,
+            help='Months to keep in the database before archiving.',
+        )
+        parser.add_argument(
+            '--archive-dir', default=settings.LOG_ARCHIVE_DIR,
+            help='Directory for the compressed archives.',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report which partitions would be created and which months archived.',
+        )
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        if options['dry_run']:
+            for month in missing_partitions(options['ahead'], today):
+                self.stdout.write(f'Would create {partition_name(month)}')
+        else:
+            for name in ensure_partitions(options['ahead'], today):
+                logger.info(f'Created log partition {name}')
+                self.stdout.write(f'Created {name}')
+
+        cutoff = add_months(month_start(today), -options['retention'])
+        with connection.cursor() as cursor:
+            months = sorted(
+                month
+                for month in {**attached_partitions(cursor), **detached_partitions(cursor)}
+                if month < cutoff
+            )
+
+        for month in months:
+            if options['dry_run']:
+                self.stdout.write(f'Would archive {month:%Y-%m}')
+                continue
+            path, rows = archive_partition(month, options['archive_dir'])
+            logger.info(f'Archived {rows} log rows for {month:%Y-%m} to {path}')
+            self.stdout.write(f'Archived {month:%Y-%m}: {rows} rows -> {path}')
@@ -0,0 +1,128 @@
+# Turns logs_log into a table partitioned by month on "timestamp".
+#
+# Django keeps treating "id" as the primary key; in the database the key is
+# (id, timestamp) because PostgreSQL requires the partition key in every
+# unique constraint. Ids still come from the single identity sequence.
+
+import datetime
+
+from django.db import migrations
+
+COLUMNS = '"id", "action", "details", "timestamp", "ip_address", "user_id"'
+
+PARTITION_SQL = f"""
+ALTER TABLE "logs_log" RENAME TO "logs_log_unpartitioned";
+ALTER TABLE "logs_log_unpartitioned" RENAME CONSTRAINT "logs_log_pkey" TO "logs_log_unpartitioned_pkey";
+ALTER INDEX "log_action_timestamp_idx" RENAME TO "log_action_timestamp_idx_unpartitioned";
+ALTER INDEX "log_timestamp_idx" RENAME TO "log_timestamp_idx_unpartitioned";
+ALTER INDEX "logs_log_user_id_f24e8690" RENAME TO "logs_log_user_id_f24e8690_unpartitioned";
+
+CREATE TABLE "logs_log" (
+    "id" bigint NOT NULL GENERATED BY DEFAULT AS IDENTITY,
+    "action" varchar(20) NOT NULL,
+    "details" text NULL,
+    "timestamp" timestamp with time zone NOT NULL,
+    "ip_address" inet NULL,
+    "user_id" bigint NULL,
+    CONSTRAINT "logs_log_pkey" PRIMARY KEY ("id", "timestamp")
+) PARTITION BY RANGE ("timestamp");
+ALTER TABLE "logs_log" ADD CONSTRAINT "logs_log_user_id_f24e8690_fk_accounts_user_id"
+    FOREIGN KEY ("user_id") REFERENCES "accounts_user" ("id") DEFERRABLE INITIALLY DEFERRED;
+CREATE INDEX "logs_log_user_id_f24e8690" ON "logs_log" ("user_id");
+CREATE INDEX "log_action_timestamp_idx" ON "logs_log" ("action", "timestamp" DESC);
+CREATE INDEX "log_timestamp_idx" ON "logs_log" ("timestamp" DESC);
+CREATE TABLE "logs_log_default" PARTITION OF "logs_log" DEFAULT;
+
+INSERT INTO "logs_log" ({COLUMNS}) SELECT {COLUMNS} FROM "logs_log_unpartitioned";
+SELECT setval(pg_get_serial_sequence('"logs_log"', 'id'), COALESCE(MAX("id"), 0) + 1, false) FROM "logs_log";
+DROP TABLE "logs_log_unpartitioned";
+"""
+
+UNPARTITION_SQL = f"""
+CREATE TABLE "logs_log_unpartitioned" (
+    "id" bigint NOT NULL PRIMARY KEY GENERATED BY DEFAULT AS IDENTITY,
+    "action" varchar(20) NOT NULL,
+    "details" text NULL,
+    "timestamp" timestamp with time zone NOT NULL,
+    "ip_address" inet NULL,
+    "user_id" bigint NULL
+);
+INSERT INTO "logs_log_unpartitioned" ({COLUMNS}) SELECT {COLUMNS} FROM "logs_log";
+SELECT setval(pg_get_serial_sequence('"logs_log_unpartitioned"', 'id'), COALESCE(MAX("id"), 0) + 1, false)
+    FROM "logs_log_unpartitioned";
+DROP TABLE "logs_log";
+ALTER TABLE "logs_log_unpartitioned" RENAME TO "logs_log";
+ALTER TABLE "logs_log" RENAME CONSTRAINT "logs_log_unpartitioned_pkey" TO "logs_log_pkey";
+ALTER TABLE "logs_log" ADD CONSTRAINT "logs_log_user_id_f24e8690_fk_accounts_user_id"
+    FOREIGN KEY ("user_id") REFERENCES "accounts_user" ("id") DEFERRABLE INITIALLY DEFERRED;
+CREATE INDEX "logs_log_user_id_f24e8690" ON "logs_log" ("user_id");
+CREATE INDEX "log_action_timestamp_idx" ON "logs_log" ("action", "timestamp" DESC);
+CREATE INDEX "log_timestamp_idx" ON "logs_log" ("timestamp" DESC);
+"""
+
+
+# The partition helpers below are frozen copies of logs.partitions as of
+# this migration, so later changes to that module cannot change history.
+
+def _add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def _rename_child_indexes(cursor, name):
+    cursor.execute(
+        """
+        SELECT parent.relname, child.relname
+        FROM pg_index
+        JOIN pg_class child ON child.oid = pg_index.indexrelid
+        JOIN pg_inherits ON pg_inherits.inhrelid = child.oid
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        WHERE pg_index.indrelid = %s::regclass
+        """,
+        [name],
+    )
+    suffix = name[len('logs_log'):]
+    for parent, child in cursor.fetchall():
+        wanted = f'{parent}{suffix}'
+        if child != wanted:
+            cursor.execute(f'ALTER INDEX "{child}" RENAME TO "{wanted}"')
+
+
+def create_monthly_partitions(apps, schema_editor):
+    """
+    Partition every month from the oldest log row (or this month) to three
+    months ahead, moving the rows out of the default partition.
+    """
+    today = datetime.date.today()
+    with schema_editor.connection.cursor() as cursor:
+        _rename_child_indexes(cursor, 'logs_log_default')
+        cursor.execute('SELECT MIN("timestamp") FROM "logs_log_default"')
+        oldest = cursor.fetchone()[0]
+        month = (min(oldest.date(), today) if oldest else today).replace(day=1)
+        last = _add_months(today.replace(day=1), 3)
+        while month <= last:
+            following = _add_months(month, 1)
+            name = f'logs_log_y{month.year:04d}m{month.month:02d}'
+            start, end = f"'{month.isoformat()} 00:00:00+00'", f"'{following.isoformat()} 00:00:00+00'"
+            cursor.execute(f'CREATE TABLE "{name}" (LIKE "logs_log" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+            cursor.execute(
+                f'WITH moved AS (DELETE FROM "logs_log_default" '
+                f'WHERE "timestamp" >= {start} AND "timestamp" < {end} RETURNING {COLUMNS}) '
+                f'INSERT INTO "{name}" ({COLUMNS}) SELECT {COLUMNS} FROM moved'
+            )
+            cursor.execute(f'ALTER TABLE "logs_log" ATTACH PARTITION "{name}" FOR VALUES FROM ({start}) TO ({end})')
+            _rename_child_indexes(cursor, name)
+            month = following
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logs', '0003_log_event_timestamp'),
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunSQL(PARTITION_SQL, UNPARTITION_SQL),
+        migrations.RunPython(create_monthly_partitions, migrations.RunPython.noop),
+    ]
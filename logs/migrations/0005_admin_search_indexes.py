@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:46
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logs', '0004_partition_log_by_month'),
+        # pg_trgm, for the gin_trgm_ops indexes.
+        ('flights', '0004_trigram_search_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='log',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('details'), name='gin_trgm_ops'), name='log_details_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='log',
+            index=models.Index(fields=['ip_address'], name='log_ip_address_idx'),
+        ),
+    ]
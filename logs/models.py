@@ -1,5 +1,8 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
+
+from airline_booking.indexes import trigram_index
 
 class Log(models.Model):
     ACTION_CHOICES = [
@@ -14,8 +17,18 @@ class Log(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
     action = models.CharField(max_length=20, choices=ACTION_CHOICES)
     details = models.TextField(blank=True, null=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Set when the event happens, not when the audit buffer writes it.
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
     ip_address = models.GenericIPAddressField(blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['action', '-timestamp'], name='log_action_timestamp_idx'),
+            models.Index(fields=['-timestamp'], name='log_timestamp_idx'),
+            # Admin search: details by icontains, ip_address by equality.
+            trigram_index('details', 'log_details_trgm'),
+            models.Index(fields=['ip_address'], name='log_ip_address_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user} - {self.action} - {self.timestamp.strftime('%Y-%m-%d %H:%M')}"
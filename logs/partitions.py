@@ -0,0 +1,318 @@
+"""
+Monthly range partitions of the logs_log table.
+
+logs_log is a PostgreSQL partitioned table (see migration 0004): one child
+table per calendar month, named logs_log_yYYYYmMM, plus logs_log_default
+for rows outside every month that has a partition. Queries filtered on
+timestamp are pruned to the matching months, and old months can be
+detached and archived as a whole instead of deleted row by row.
+
+Indexes declared on Log are created on the parent and inherited by every
+partition; the child copies are renamed <parent index>_yYYYYmMM so query
+plans still name the index they come from.
+
+Managed by the manage_log_partitions and log_archive commands.
+"""
+import datetime
+import gzip
+import json
+import os
+import re
+
+from django.db import connection, transaction
+
+TABLE = 'logs_log'
+DEFAULT_PARTITION = f'{TABLE}_default'
+COLUMNS = ('id', 'action', 'details', 'timestamp', 'ip_address', 'user_id')
+_NAME = re.compile(rf'^{TABLE}_y(\d{{4}})m(\d{{2}})$')
+
+
+def month_start(value):
+    """First day of the month containing `value` (date or datetime)."""
+    return datetime.date(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f'{TABLE}_y{month.year:04d}m{month.month:02d}'
+
+
+def partition_month(name):
+    """Inverse of partition_name(); None for tables that are not monthly partitions."""
+    match = _NAME.match(name)
+    return datetime.date(int(match[1]), int(match[2]), 1) if match else None
+
+
+def _bounds(month):
+    # Month boundaries in UTC, quoted for DDL (bound values cannot be parameters).
+    return (
+        f"'{month.isoformat()} 00:00:00+00'",
+        f"'{add_months(month, 1).isoformat()} 00:00:00+00'",
+    )
+
+
+def attached_partitions(cursor):
+    """Return {month: name} for the monthly partitions attached to logs_log."""
+    cursor.execute(
+        """
+        SELECT child.relname
+        FROM pg_inherits
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE pg_inherits.inhparent = %s::regclass
+        """,
+        [TABLE],
+    )
+    partitions = {}
+    for (name,) in cursor.fetchall():
+        month = partition_month(name)
+        if month is not None:
+            partitions[month] = name
+    return partitions
+
+
+def detached_partitions(cursor):
+    """Return {month: name} for monthly tables no longer attached to logs_log."""
+    cursor.execute(
+        "SELECT tablename FROM pg_tables WHERE schemaname = current_schema() AND tablename LIKE %s",
+        [f'{TABLE}\\_y%'],
+    )
+    attached = set(attached_partitions(cursor).values())
+    return {
+        partition_month(name): name
+        for (name,) in cursor.fetchall()
+        if partition_month(name) is not None and name not in attached
+    }
+
+
+def _rename_child_indexes(cursor, name):
+    cursor.execute(
+        """
+        SELECT parent.relname, child.relname
+        FROM pg_index
+        JOIN pg_class child ON child.oid = pg_index.indexrelid
+        JOIN pg_inherits ON pg_inherits.inhrelid = child.oid
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        WHERE pg_index.indrelid = %s::regclass
+        """,
+        [name],
+    )
+    suffix = name[len(TABLE):]
+    for parent, child in cursor.fetchall():
+        wanted = f'{parent}{suffix}'
+        if child != wanted:
+            cursor.execute(f'ALTER INDEX "{child}" RENAME TO "{wanted}"')
+
+
+def _attach(cursor, name, month):
+    start, end = _bounds(month)
+    cursor.execute(f'ALTER TABLE "{TABLE}" ATTACH PARTITION "{name}" FOR VALUES FROM ({start}) TO ({end})')
+    _rename_child_indexes(cursor, name)
+
+
+def ensure_partition(month):
+    """
+    Create the partition for `month` if it does not exist yet.
+
+    Rows for that month already sitting in the default partition are moved
+    into the new table before it is attached, since PostgreSQL refuses to
+    attach a range the default partition still holds rows for.
+
+    Returns:
+        bool: True if a partition was created
+    """
+    month = month_start(month)
+    name = partition_name(month)
+    with transaction.atomic(), connection.cursor() as cursor:
+        if month in attached_partitions(cursor):
+            return False
+        start, end = _bounds(month)
+        columns = ', '.join(f'"{column}"' for column in COLUMNS)
+        cursor.execute(f'CREATE TABLE "{name}" (LIKE "{TABLE}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+        cursor.execute(
+            f'WITH moved AS (DELETE FROM "{DEFAULT_PARTITION}" '
+            f'WHERE "timestamp" >= {start} AND "timestamp" < {end} RETURNING {columns}) '
+            f'INSERT INTO "{name}" ({columns}) SELECT {columns} FROM moved'
+        )
+        _attach(cursor, name, month)
+    return True
+
+
+def missing_partitions(months_ahead=3, today=None):
+    """
+    Months from the oldest row in the default partition (or the current
+    month) up to `months_ahead` months ahead that have no partition yet.
+
+    Returns:
+        list: Months (first days) in ascending order
+    """
+    today = today or datetime.date.today()
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT MIN("timestamp") FROM "{DEFAULT_PARTITION}"')
+        oldest = cursor.fetchone()[0]
+        attached = attached_partitions(cursor)
+    month = month_start(min(oldest.date(), today) if oldest else today)
+    last = add_months(month_start(today), months_ahead)
+    missing = []
+    while month <= last:
+        if month not in attached:
+            missing.append(month)
+        month = add_months(month, 1)
+    return missing
+
+
+def ensure_partitions(months_ahead=3, today=None):
+    """
+    Create the partitions missing_partitions() reports.
+
+    Returns:
+        list: Names of the partitions created
+    """
+    return [
+        partition_name(month)
+        for month in missing_partitions(months_ahead, today)
+        if ensure_partition(month)
+    ]
+
+
+def detach_partition(month):
+    """Detach the partition for `month`; its rows stay in the standalone table."""
+    name = partition_name(month)
+    with connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE "{TABLE}" DETACH PARTITION "{name}"')
+    return name
+
+
+def export_table(name, path):
+    """
+    Write every row of table `name` to `path` as gzip-compressed JSON lines.
+
+    Rows are streamed with a server-side cursor, so memory use stays flat
+    however large the month is.
+
+    Returns:
+        int: Number of rows written
+    """
+    columns = ', '.join(f'"{column}"' for column in COLUMNS)
+    count = 0
+    with gzip.open(path, 'wt', encoding='utf-8') as archive, transaction.atomic():
+        with connection.chunked_cursor() as cursor:
+            cursor.execute(f'SELECT {columns} FROM "{name}" ORDER BY "timestamp", "id"')
+            for row in cursor:
+                record = dict(zip(COLUMNS, row))
+                record['timestamp'] = record['timestamp'].isoformat()
+                archive.write(json.dumps(record) + '\n')
+                count += 1
+    return count
+
+
+def archive_path(directory, month, number=0):
+    suffix = f'.{number}' if number else ''
+    return os.path.join(directory, f'{partition_name(month)}{suffix}.jsonl.gz')
+
+
+def archive_paths(directory, month):
+    """
+    Paths of the archives of `month`, oldest first.
+
+    A month archived again (after a restore, or after late rows recreated
+    its partition) gets a numbered archive next to the earlier ones rather
+    than replacing them.
+    """
+    paths = []
+    while os.path.exists(path := archive_path(directory, month, len(paths))):
+        paths.append(path)
+    return paths
+
+
+def archive_partition(month, directory):
+    """
+    Detach the partition for `month`, export it to `directory` and drop it.
+
+    The table is only dropped once the archive holds as many rows as the
+    table; a month that was detached but not archived (say, the disk filled
+    up) is picked up again by the next run.
+
+    Returns:
+        tuple: (archive path, number of rows archived)
+    """
+    name = partition_name(month)
+    with connection.cursor() as cursor:
+        if month in attached_partitions(cursor):
+            detach_partition(month)
+        cursor.execute(f'SELECT COUNT(*) FROM "{name}"')
+        expected = cursor.fetchone()[0]
+
+    os.makedirs(directory, exist_ok=True)
+    path = archive_path(directory, month, len(archive_paths(directory, month)))
+    written = export_table(name, f'{path}.partial')
+    if written != expected:
+        raise RuntimeError(f'{name}: exported {written} rows, table has {expected}')
+    # Unlike a rename, link() refuses to replace an archive that appeared
+    # in the meantime.
+    os.link(f'{path}.partial', path)
+    os.remove(f'{path}.partial')
+    with connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE "{name}"')
+    return path, written
+
+
+def read_archive(path):
+    """Yield the rows of an archive written by export_table() as dicts."""
+    with gzip.open(path, 'rt', encoding='utf-8') as archive:
+        for line in archive:
+            yield json.loads(line)
+
+
+def read_archives(paths):
+    """
+    Yield the rows of several archives of one month, each id once.
+
+    A month restored and archived again repeats the rows of its earlier
+    archive; the first copy read wins.
+    """
+    seen = set()
+    for path in paths:
+        for record in read_archive(path):
+            if record['id'] not in seen:
+                seen.add(record['id'])
+                yield record
+
+
+def restore_archive(paths, month, batch_size=5000):
+    """
+    Load the archives of `month` into a new table and attach it as its partition.
+
+    Returns:
+        int: Number of rows restored
+    """
+    month = month_start(month)
+    name = partition_name(month)
+    columns = ', '.join(f'"{column}"' for column in COLUMNS)
+    placeholders = ', '.join(['%s'] * len(COLUMNS))
+    count = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        if month in attached_partitions(cursor):
+            raise ValueError(f'{name} is already attached')
+        cursor.execute(f'CREATE TABLE "{name}" (LIKE "{TABLE}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+        batch = []
+        for record in read_archives(paths):
+            batch.append([record[column] for column in COLUMNS])
+            if len(batch) >= batch_size:
+                cursor.executemany(f'INSERT INTO "{name}" ({columns}) VALUES ({placeholders})', batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            cursor.executemany(f'INSERT INTO "{name}" ({columns}) VALUES ({placeholders})', batch)
+            count += len(batch)
+        # Users deleted since the month was archived lose their link, as they
+        # would have on the live table (on_delete=SET_NULL).
+        cursor.execute(
+            f'UPDATE "{name}" SET "user_id" = NULL WHERE "user_id" IS NOT NULL '
+            f'AND NOT EXISTS (SELECT 1 FROM "accounts_user" WHERE "accounts_user"."id" = "{name}"."user_id")'
+        )
+        _attach(cursor, name, month)
+    return count
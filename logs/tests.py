@@ -1,3 +1,259 @@
-from django.test import TestCase
+import datetime
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+
+from django.contrib.admin.sites import site
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import User
+from airline_booking.testing import QueryPlanMixin
+from .audit import AuditBuffer, audit, audit_log
+from .admin import LogAdmin
+from .models import Log
+from .partitions import add_months, ensure_partition, month_start, partition_name
+
+
+class LogQueryPlanTests(QueryPlanMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        actions = [choice for choice, _ in Log.ACTION_CHOICES]
+        Log.objects.bulk_create(
+            Log(action=actions[i % len(actions)], details=f'event {i}') for i in range(700)
+        )
+
+    def test_action_filter_uses_action_timestamp_index(self):
+        qs = Log.objects.filter(action='booking').order_by('-timestamp')[:100]
+        self.assertUsesIndex(qs, 'log_action_timestamp_idx')
+
+    def test_recent_window_uses_timestamp_index(self):
+        since = timezone.now() - timedelta(days=7)
+        qs = Log.objects.filter(timestamp__gte=since).order_by('-timestamp')[:100]
+        self.assertUsesIndex(qs)
+
+
+class AuditBufferTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='passenger')
+
+    def setUp(self):
+        audit_log.clear()
+        self.addCleanup(audit_log.clear)
+
+    def test_views_buffer_events_instead_of_inserting(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse('flights:list'), {'origin': 'Tehran'}, HTTP_X_FORWARDED_FOR='203.0.113.7, 10.0.0.1')
+        self.assertFalse(Log.objects.exists())
+        self.assertEqual(len(audit_log), 1)
+
+        self.assertEqual(audit_log.flush(), 1)
+        log = Log.objects.get()
+        self.assertEqual((log.user, log.action, log.ip_address), (self.user, 'flight_search', '203.0.113.7'))
+        self.assertEqual(log.details, 'origin=Tehran')
+
+    @override_settings(AUDIT_BATCH_SIZE=10)
+    def test_flush_writes_one_insert_per_batch(self):
+        for i in range(25):
+            audit_log.record('booking', self.user.id, '127.0.0.1', f'event {i}')
+        with self.assertNumQueries(3):
+            self.assertEqual(audit_log.flush(), 25)
+        self.assertEqual(Log.objects.filter(action='booking').count(), 25)
+
+    def test_timestamp_is_event_time(self):
+        audit_log.record('login', self.user.id)
+        recorded = timezone.now()
+        time.sleep(0.05)
+        audit_log.flush()
+        self.assertLessEqual(Log.objects.get().timestamp, recorded)
+
+    @override_settings(AUDIT_BUFFER_SIZE=5, AUDIT_OVERFLOW='drop')
+    def test_full_buffer_drops_new_events(self):
+        dropped = audit_log.dropped
+        results = [audit_log.record('login', self.user.id) for _ in range(7)]
+        self.assertEqual(results, [True] * 5 + [False] * 2)
+        self.assertEqual(audit_log.dropped - dropped, 2)
+        self.assertEqual(len(audit_log), 5)
+
+    @override_settings(AUDIT_BUFFER_SIZE=2, AUDIT_OVERFLOW='block', AUDIT_BLOCK_TIMEOUT=5)
+    def test_block_policy_waits_for_room(self):
+        audit_log.record('login', self.user.id)
+        audit_log.record('login', self.user.id)
+        threading.Timer(0.1, audit_log.clear).start()
+        self.assertTrue(audit_log.record('logout', self.user.id))
+        self.assertEqual(len(audit_log), 1)
+
+    def test_malformed_forwarded_for_stores_no_ip(self):
+        request = RequestFactory().get('/', HTTP_X_FORWARDED_FOR='not-an-ip')
+        request.user = self.user
+        audit(request, 'login')
+        audit_log.flush()
+        self.assertIsNone(Log.objects.get().ip_address)
+
+
+@override_settings(AUDIT_BACKGROUND_FLUSH=True, AUDIT_FLUSH_INTERVAL=0.1, AUDIT_BATCH_SIZE=50)
+class AuditFlusherTests(TransactionTestCase):
+
+    def test_flusher_writes_on_time_and_close_flushes_the_rest(self):
+        buffer = AuditBuffer()
+        buffer.record('flight_search', details='first')
+        deadline = time.monotonic() + 5
+        while not Log.objects.exists() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(Log.objects.count(), 1)
+
+        for i in range(120):
+            buffer.record('flight_search', details=f'event {i}')
+        buffer.close()
+        self.assertEqual(Log.objects.count(), 121)
+        self.assertEqual(len(buffer), 0)
+
+
+class LogPartitionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='auditor')
+        cls.this_month = month_start(timezone.localdate())
+        cls.old_month = add_months(cls.this_month, -24)
+
+    def _partition_of(self, log):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT tableoid::regclass::text FROM logs_log WHERE id = %s', [log.id])
+            return cursor.fetchone()[0]
+
+    def _at(self, month, day=15):
+        return timezone.make_aware(datetime.datetime(month.year, month.month, day, 12))
+
+    def test_new_rows_land_in_the_current_month(self):
+        log = Log.objects.create(action='login', user=self.user)
+        self.assertEqual(self._partition_of(log), partition_name(self.this_month))
+
+    def test_creating_a_partition_moves_rows_out_of_default(self):
+        log = Log.objects.create(action='login', timestamp=self._at(self.old_month))
+        self.assertEqual(self._partition_of(log), 'logs_log_default')
+        self.assertTrue(ensure_partition(self.old_month))
+        self.assertFalse(ensure_partition(self.old_month))
+        self.assertEqual(self._partition_of(log), partition_name(self.old_month))
+        self.assertEqual(Log.objects.get(pk=log.pk).action, 'login')
+
+    def test_admin_list_only_touches_recent_partitions(self):
+        ensure_partition(self.old_month)
+        request = RequestFactory().get('/admin/logs/log/')
+        request.user = User.objects.create_superuser(username='ops', password='x')
+        changelist = LogAdmin(Log, site).get_changelist_instance(request)
+        plan = changelist.queryset.order_by('-timestamp')[:100].explain()
+        self.assertIn(partition_name(self.this_month), plan)
+        self.assertNotIn(partition_name(self.old_month), plan)
+
+    def test_admin_change_view_opens_entries_older_than_the_list(self):
+        ensure_partition(self.old_month)
+        old = Log.objects.create(action='login', user=self.user, timestamp=self._at(self.old_month))
+        self.client.force_login(User.objects.create_superuser(username='ops', password='x'))
+        self.assertNotContains(self.client.get(reverse('admin:logs_log_changelist')), f'>{old.pk}<')
+        response = self.client.get(reverse('admin:logs_log_change', args=[old.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['original'], old)
+
+    def test_archive_query_and_restore(self):
+        ensure_partition(self.old_month)
+        Log.objects.bulk_create([
+            Log(action='booking', user=self.user, details='Flight 7', timestamp=self._at(self.old_month, 3)),
+            Log(action='cancel', user=self.user, details='Booking 9', timestamp=self._at(self.old_month, 4)),
+        ])
+        recent = Log.objects.create(action='login', user=self.user)
+        # Fire the deferred FK checks now; a month that is old enough to
+        # archive has no pending trigger events outside a test transaction.
+        with connection.cursor() as cursor:
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        archive_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, archive_dir)
+
+        out = io.StringIO()
+        call_command('manage_log_partitions', archive_dir=archive_dir, retention=12, stdout=out)
+        path = os.path.join(archive_dir, f'{partition_name(self.old_month)}.jsonl.gz')
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(list(Log.objects.values_list('id', flat=True)), [recent.id])
+
+        month = f'{self.old_month:%Y-%m}'
+        out = io.StringIO()
+        call_command('log_archive', '--archive-dir', archive_dir, 'query', month, '--action', 'cancel', stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 1)
+        self.assertIn('Booking 9', out.getvalue())
+
+        call_command('log_archive', '--archive-dir', archive_dir, 'restore', month, stdout=io.StringIO())
+        self.assertEqual(Log.objects.filter(timestamp__lt=self._at(self.this_month, 1)).count(), 2)
+
+        # Archiving the restored month again keeps the first archive.
+        first = os.path.getmtime(path)
+        call_command('manage_log_partitions', archive_dir=archive_dir, retention=12, stdout=io.StringIO())
+        self.assertEqual(os.path.getmtime(path), first)
+        self.assertTrue(os.path.exists(path.replace('.jsonl.gz', '.1.jsonl.gz')))
+        out = io.StringIO()
+        call_command('log_archive', '--archive-dir', archive_dir, 'query', month, stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 2)
+        call_command('log_archive', '--archive-dir', archive_dir, 'restore', month, stdout=io.StringIO())
+        self.assertEqual(Log.objects.filter(timestamp__lt=self._at(self.this_month, 1)).count(), 2)
+
+    def test_dry_run_creates_and_archives_nothing(self):
+        Log.objects.create(action='login', timestamp=self._at(self.old_month))
+        out = io.StringIO()
+        call_command('manage_log_partitions', '--dry-run', ahead=1, retention=12, stdout=out)
+        self.assertIn(f'Would create {partition_name(self.old_month)}', out.getvalue())
+        self.assertNotIn(partition_name(self.this_month), out.getvalue())
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT count(*) FROM pg_tables WHERE tablename = %s', [partition_name(self.old_month)])
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+
+class LogExportTests(TestCase):
+
+    def test_admin_export_is_gzipped_and_recent_only(self):
+        admin = User.objects.create_superuser(username='ops', password='x')
+        recent = Log.objects.create(user=admin, action='login', details='ok')
+        old = Log.objects.create(action='login', timestamp=timezone.now() - timedelta(days=400))
+        self.client.force_login(admin)
+        response = self.client.post(reverse('admin:logs_log_changelist'), {
+            'action': 'export_jsonl', 'select_across': '1', 'index': '0', '_selected_action': [recent.pk],
+        })
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        rows = [json.loads(line) for line in gzip.decompress(b''.join(response.streaming_content)).splitlines()]
+        self.assertEqual([(row['id'], row['user__username']) for row in rows], [(recent.pk, 'ops')])
+
+        out = io.StringIO()
+        call_command('export_logs', '--format', 'jsonl', '--until', timezone.localdate().isoformat(), stdout=out)
+        self.assertEqual([json.loads(line)['id'] for line in out.getvalue().splitlines()], [old.pk])
+
+
+@override_settings(ADMIN_EXACT_COUNT_LIMIT=-1)
+class LogAdminTests(TestCase):
+
+    def test_changelist_queries_and_ip_search(self):
+        admin = User.objects.create_superuser(username='ops', password='x')
+        self.client.force_login(admin)
+        url = reverse('admin:logs_log_changelist')
+        Log.objects.create(user=admin, action='login', ip_address='10.0.0.1')
+        # Session, user, EXPLAIN (no COUNT), page with users joined.
+        with self.assertNumQueries(4):
+            self.client.get(url)
+        Log.objects.bulk_create(
+            Log(user=admin, action='login', ip_address='10.0.0.2', details=f'attempt {i}') for i in range(10)
+        )
+        with self.assertNumQueries(4):
+            response = self.client.get(url, {'q': '10.0.0.1'})
+        self.assertEqual([log.ip_address for log in response.context['cl'].result_list], ['10.0.0.1'])
+        response = self.client.get(url, {'q': 'attempt 7'})
+        self.assertEqual(len(response.context['cl'].result_list), 1)
 
-# Create your tests here.
@@ -1,26 +1,40 @@
 from django.contrib import admin
-from .models import Transaction
+
+from airline_booking.admin_search import IndexedSearchMixin
+from airline_booking.exports import ExportActionsMixin
+from airline_booking.pagination import EstimatedCountPaginator
+from .models import BalanceCheckpoint, Transaction
 
 
 @admin.register(Transaction)
-class TransactionAdmin(admin.ModelAdmin):
+class TransactionAdmin(IndexedSearchMixin, ExportActionsMixin, admin.ModelAdmin):
     """
     Admin interface for Transaction model.
+
+    The ledger only changes through payments.wallet, which keeps it equal
+    to User.wallet and its checkpoints valid, so the admin is read-only.
     
     Features:
     - Financial transaction tracking
     - Filtering by transaction type and date
     - Display of transaction amounts and descriptions
     - Custom manager usage for efficient querying
+    - Streaming CSV / JSON Lines export for reconciliation
+    - Estimated counts, indexed search and autocomplete user/booking pickers
     """
     list_display = ('id', 'user', 'type', 'amount', 'created_at')
     list_filter = ('type', 'created_at')
+    autocomplete_fields = ('user', 'booking')
     search_fields = ('user__username', 'description')
     readonly_fields = ('created_at',)
+    ordering = ('-id',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    export_fields = ('id', 'user_id', 'user__username', 'type', 'amount', 'booking_id', 'description', 'created_at')
     
     fieldsets = (
         ('Transaction Details', {
-            'fields': ('user', 'type', 'amount', 'created_at')
+            'fields': ('user', 'type', 'amount', 'booking', 'created_at')
         }),
         ('Additional Information', {
             'fields': ('description',),
@@ -28,7 +42,32 @@ class TransactionAdmin(admin.ModelAdmin):
         }),
     )
 
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
     def get_queryset(self, request):
         """Override to use custom manager efficiently."""
         qs = super().get_queryset(request)
         return qs.select_related('user')
+
+
+@admin.register(BalanceCheckpoint)
+class BalanceCheckpointAdmin(admin.ModelAdmin):
+    """
+    Admin interface for BalanceCheckpoint model.
+
+    Read-only view of the ledger checkpoints written by payments.checkpoints.
+    """
+    list_display = ('id', 'user', 'last_transaction', 'balance', 'created_at')
+    search_fields = ('user__username',)
+    raw_id_fields = ('user', 'last_transaction')
+    readonly_fields = ('user', 'last_transaction', 'balance', 'created_at')
+
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,73 @@
+"""
+Incremental per-user balance checkpoints.
+
+checkpoint_if_due() runs after every wallet change (see payments.wallet):
+one statement that reads the user's latest checkpoint, aggregates the
+transactions after it and, once there are BALANCE_CHECKPOINT_EVERY of
+them, inserts a new checkpoint (checkpoint_users_if_due() does the same for
+many users at once, after bulk credits). The tail never grows past that size, so
+Transaction.objects.balance_as_of() and statement() read at most one
+checkpoint and a bounded number of rows.
+
+Wallet changes for one user are serialized by the row lock their
+conditional UPDATE takes on User.wallet, so a user's transaction ids are
+committed in order and a checkpoint can never skip an entry.
+"""
+from django.conf import settings
+from django.db import connection
+from .models import BalanceCheckpoint, Transaction
+
+_CHECKPOINT_SQL = """
+INSERT INTO {checkpoints} (user_id, last_transaction_id, balance, created_at)
+SELECT users.user_id, tail.last_id, COALESCE(last.balance, 0) + tail.total, NOW()
+FROM unnest(%(user_ids)s::bigint[]) AS users(user_id)
+LEFT JOIN LATERAL (
+    SELECT last_transaction_id, balance FROM {checkpoints}
+    WHERE user_id = users.user_id
+    ORDER BY last_transaction_id DESC LIMIT 1
+) last ON true
+CROSS JOIN LATERAL (
+    SELECT COUNT(*) AS entries, COALESCE(SUM(amount), 0) AS total, MAX(id) AS last_id
+    FROM {transactions}
+    WHERE user_id = users.user_id
+      AND id > COALESCE(last.last_transaction_id, 0)
+) tail
+WHERE tail.entries >= %(every)s
+RETURNING user_id
+"""
+
+
+def checkpoint_users_if_due(user_ids, every=None):
+    """
+    Write a checkpoint for each of the users whose tail is long enough.
+
+    One statement whatever the number of users; see checkpoint_if_due().
+
+    Returns:
+        int: Number of checkpoints written
+    """
+    user_ids = sorted(set(user_ids))
+    if not user_ids:
+        return 0
+    sql = _CHECKPOINT_SQL.format(
+        checkpoints=connection.ops.quote_name(BalanceCheckpoint._meta.db_table),
+        transactions=connection.ops.quote_name(Transaction._meta.db_table),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, {'user_ids': user_ids, 'every': every or settings.BALANCE_CHECKPOINT_EVERY})
+        return len(cursor.fetchall())
+
+
+def checkpoint_if_due(user_id, every=None):
+    """
+    Write a checkpoint for the user if enough transactions have accumulated.
+
+    Args:
+        user_id (int): Account holder
+        every (int): Tail length that triggers a checkpoint, defaults to
+            settings.BALANCE_CHECKPOINT_EVERY (pass 1 to checkpoint any tail)
+
+    Returns:
+        bool: True if a checkpoint was written
+    """
+    return checkpoint_users_if_due([user_id], every) > 0
@@ -0,0 +1,31 @@
+import logging
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from payments.checkpoints import checkpoint_if_due
+from payments.models import Transaction
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Write balance checkpoints for users whose transactions predate "
+        "checkpointing (new transactions are checkpointed as they are written)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--every', type=int, default=1,
+            help='Only checkpoint users with at least this many unchecked transactions (default: any).',
+        )
+
+    def handle(self, *args, **options):
+        user_ids = Transaction.objects.order_by('user_id').values_list('user_id', flat=True).distinct()
+        written = 0
+        for user_id in user_ids.iterator(chunk_size=2000):
+            with transaction.atomic():
+                written += checkpoint_if_due(user_id, options['every'])
+        logger.info(f'Wrote {written} balance checkpoints')
+        self.stdout.write(f'Wrote {written} balance checkpoints')
@@ -0,0 +1,19 @@
+from airline_booking.exports import ExportCommand
+from payments.admin import TransactionAdmin
+from payments.models import Transaction
+
+
+class Command(ExportCommand):
+    help = "Stream wallet transactions as CSV or JSON Lines, e.g. for reconciliation."
+    model = Transaction
+    fields = TransactionAdmin.export_fields
+
+    def add_filters(self, parser):
+        parser.add_argument('--type', choices=[value for value, _ in Transaction.TYPE_CHOICES])
+        parser.add_argument('--user-id', type=int, help='Only transactions of this user id.')
+
+    def filter(self, queryset, options):
+        for option, field in (('type', 'type'), ('user_id', 'user_id')):
+            if options[option] is not None:
+                queryset = queryset.filter(**{field: options[option]})
+        return queryset
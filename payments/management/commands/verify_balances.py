@@ -0,0 +1,93 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import F, Max, Min, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from payments.models import BalanceCheckpoint, Transaction
+
+logger = logging.getLogger(__name__)
+
+
+def _wallet_drift(low, high):
+    """Users in [low, high] whose wallet differs from the sum of their transactions."""
+    return list(
+        get_user_model().objects.filter(id__range=(low, high))
+        .annotate(ledger=Coalesce(Sum('transactions__amount'), Value(0)))
+        .exclude(wallet=F('ledger'))
+        .values_list('id', 'wallet', 'ledger')
+    )
+
+
+def _checkpoint_drift(low, high):
+    """Latest checkpoints in [low, high] that disagree with the transactions they cover."""
+    covered = (
+        Transaction.objects.filter(user=OuterRef('user'), id__lte=OuterRef('last_transaction'))
+        .order_by().values('user').annotate(total=Sum('amount')).values('total')
+    )
+    latest = (
+        BalanceCheckpoint.objects.filter(user__id__range=(low, high))
+        .order_by('user_id', '-last_transaction_id')
+        .distinct('user_id')
+        .annotate(ledger=Coalesce(Subquery(covered), Value(0)))
+        .values_list('user_id', 'last_transaction_id', 'balance', 'ledger')
+    )
+    return [row for row in latest if row[2] != row[3]]
+
+
+def _verify_chunk(bounds):
+    try:
+        return _wallet_drift(*bounds), _checkpoint_drift(*bounds)
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute every user's balance from the Transaction ledger in parallel "
+        "chunks and report drift against User.wallet and the balance checkpoints."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help='Chunks verified concurrently, each on its own database connection.',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=5000,
+            help='Users per chunk (by id range).',
+        )
+
+    def handle(self, *args, **options):
+        bounds = get_user_model().objects.aggregate(low=Min('id'), high=Max('id'))
+        if bounds['low'] is None:
+            self.stdout.write('No users to verify')
+            return
+        size = options['chunk_size']
+        chunks = [
+            (low, min(low + size - 1, bounds['high']))
+            for low in range(bounds['low'], bounds['high'] + 1, size)
+        ]
+
+        wallet_drift = checkpoint_drift = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            for wallets, checkpoints in pool.map(_verify_chunk, chunks):
+                for user_id, wallet, ledger in wallets:
+                    wallet_drift += 1
+                    self.stdout.write(f'User {user_id}: wallet {wallet}, ledger {ledger} (drift {wallet - ledger})')
+                for user_id, last_id, balance, ledger in checkpoints:
+                    checkpoint_drift += 1
+                    self.stdout.write(f'User {user_id}: checkpoint at txn {last_id} says {balance}, ledger {ledger}')
+
+        summary = (
+            f'Verified {len(chunks)} chunks: {wallet_drift} wallets and '
+            f'{checkpoint_drift} checkpoints drifted'
+        )
+        if wallet_drift or checkpoint_drift:
+            logger.error(summary)
+            raise CommandError(summary)
+        logger.info(summary)
+        self.stdout.write(summary)
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:46
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0005_booking_keyset_index'),
+        ('payments', '0005_balance_checkpoints'),
+        # pg_trgm, for the gin_trgm_ops indexes.
+        ('flights', '0004_trigram_search_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('description'), name='gin_trgm_ops'), name='txn_description_trgm'),
+        ),
+    ]
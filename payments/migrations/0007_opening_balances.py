@@ -0,0 +1,59 @@
+"""
+Bring wallets funded before the ledger was complete onto it.
+
+Wallet balances that predate the Transaction ledger (or parts of it) have
+no entries adding up to them, so verify_balances reported every such user
+as drift and balance_as_of() disagreed with User.wallet. For each user
+whose wallet differs from the sum of their transactions, this writes one
+'Opening balance' entry for the difference and a BalanceCheckpoint right
+after it, so the ledger matches the wallet from here on and the existing
+history does not have to be re-read for the user's balance.
+
+The entries are dated at migration time: checkpoints assume a user's
+transaction ids follow their created_at order.
+"""
+from django.conf import settings
+from django.db import migrations
+
+OPENING_DESCRIPTION = 'Opening balance'
+
+_OPEN_LEDGERS_SQL = """
+WITH drift AS (
+    SELECT u.id AS user_id, u.wallet - COALESCE(SUM(t.amount), 0) AS amount
+    FROM {users} u
+    LEFT JOIN {transactions} t ON t.user_id = u.id
+    GROUP BY u.id, u.wallet
+    HAVING u.wallet <> COALESCE(SUM(t.amount), 0)
+), opening AS (
+    INSERT INTO {transactions} (user_id, amount, type, created_at, description)
+    SELECT user_id, amount, CASE WHEN amount > 0 THEN 'deposit' ELSE 'payment' END, clock_timestamp(), %s
+    FROM drift ORDER BY user_id
+    RETURNING id, user_id
+)
+INSERT INTO {checkpoints} (user_id, last_transaction_id, balance, created_at)
+SELECT opening.user_id, opening.id, u.wallet, NOW()
+FROM opening JOIN {users} u ON u.id = opening.user_id
+"""
+
+
+def open_ledgers(apps, schema_editor):
+    quote = schema_editor.connection.ops.quote_name
+    sql = _OPEN_LEDGERS_SQL.format(
+        users=quote(apps.get_model(settings.AUTH_USER_MODEL)._meta.db_table),
+        transactions=quote(apps.get_model('payments', 'Transaction')._meta.db_table),
+        checkpoints=quote(apps.get_model('payments', 'BalanceCheckpoint')._meta.db_table),
+    )
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(sql, [OPENING_DESCRIPTION])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0006_admin_search_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(open_ledgers, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,9 @@
 from django.db import models
+from django.db.models import Sum
 from django.conf import settings
 
+from airline_booking.indexes import trigram_index
+
 
 class TransactionManager(models.Manager):
     """
@@ -11,7 +14,13 @@ class TransactionManager(models.Manager):
     - payments(): Filter only payment transactions
     - refunds(): Filter only refund transactions
     - for_user(user): Get all transactions for a specific user
-    
+    - balance_as_of(user, when): Ledger balance at a point in time
+    - statement(user, start, end): Opening balance plus the entries in a range
+
+    Balances start from the user's nearest BalanceCheckpoint and add only
+    the transactions after it, so they cost the same however long the
+    user's history is.
+
     Why this manager exists:
     - Centralizes transaction filtering logic
     - Simplifies financial reporting and analysis
@@ -40,6 +49,57 @@ class TransactionManager(models.Manager):
         """Return the most recent transactions."""
         return self.all()[:limit]
 
+    def _balance_through(self, user, last_id):
+        """Balance including every transaction of `user` with id <= last_id."""
+        checkpoint = (
+            BalanceCheckpoint.objects.filter(user=user, last_transaction_id__lte=last_id)
+            .order_by('-last_transaction_id')
+            .values('last_transaction_id', 'balance')
+            .first()
+        ) or {'last_transaction_id': 0, 'balance': 0}
+        tail = self.filter(
+            user=user, id__gt=checkpoint['last_transaction_id'], id__lte=last_id,
+        ).aggregate(total=Sum('amount'))['total'] or 0
+        return checkpoint['balance'] + tail
+
+    def _last_id(self, user, before=None, through=None):
+        qs = self.filter(user=user)
+        if before is not None:
+            qs = qs.filter(created_at__lt=before)
+        if through is not None:
+            qs = qs.filter(created_at__lte=through)
+        return qs.order_by('-created_at', '-id').values_list('id', flat=True).first()
+
+    def balance_as_of(self, user, when=None):
+        """
+        Return the user's ledger balance after every transaction up to `when`.
+
+        Args:
+            user: Account holder
+            when (datetime): Point in time, defaults to now (latest balance)
+
+        Returns:
+            int
+        """
+        last_id = self._last_id(user, through=when)
+        return self._balance_through(user, last_id) if last_id else 0
+
+    def statement(self, user, start, end):
+        """
+        Return the user's statement for transactions in [start, end).
+
+        Returns:
+            dict: opening_balance, closing_balance and entries, a list of
+            (Transaction, running balance) oldest first
+        """
+        last_id = self._last_id(user, before=start)
+        balance = opening = self._balance_through(user, last_id) if last_id else 0
+        entries = []
+        for entry in self.filter(user=user, created_at__gte=start, created_at__lt=end).order_by('created_at', 'id'):
+            balance += entry.amount
+            entries.append((entry, balance))
+        return {'opening_balance': opening, 'closing_balance': balance, 'entries': entries}
+
 
 class Transaction(models.Model):
     TYPE_CHOICES = [
@@ -48,21 +108,66 @@ class Transaction(models.Model):
         ("refund", "Refund"),
     ]
 
+    # Indexed by txn_user_created_idx, which leads with user.
     user = models.ForeignKey(
-        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="transactions"
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="transactions",
+        db_index=False,
     )
+    # Signed: deposits and refunds add to the wallet, payments subtract.
     amount = models.IntegerField()
     type = models.CharField(max_length=20, choices=TYPE_CHOICES, default="payment")
     created_at = models.DateTimeField(auto_now_add=True)
     description = models.TextField(blank=True, null=True)
+    booking = models.ForeignKey(
+        "bookings.Booking", on_delete=models.SET_NULL, null=True, blank=True,
+        related_name="transactions",
+    )
 
     # Use custom manager
     objects = TransactionManager()
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='txn_user_created_idx'),
+            models.Index(fields=['user', 'type', '-created_at'], name='txn_user_type_created_idx'),
+            # Checkpoint tails: a user's transactions after a given id.
+            models.Index(fields=['user', 'id'], name='txn_user_id_idx'),
+            # Admin search (icontains).
+            trigram_index('description', 'txn_description_trgm'),
+        ]
         verbose_name = "Transaction"
         verbose_name_plural = "Transactions"
 
     def __str__(self):
-        return f"{self.user} - {self.type} - {self.amount}"
\ No newline at end of file
+        return f"{self.user} - {self.type} - {self.amount}"
+
+
+class BalanceCheckpoint(models.Model):
+    """
+    A user's ledger balance including every transaction up to last_transaction.
+
+    Written every BALANCE_CHECKPOINT_EVERY transactions by
+    payments.checkpoints, in the same database transaction as the entry
+    that triggered it. Balance queries read the nearest checkpoint and add
+    the (short) tail of transactions after it.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="balance_checkpoints",
+        db_index=False,
+    )
+    last_transaction = models.ForeignKey(Transaction, on_delete=models.CASCADE, related_name="+")
+    balance = models.BigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            # Also the index for "latest checkpoint of user X at or before txn Y".
+            models.UniqueConstraint(fields=['user', 'last_transaction'], name='checkpoint_user_txn_uniq'),
+        ]
+        verbose_name = "Balance checkpoint"
+        verbose_name_plural = "Balance checkpoints"
+
+    def __str__(self):
+        return f"{self.user} - {self.balance} @ txn {self.last_transaction_id}"
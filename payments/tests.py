@@ -1,3 +1,304 @@
-from django.test import TestCase
+import importlib
+import io
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 
-# Create your tests here.
+from django.apps import apps
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import Sum
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import User
+from airline_booking.testing import QueryPlanMixin
+from bookings.holds import create_hold
+from bookings.models import Booking, SeatHold
+from bookings.tests import make_flight
+from bookings.views import book_flight, cancel_booking
+from .models import BalanceCheckpoint, Transaction
+from .wallet import InsufficientFunds, charge, credit
+
+
+class TransactionQueryPlanTests(QueryPlanMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [User.objects.create(username=f'customer{i}') for i in range(20)]
+        types = ['deposit', 'payment', 'refund']
+        # One heavy user, so reading a page in index order beats sorting.
+        Transaction.objects.bulk_create(
+            Transaction(user=cls.users[0 if i % 2 else i % 20], amount=100, type=types[i % 3])
+            for i in range(4000)
+        )
+
+    def test_for_user_uses_user_created_index(self):
+        qs = Transaction.objects.for_user(self.users[0])[:20]
+        self.assertUsesIndex(qs, 'txn_user_created_idx')
+
+    def test_typed_history_uses_user_type_created_index(self):
+        for qs in (
+            Transaction.objects.payments().filter(user=self.users[0]),
+            Transaction.objects.refunds().filter(user=self.users[0]),
+            Transaction.objects.deposits().filter(user=self.users[0]),
+        ):
+            self.assertUsesIndex(qs[:20], 'txn_user_type_created_idx')
+
+
+class WalletPaymentTests(TestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.user = User.objects.create(username='passenger', wallet=250)
+        self.flight = make_flight(seats=5, price=100)
+
+    def _call(self, view, *args, **params):
+        request = self.factory.get('/', params)
+        request.user = self.user
+        return view(request, *args)
+
+    def _ledger_total(self):
+        return Transaction.objects.for_user(self.user).aggregate(total=Sum('amount'))['total'] or 0
+
+    def test_booking_debits_wallet_and_records_payment(self):
+        self.assertEqual(self._call(book_flight, self.flight.id).status_code, 302)
+        booking = Booking.objects.get()
+        payment = Transaction.objects.payments().get()
+        self.assertEqual((payment.amount, payment.booking), (-100, booking))
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.wallet, 150)
+
+    def test_insufficient_funds_changes_nothing(self):
+        hold = create_hold(self.user, self.flight, seats=3)
+        response = self._call(book_flight, self.flight.id, hold=hold.id)
+        self.assertContains(response, 'Insufficient Funds', status_code=402)
+        self.flight.refresh_from_db()
+        self.user.refresh_from_db()
+        self.assertEqual((self.flight.seats_available, self.user.wallet), (2, 250))
+        self.assertFalse(Booking.objects.exists())
+        self.assertFalse(Transaction.objects.exists())
+        self.assertTrue(SeatHold.objects.filter(pk=hold.pk).exists())
+
+    def test_cancellation_refunds_to_wallet(self):
+        self._call(book_flight, self.flight.id)
+        booking = Booking.objects.get()
+        self._call(cancel_booking, booking.id)
+        self._call(cancel_booking, booking.id)
+        refund = Transaction.objects.refunds().get()
+        self.assertEqual((refund.amount, refund.booking), (90, booking))
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.wallet, 240)
+
+    def test_wallet_always_matches_ledger(self):
+        credit(self.user, 250, 'deposit', 'Opening balance')
+        self._call(book_flight, self.flight.id)
+        self._call(cancel_booking, Booking.objects.get().id)
+        with self.assertRaises(InsufficientFunds):
+            charge(self.user, [1000])
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.wallet, 250 + self._ledger_total())
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class ConcurrentWalletTests(TransactionTestCase):
+    """
+    Many parallel bookings by one user racing for the same wallet.
+
+    The wallet covers AFFORDABLE seats; the flight has plenty more, so the
+    wallet is the only thing that can stop a booking. Throughput of the same
+    race is measured by benchmarks/wallet_contention.py.
+    """
+
+    PRICE = 100
+    AFFORDABLE = 40
+    ATTEMPTS = 200
+    WORKERS = 24
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.user = User.objects.create(username='passenger', wallet=self.PRICE * self.AFFORDABLE)
+        self.flight = make_flight(seats=self.ATTEMPTS, price=self.PRICE)
+
+    def _book(self, _):
+        request = self.factory.get('/')
+        request.user = User.objects.get(pk=self.user.pk)
+        try:
+            return book_flight(request, self.flight.id).status_code
+        finally:
+            connection.close()
+
+    def test_parallel_bookings_never_overdraw_the_wallet(self):
+        with ThreadPoolExecutor(max_workers=self.WORKERS) as pool:
+            codes = list(pool.map(self._book, range(self.ATTEMPTS)))
+
+        self.user.refresh_from_db()
+        self.flight.refresh_from_db()
+        self.assertEqual(self.user.wallet, 0)
+        self.assertEqual(codes.count(302), self.AFFORDABLE)
+        self.assertEqual(codes.count(402), self.ATTEMPTS - self.AFFORDABLE)
+        self.assertEqual(Booking.objects.count(), self.AFFORDABLE)
+        self.assertEqual(self.flight.seats_available, self.ATTEMPTS - self.AFFORDABLE)
+        total = Transaction.objects.aggregate(total=Sum('amount'))['total']
+        self.assertEqual(total, -self.PRICE * self.AFFORDABLE)
+
+
+@override_settings(BALANCE_CHECKPOINT_EVERY=5)
+class BalanceCheckpointTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='passenger')
+        cls.other = User.objects.create(username='someone-else')
+        credit(cls.other, 500, 'deposit')
+        credit(cls.user, 10_000, 'deposit')
+        for i in range(22):
+            charge(cls.user, [10 + i])
+            if i % 4 == 0:
+                credit(cls.user, 7, 'refund')
+        # Spread the history over days so there are points in time to ask about.
+        start = timezone.now() - timedelta(days=40)
+        for day, pk in enumerate(Transaction.objects.filter(user=cls.user).order_by('id').values_list('id', flat=True)):
+            Transaction.objects.filter(pk=pk).update(created_at=start + timedelta(days=day))
+        cls.start = start
+
+    def _brute_force(self, **filters):
+        return Transaction.objects.filter(user=self.user, **filters).aggregate(total=Sum('amount'))['total'] or 0
+
+    def test_checkpoints_are_written_incrementally(self):
+        entries = Transaction.objects.filter(user=self.user).count()
+        self.assertEqual(BalanceCheckpoint.objects.filter(user=self.user).count(), entries // 5)
+        for checkpoint in BalanceCheckpoint.objects.filter(user=self.user):
+            self.assertEqual(checkpoint.balance, self._brute_force(id__lte=checkpoint.last_transaction_id))
+
+    def test_balance_as_of_reads_checkpoint_plus_tail(self):
+        self.user.refresh_from_db()
+        with self.assertNumQueries(3):
+            self.assertEqual(Transaction.objects.balance_as_of(self.user), self.user.wallet)
+        for days in (0, 3, 11, 17, 26):
+            when = self.start + timedelta(days=days, hours=1)
+            self.assertEqual(
+                Transaction.objects.balance_as_of(self.user, when),
+                self._brute_force(created_at__lte=when),
+            )
+        self.assertEqual(Transaction.objects.balance_as_of(self.user, self.start - timedelta(days=1)), 0)
+
+    def test_statement_has_opening_and_running_balances(self):
+        start, end = self.start + timedelta(days=8), self.start + timedelta(days=15)
+        statement = Transaction.objects.statement(self.user, start, end)
+        self.assertEqual(statement['opening_balance'], self._brute_force(created_at__lt=start))
+        self.assertEqual(len(statement['entries']), 7)
+        self.assertEqual(statement['closing_balance'], self._brute_force(created_at__lt=end))
+        self.assertEqual(statement['entries'][-1][1], statement['closing_balance'])
+
+
+class BalanceVerificationTests(TransactionTestCase):
+
+    def setUp(self):
+        self.users = [User.objects.create(username=f'customer{i}') for i in range(30)]
+        for i, user in enumerate(self.users):
+            credit(user, 1000, 'deposit')
+            charge(user, [i + 1])
+
+    def _verify(self):
+        out = io.StringIO()
+        call_command('verify_balances', workers=4, chunk_size=7, stdout=out)
+        return out.getvalue()
+
+    def test_clean_ledger_passes(self):
+        self.assertIn('0 wallets and 0 checkpoints drifted', self._verify())
+
+    def test_reports_wallet_and_checkpoint_drift(self):
+        call_command('checkpoint_balances', stdout=io.StringIO())
+        self.assertEqual(BalanceCheckpoint.objects.count(), 30)
+        User.objects.filter(pk=self.users[3].pk).update(wallet=5)
+        BalanceCheckpoint.objects.filter(user=self.users[20]).update(balance=1)
+        with self.assertRaisesMessage(CommandError, '1 wallets and 1 checkpoints drifted'):
+            self._verify()
+
+
+class OpeningBalanceMigrationTests(TestCase):
+
+    def test_wallets_without_ledger_get_an_opening_entry_and_checkpoint(self):
+        migration = importlib.import_module('payments.migrations.0007_opening_balances')
+        unledgered = User.objects.create(username='legacy', wallet=250)
+        partial = User.objects.create(username='partial', wallet=100)
+        Transaction.objects.create(user=partial, amount=40, type='deposit')
+        overdrawn = User.objects.create(username='overdrawn', wallet=0)
+        Transaction.objects.create(user=overdrawn, amount=30, type='refund')
+        in_step = User.objects.create(username='in-step')
+        credit(in_step, 70, 'deposit')
+        User.objects.create(username='empty')
+
+        with connection.schema_editor() as editor:
+            migration.open_ledgers(apps, editor)
+
+        openings = Transaction.objects.filter(description='Opening balance')
+        self.assertEqual(
+            sorted(openings.values_list('user__username', 'type', 'amount')),
+            [('legacy', 'deposit', 250), ('overdrawn', 'payment', -30), ('partial', 'deposit', 60)],
+        )
+        for user in (unledgered, partial, overdrawn):
+            checkpoint = BalanceCheckpoint.objects.get(user=user)
+            self.assertEqual(checkpoint.last_transaction, openings.get(user=user))
+            self.assertEqual(checkpoint.balance, user.wallet)
+            self.assertEqual(Transaction.objects.balance_as_of(user), user.wallet)
+        out = io.StringIO()
+        call_command('verify_balances', stdout=out)
+        self.assertIn('0 wallets and 0 checkpoints drifted', out.getvalue())
+
+
+class TransactionExportTests(TestCase):
+
+    def test_export_command_filters_by_type_and_date(self):
+        user = User.objects.create(username='reconciled')
+        Transaction.objects.create(user=user, amount=500, type='deposit')
+        Transaction.objects.create(user=user, amount=-200, type='payment', description='Tehran → Mashhad')
+        old = Transaction.objects.create(user=user, amount=-100, type='payment')
+        Transaction.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=40))
+
+        out = io.StringIO()
+        since = (timezone.localdate() - timedelta(days=1)).isoformat()
+        call_command('export_transactions', '--type', 'payment', '--since', since, stdout=out)
+        self.assertEqual(out.getvalue().splitlines(), [
+            'id,user_id,user__username,type,amount,booking_id,description,created_at',
+            f'{old.pk - 1},{user.pk},reconciled,payment,-200,,Tehran → Mashhad,'
+            + Transaction.objects.get(pk=old.pk - 1).created_at.isoformat(),
+        ])
+        with self.assertRaises(CommandError):
+            call_command('export_transactions', '--gzip', stdout=out)
+
+
+@override_settings(ADMIN_EXACT_COUNT_LIMIT=-1)
+class TransactionAdminTests(TestCase):
+
+    def test_changelist_queries_do_not_grow(self):
+        admin = User.objects.create_superuser(username='finance', password='x')
+        self.client.force_login(admin)
+        url = reverse('admin:payments_transaction_changelist')
+        Transaction.objects.create(user=admin, amount=100, type='deposit')
+        # Session, user, EXPLAIN (no COUNT), page with users joined.
+        with self.assertNumQueries(4):
+            self.client.get(url)
+        Transaction.objects.bulk_create(
+            Transaction(user=User.objects.create(username=f'payer{i}'), amount=10, type='deposit', description='top-up')
+            for i in range(10)
+        )
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        self.assertEqual(len(response.context['cl'].result_list), 11)
+        response = self.client.get(url, {'q': 'TOP-UP'})
+        self.assertEqual(len(response.context['cl'].result_list), 10)
+
+
+    def test_ledger_is_read_only(self):
+        admin = User.objects.create_superuser(username='finance', password='x')
+        self.client.force_login(admin)
+        entry = Transaction.objects.create(user=admin, amount=100, type='deposit')
+        change_url = reverse('admin:payments_transaction_change', args=[entry.pk])
+        self.assertEqual(self.client.get(reverse('admin:payments_transaction_add')).status_code, 403)
+        self.assertNotContains(self.client.get(change_url), 'name="_save"')
+        self.client.post(change_url, {'user': admin.pk, 'type': 'deposit', 'amount': 1000})
+        self.assertEqual(self.client.get(reverse('admin:payments_transaction_delete', args=[entry.pk])).status_code, 403)
+        entry.refresh_from_db()
+        self.assertEqual(entry.amount, 100)
@@ -0,0 +1,120 @@
+"""
+Wallet payments.
+
+Every balance change is a single conditional UPDATE on User.wallet executed
+by the database, recorded by a Transaction row written in the same database
+transaction. Two bookings racing on the same wallet therefore cannot both
+spend the last of it, and the ledger can never disagree with the balance.
+
+Transaction amounts are signed: deposits and refunds are positive,
+payments negative, so a user's wallet always equals the sum of their
+Transaction amounts.
+
+Call these inside transaction.atomic() together with the Booking and seat
+changes so the whole purchase commits (or rolls back) as one unit.
+credit_many() pays many credits (e.g. the refunds of a canceled flight)
+with a fixed number of statements.
+"""
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from .checkpoints import checkpoint_if_due, checkpoint_users_if_due
+from .models import Transaction
+
+
+class InsufficientFunds(Exception):
+    """The wallet does not hold enough to cover a payment."""
+
+
+def _update_wallet(user_id, delta, guard):
+    table = connection.ops.quote_name(get_user_model()._meta.db_table)
+    column = connection.ops.quote_name('wallet')
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {table} SET {column} = {column} + %s '
+            f'WHERE id = %s{guard} RETURNING {column}',
+            [delta, user_id] + ([-delta] if guard else []),
+        )
+        row = cursor.fetchone()
+    return None if row is None else row[0]
+
+
+def charge(user, amounts, description='', bookings=None):
+    """
+    Take a payment from the user's wallet.
+
+    Args:
+        user: Paying user
+        amounts (list): Amount per ledger entry, e.g. one per booked seat
+        description (str): Transaction description
+        bookings (list): Bookings paid for, matched to `amounts` by position
+
+    Returns:
+        int: Wallet balance after the payment
+
+    Raises:
+        InsufficientFunds: The wallet holds less than sum(amounts); nothing
+            is changed in that case
+    """
+    column = connection.ops.quote_name('wallet')
+    balance = _update_wallet(user.pk, -sum(amounts), f' AND {column} >= %s')
+    if balance is None:
+        raise InsufficientFunds(f'Wallet of user {user.pk} cannot cover {sum(amounts)}')
+    bookings = bookings or [None] * len(amounts)
+    Transaction.objects.bulk_create([
+        Transaction(user=user, amount=-amount, type='payment', description=description, booking=booking)
+        for amount, booking in zip(amounts, bookings)
+    ])
+    checkpoint_if_due(user.pk)
+    return balance
+
+
+def credit(user, amount, type='refund', description='', booking=None):
+    """
+    Add money to the user's wallet (a refund or a deposit).
+
+    Returns:
+        int: Wallet balance after the credit
+    """
+    balance = _update_wallet(user.pk, amount, '')
+    Transaction.objects.create(user=user, amount=amount, type=type, description=description, booking=booking)
+    checkpoint_if_due(user.pk)
+    return balance
+
+
+def credit_many(transactions):
+    """
+    Credit several wallets at once and record their Transaction rows.
+
+    Amounts are summed per user and added with one UPDATE; the wallet rows
+    are locked in id order first, so two bulk credits over overlapping
+    users cannot deadlock.
+
+    Args:
+        transactions (list): Unsaved Transaction objects with positive amounts
+
+    Returns:
+        int: Number of wallets credited
+    """
+    totals = Counter()
+    for entry in transactions:
+        totals[entry.user_id] += entry.amount
+    if not totals:
+        return 0
+    user_ids = sorted(totals)
+    table = connection.ops.quote_name(get_user_model()._meta.db_table)
+    column = connection.ops.quote_name('wallet')
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT id FROM {table} WHERE id = ANY(%s) ORDER BY id FOR UPDATE', [user_ids])
+        cursor.execute(
+            f'UPDATE {table} SET {column} = {column} + credits.amount '
+            f'FROM unnest(%s::bigint[], %s::bigint[]) AS credits(user_id, amount) '
+            f'WHERE id = credits.user_id',
+            [user_ids, [totals[user_id] for user_id in user_ids]],
+        )
+        credited = cursor.rowcount
+    Transaction.objects.bulk_create(transactions)
+    checkpoint_users_if_due(user_ids)
+    return credited
+